@@ -1,19 +1,15 @@
-from api.config import get_secret, APP_METADATA
+from api.config import get_secret, prefetch_secrets, APP_METADATA, WEBHOOK_SECRET_NAMES
 import hmac
 import hashlib
 import os
 import json
-import requests
+from api import http_client
 import logging
 from api.github_api import get_installation_token, fetch_pr_data, post_pr_comment
 
 logger = logging.getLogger(__name__)
 
-GITHUB_APP_ID = get_secret("github-app-id")
-GITHUB_PRIVATE_KEY_PEM = get_secret("github-private-key-pem")
-GITHUB_WEBHOOK_SECRET = get_secret("github-webhook-secret")
-PROMPT_FLOW_API_KEY = get_secret("prompt-flow-api-key")
-AI_SEARCH_ENDPOINT = get_secret("ai-search-endpoint")
+# No Key Vault calls at import time; the first request warms the secret cache in one batch
 
 def validate_signature(payload, header_signature, secret):
     """
@@ -30,6 +26,7 @@ def main(req):
     """
     Azure Function entry point for handling GitHub PR webhooks.
     """
+    prefetch_secrets(WEBHOOK_SECRET_NAMES)
     secret = get_secret("github-webhook-secret")
     payload = req.get_body()
     signature = req.headers.get("X-Hub-Signature-256")
@@ -71,7 +68,7 @@ def main(req):
         """
         url = f"https://api.github.com/repos/{owner}/{repo}/pulls/{pr_number}/files"
         headers = {"Authorization": f"token {token}", "Accept": "application/vnd.github.v3+json"}
-        response = requests.get(url, headers=headers)
+        response = http_client.get(url, endpoint="github", headers=headers)
         if response.status_code != 200:
             logger.warning("Could not fetch PR files for language detection.")
             return "python"  # fallback
@@ -110,7 +107,7 @@ def main(req):
         """
         url = f"https://api.github.com/repos/{owner}/{repo}/contents/.guidelines.yml"
         headers = {"Authorization": f"token {token}", "Accept": "application/vnd.github.v3.raw"}
-        response = requests.get(url, headers=headers)
+        response = http_client.get(url, endpoint="github", headers=headers)
         if response.status_code == 200:
             try:
                 import yaml
@@ -141,7 +138,7 @@ def main(req):
     }
 
     try:
-        pf_response = requests.post(pf_endpoint, headers=headers, json=flow_input)
+        pf_response = http_client.post(pf_endpoint, endpoint="prompt_flow", idempotent=False, headers=headers, json=flow_input)
         pf_response.raise_for_status()
         review_comment = pf_response.json().get("output", "No review output.")
     except Exception as e:
@@ -0,0 +1,74 @@
+import json
+from api import telemetry
+from api import prompt_flow_client
+from api import rate_limit
+from api.review_cache import get_review_cache
+from api.review_scheduler import get_review_scheduler
+
+def rate_limit_text():
+    """
+    GitHub rate-limit budget per installation as Prometheus gauges.
+    """
+    snapshot = sorted(rate_limit.governor.snapshot().items())
+    return "".join([
+        telemetry.metric_text("github_rate_limit_remaining", "Requests left in the current GitHub rate-limit window.",
+                              [({"key": key}, budget["remaining"]) for key, budget in snapshot]),
+        telemetry.metric_text("github_rate_limit_limit", "Size of the GitHub rate-limit window.",
+                              [({"key": key}, budget["limit"]) for key, budget in snapshot]),
+        telemetry.metric_text("github_rate_limit_reset_timestamp_seconds", "Unix time at which the GitHub rate-limit window resets.",
+                              [({"key": key}, budget["reset"]) for key, budget in snapshot]),
+        telemetry.metric_text("github_rate_limit_blocked_seconds", "Seconds until requests for this key are allowed again.",
+                              [({"key": key}, f"{budget['blocked_for']:.3f}") for key, budget in snapshot]),
+    ])
+
+def review_text():
+    """
+    Review scheduler queue depth, in-flight and wait metrics plus review cache counters.
+    """
+    scheduler = get_review_scheduler().stats()
+    cache = get_review_cache().stats()
+    return "".join([
+        telemetry.metric_text("review_scheduler_queue_depth", "Reviews waiting for a Prompt Flow slot.",
+                              [({"lane": lane}, depth) for lane, depth in sorted(scheduler["queue_depth_by_lane"].items())]),
+        telemetry.metric_text("review_scheduler_in_flight", "Reviews currently holding a Prompt Flow slot.",
+                              [({}, scheduler["in_flight"])]),
+        telemetry.metric_text("review_scheduler_wait_seconds", "Recent scheduler wait times.",
+                              [({"quantile": "0.5"}, f"{scheduler['wait_p50']:.6f}"),
+                               ({"quantile": "0.95"}, f"{scheduler['wait_p95']:.6f}"),
+                               ({"quantile": "1"}, f"{scheduler['wait_max']:.6f}")], metric_type="summary"),
+        telemetry.metric_text("review_scheduler_granted_total", "Prompt Flow slots granted.",
+                              [({}, scheduler["granted_total"])], metric_type="counter"),
+        telemetry.metric_text("review_scheduler_timeouts_total", "Reviews that gave up waiting for a slot.",
+                              [({}, scheduler["timeouts"])], metric_type="counter"),
+        telemetry.metric_text("review_cache_hits_total", "Review cache lookups that found a cached review.",
+                              [({}, cache["hits"])], metric_type="counter"),
+        telemetry.metric_text("review_cache_misses_total", "Review cache lookups that found nothing.",
+                              [({}, cache["misses"])], metric_type="counter"),
+        telemetry.metric_text("review_cache_evictions_total", "Cached reviews evicted to stay within the size limit.",
+                              [({}, cache["evictions"])], metric_type="counter"),
+    ])
+
+def main(req):
+    """
+    Azure Function exposing this instance's pipeline stage timings, GitHub rate-limit budgets,
+    review scheduler and review cache metrics.
+    Default: Prometheus text format. ?format=otlp returns recent spans as OTLP/JSON,
+    ?format=summary per-stage percentiles with the slowest stage first,
+    ?format=breakers the Prompt Flow circuit breaker states,
+    ?format=reviews the review scheduler and review cache stats as JSON.
+    """
+    output = (req.params.get("format") or "prometheus").lower()
+    if output == "otlp":
+        return {"status": 200, "body": telemetry.otlp_json(), "headers": {"Content-Type": "application/json"}}
+    if output == "summary":
+        return {"status": 200, "body": json.dumps(telemetry.stage_summary()), "headers": {"Content-Type": "application/json"}}
+    if output == "breakers":
+        return {"status": 200, "body": json.dumps(prompt_flow_client.breaker_states()), "headers": {"Content-Type": "application/json"}}
+    if output == "reviews":
+        stats = {"scheduler": get_review_scheduler().stats(), "cache": get_review_cache().stats()}
+        return {"status": 200, "body": json.dumps(stats), "headers": {"Content-Type": "application/json"}}
+    return {
+        "status": 200,
+        "body": telemetry.prometheus_text() + rate_limit_text() + review_text(),
+        "headers": {"Content-Type": "text/plain; version=0.0.4"},
+    }
@@ -0,0 +1,14 @@
+import json
+import logging
+from api.main import run_review_job
+
+logger = logging.getLogger(__name__)
+
+def main(msg):
+    """
+    Azure Function entry point draining review jobs queued by the webhook in async mode.
+    Raising lets the Functions host retry the message and move it to the poison queue after maxDequeueCount.
+    """
+    job = json.loads(msg.get_body().decode("utf-8"))
+    logger.info(f"Processing review job {job.get('id')} (dequeue count {getattr(msg, 'dequeue_count', '?')})")
+    run_review_job(job["payload"])
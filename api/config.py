@@ -1,9 +1,9 @@
 import os
 import logging
-from azure.identity import DefaultAzureCredential
-from azure.keyvault.secrets import SecretClient
-from azure.core.exceptions import HttpResponseError, ServiceRequestError
-from time import sleep
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from time import sleep, monotonic
+from api import telemetry
 
 # Project/App Metadata (for reference and future use, no secrets here)
 APP_METADATA = {
@@ -33,11 +33,54 @@ if not VAULT_URL:
     logger.error("KEY_VAULT_URL environment variable is not set and no fallback available.")
     raise ValueError("KEY_VAULT_URL environment variable is required.")
 
-# Use Managed Identity for authentication (DefaultAzureCredential)
-credential = DefaultAzureCredential()
-client = SecretClient(vault_url=VAULT_URL, credential=credential)
+# Use Managed Identity for authentication (DefaultAzureCredential). Both are built on first use:
+# azure.identity is slow to import and nothing here may do network I/O at import time.
+credential = None
+client = None
+_client_lock = threading.Lock()
 
-def get_secret(name: str, max_retries: int = 3, backoff_factor: float = 2.0) -> str:
+# In-process secret cache. Entries younger than SECRET_CACHE_TTL are served directly;
+# entries within the additional stale window are served while a background refresh runs.
+SECRET_CACHE_TTL = float(os.getenv("SECRET_CACHE_TTL_SECONDS", "300"))
+SECRET_CACHE_STALE_TTL = float(os.getenv("SECRET_CACHE_STALE_SECONDS", "3600"))
+
+# Secrets needed on every webhook; prefetched together so a cold start pays one round trip.
+WEBHOOK_SECRET_NAMES = (
+    "github-webhook-secret",
+    "github-app-id",
+    "github-private-key-pem",
+    "prompt-flow-api-key",
+)
+
+# Module attributes that used to be read from Key Vault at import time; now fetched on first access
+SECRET_ATTRIBUTES = {
+    "GITHUB_APP_ID": "github-app-id",
+    "GITHUB_PRIVATE_KEY_PEM": "github-private-key-pem",
+    "GITHUB_WEBHOOK_SECRET": "github-webhook-secret",
+    "PROMPT_FLOW_API_KEY": "prompt-flow-api-key",
+    "AI_SEARCH_ENDPOINT": "ai-search-endpoint",
+    "CODE_FIX_PROMPT_FLOW_API_KEY": "prompt-flow-api-key-2",
+}
+
+_secret_cache = {}  # name -> (value, fetched_at)
+_secret_cache_lock = threading.Lock()
+_refreshing = set()
+
+def get_secret_client():
+    """
+    Return the Key Vault SecretClient, creating it and its DefaultAzureCredential on first use.
+    """
+    global credential, client
+    if client is None:
+        with _client_lock:
+            if client is None:
+                from azure.identity import DefaultAzureCredential
+                from azure.keyvault.secrets import SecretClient
+                credential = DefaultAzureCredential()
+                client = SecretClient(vault_url=VAULT_URL, credential=credential)
+    return client
+
+def _fetch_secret(name: str, max_retries: int = 3, backoff_factor: float = 2.0) -> str:
     """
     Fetch a secret value from Azure Key Vault with retry logic.
     Args:
@@ -49,10 +92,11 @@ def get_secret(name: str, max_retries: int = 3, backoff_factor: float = 2.0) ->
     Raises:
         Exception: If secret cannot be retrieved after retries.
     """
+    from azure.core.exceptions import HttpResponseError, ServiceRequestError
     attempt = 0
     while attempt < max_retries:
         try:
-            secret = client.get_secret(name)
+            secret = get_secret_client().get_secret(name)
             logger.info(f"Successfully fetched secret: {name}")
             value = secret.value
             if value is None:
@@ -69,6 +113,95 @@ def get_secret(name: str, max_retries: int = 3, backoff_factor: float = 2.0) ->
     logger.error(f"Failed to fetch secret '{name}' after {max_retries} attempts.")
     raise Exception(f"Failed to fetch secret '{name}' after {max_retries} attempts.")
 
+def _store_secret(name: str, value: str) -> None:
+    with _secret_cache_lock:
+        _secret_cache[name] = (value, monotonic())
+
+def _refresh_in_background(name: str, max_retries: int, backoff_factor: float) -> None:
+    """
+    Refresh a stale secret without blocking the caller. At most one refresh per name runs at a time.
+    """
+    with _secret_cache_lock:
+        if name in _refreshing:
+            return
+        _refreshing.add(name)
+
+    def _refresh():
+        try:
+            _store_secret(name, _fetch_secret(name, max_retries, backoff_factor))
+        except Exception as e:
+            logger.warning(f"Background refresh of secret '{name}' failed, serving stale value: {e}")
+        finally:
+            with _secret_cache_lock:
+                _refreshing.discard(name)
+
+    threading.Thread(target=_refresh, name=f"secret-refresh-{name}", daemon=True).start()
+
+def get_secret(name: str, max_retries: int = 3, backoff_factor: float = 2.0, ttl: float = None) -> str:
+    """
+    Fetch a secret value, serving it from the in-process cache when possible.
+    Args:
+        name (str): Name of the secret in Key Vault.
+        max_retries (int): Number of retries for transient errors.
+        backoff_factor (float): Exponential backoff factor.
+        ttl (float): Freshness window in seconds (defaults to SECRET_CACHE_TTL, 0 disables caching).
+    Returns:
+        str: Secret value.
+    Raises:
+        Exception: If secret cannot be retrieved after retries.
+    """
+    ttl = SECRET_CACHE_TTL if ttl is None else ttl
+    with _secret_cache_lock:
+        entry = _secret_cache.get(name)
+    if entry is not None and ttl > 0:
+        value, fetched_at = entry
+        age = monotonic() - fetched_at
+        if age < ttl:
+            return value
+        if age < ttl + SECRET_CACHE_STALE_TTL:
+            # Stale-while-revalidate: rotated secrets are picked up by the refresh
+            _refresh_in_background(name, max_retries, backoff_factor)
+            return value
+    with telemetry.span("key_vault.get_secret", secret=name):
+        value = _fetch_secret(name, max_retries, backoff_factor)
+    _store_secret(name, value)
+    return value
+
+def prefetch_secrets(names, max_retries: int = 3, backoff_factor: float = 2.0) -> dict:
+    """
+    Load a set of secrets into the cache concurrently.
+    Secrets that are already cached and fresh are not fetched again.
+    Args:
+        names (iterable): Secret names to load.
+    Returns:
+        dict: Mapping of secret name to value.
+    Raises:
+        Exception: If any secret cannot be retrieved after retries.
+    """
+    names = list(dict.fromkeys(names))
+    if not names:
+        return {}
+    with ThreadPoolExecutor(max_workers=len(names)) as pool:
+        futures = {name: pool.submit(get_secret, name, max_retries, backoff_factor) for name in names}
+    values = {}
+    errors = []
+    for name, future in futures.items():
+        try:
+            values[name] = future.result()
+        except Exception as e:
+            errors.append(f"{name}: {e}")
+    if errors:
+        logger.error(f"Failed to prefetch secrets: {'; '.join(errors)}")
+        raise Exception(f"Failed to prefetch secrets: {'; '.join(errors)}")
+    return values
+
+def clear_secret_cache() -> None:
+    """
+    Drop all cached secrets (used by tests and after manual rotation).
+    """
+    with _secret_cache_lock:
+        _secret_cache.clear()
+
 # Example usage (uncomment to use):
 # secret_value = get_secret("my-secret-name")
 # print(secret_value)
@@ -84,4 +217,9 @@ def get_secret(name: str, max_retries: int = 3, backoff_factor: float = 2.0) ->
 
 # CODE_FIX_PROMPT_FLOW_ENDPOINT and CODE_FIX_PROMPT_FLOW_API_KEY are now loaded from environment or Key Vault for code-fix integration.
 CODE_FIX_PROMPT_FLOW_ENDPOINT = os.getenv("CODE_FIX_PROMPT_FLOW_ENDPOINT") or APP_METADATA.get("code_fix_prompt_flow_endpoint") or "https://code-fix-flow.eastus2.inference.ml.azure.com/score"
-CODE_FIX_PROMPT_FLOW_API_KEY = get_secret("prompt-flow-api-key-2")
+
+def __getattr__(name):
+    # CODE_FIX_PROMPT_FLOW_API_KEY and the other SECRET_ATTRIBUTES resolve through the secret cache
+    if name in SECRET_ATTRIBUTES:
+        return get_secret(SECRET_ATTRIBUTES[name])
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
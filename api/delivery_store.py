@@ -0,0 +1,193 @@
+# delivery_store.py
+# Webhook delivery dedup and per-PR push coalescing state
+
+import os
+import time
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+DELIVERY_STORE_BACKEND = os.getenv("DELIVERY_STORE_BACKEND", "memory")  # memory or sqlite
+DELIVERY_STORE_PATH = os.getenv("DELIVERY_STORE_PATH", "delivery_store.sqlite3")
+# Delivery ids are remembered this long (GitHub redeliveries are manual or happen within hours)
+DELIVERY_DEDUP_TTL = float(os.getenv("DELIVERY_DEDUP_TTL_SECONDS", "86400"))
+# Queued synchronize reviews wait this long so a burst of pushes collapses into one review
+REVIEW_DEBOUNCE_SECONDS = float(os.getenv("REVIEW_DEBOUNCE_SECONDS", "5"))
+
+def pr_key(data):
+    """
+    Identify the pull request of a webhook payload as "owner/repo#number".
+    """
+    repository = data.get("repository") or {}
+    owner = (repository.get("owner") or {}).get("login")
+    return f"{owner}/{repository.get('name')}#{(data.get('pull_request') or {}).get('number')}"
+
+def payload_head_sha(data):
+    return data.get("after") or ((data.get("pull_request") or {}).get("head") or {}).get("sha")
+
+class DeliveryStore:
+    """
+    Interface for dedup/coalescing backends.
+
+    Per PR the store keeps the latest pushed head SHA and, while that head has not been reviewed,
+    the base the next review must start from. A push that arrives before the previous one was
+    reviewed keeps the older base, so the surviving review covers every collapsed push.
+    """
+    def claim_delivery(self, delivery_id):
+        """
+        Return True the first time a delivery id is seen (within DELIVERY_DEDUP_TTL), else False.
+        """
+        raise NotImplementedError
+
+    def release_delivery(self, delivery_id):
+        """
+        Forget a claimed delivery whose handling failed, so GitHub's redelivery of it is processed.
+        """
+        raise NotImplementedError
+
+    def record_push(self, key, head_sha, before=None):
+        """
+        Record head_sha as the latest head of a PR and return the base its review should start from
+        (None for a full review).
+        """
+        raise NotImplementedError
+
+    def latest_head(self, key):
+        raise NotImplementedError
+
+    def mark_reviewed(self, key, head_sha):
+        """
+        Clear the pending base once a review of head_sha has been posted.
+        """
+        raise NotImplementedError
+
+    def is_superseded(self, key, head_sha):
+        """
+        True if a newer push has been recorded for the PR since head_sha.
+        """
+        latest = self.latest_head(key)
+        return latest is not None and latest != head_sha
+
+class InMemoryDeliveryStore(DeliveryStore):
+    """
+    Process-local store for development and tests.
+    """
+    def __init__(self, ttl=DELIVERY_DEDUP_TTL):
+        self.ttl = ttl
+        self._deliveries = {}  # delivery_id -> seen_at
+        self._heads = {}  # key -> {"head", "base", "pending"}
+        self._lock = threading.Lock()
+
+    def claim_delivery(self, delivery_id):
+        now = time.time()
+        with self._lock:
+            for seen_id, seen_at in list(self._deliveries.items()):
+                if seen_at <= now - self.ttl:
+                    del self._deliveries[seen_id]
+            if delivery_id in self._deliveries:
+                return False
+            self._deliveries[delivery_id] = now
+            return True
+
+    def release_delivery(self, delivery_id):
+        with self._lock:
+            self._deliveries.pop(delivery_id, None)
+
+    def record_push(self, key, head_sha, before=None):
+        with self._lock:
+            state = self._heads.get(key)
+            if state is not None and state["head"] == head_sha:
+                return state["base"]
+            base = state["base"] if state is not None and state["pending"] else before
+            self._heads[key] = {"head": head_sha, "base": base, "pending": True}
+            return base
+
+    def latest_head(self, key):
+        with self._lock:
+            state = self._heads.get(key)
+            return state["head"] if state is not None else None
+
+    def mark_reviewed(self, key, head_sha):
+        with self._lock:
+            state = self._heads.get(key)
+            if state is not None and state["head"] == head_sha:
+                state["pending"] = False
+
+class SQLiteDeliveryStore(DeliveryStore):
+    """
+    Local store backed by a SQLite file, shared by function workers on one host.
+    """
+    def __init__(self, path=DELIVERY_STORE_PATH, ttl=DELIVERY_DEDUP_TTL):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS deliveries (id TEXT PRIMARY KEY, seen_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS pr_heads ("
+            " pr_key TEXT PRIMARY KEY,"
+            " head_sha TEXT NOT NULL,"
+            " base_sha TEXT,"
+            " pending INTEGER NOT NULL,"
+            " updated_at REAL NOT NULL)"
+        )
+
+    def claim_delivery(self, delivery_id):
+        now = time.time()
+        with self._lock:
+            self._conn.execute("DELETE FROM deliveries WHERE seen_at <= ?", (now - self.ttl,))
+            cursor = self._conn.execute(
+                "INSERT OR IGNORE INTO deliveries (id, seen_at) VALUES (?, ?)", (delivery_id, now)
+            )
+            return cursor.rowcount == 1
+
+    def release_delivery(self, delivery_id):
+        with self._lock:
+            self._conn.execute("DELETE FROM deliveries WHERE id = ?", (delivery_id,))
+
+    def record_push(self, key, head_sha, before=None):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT head_sha, base_sha, pending FROM pr_heads WHERE pr_key = ?", (key,)
+            ).fetchone()
+            if row is not None and row[0] == head_sha:
+                return row[1]
+            base = row[1] if row is not None and row[2] else before
+            self._conn.execute(
+                "INSERT OR REPLACE INTO pr_heads (pr_key, head_sha, base_sha, pending, updated_at)"
+                " VALUES (?, ?, ?, 1, ?)",
+                (key, head_sha, base, time.time()),
+            )
+            return base
+
+    def latest_head(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT head_sha FROM pr_heads WHERE pr_key = ?", (key,)).fetchone()
+            return row[0] if row is not None else None
+
+    def mark_reviewed(self, key, head_sha):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE pr_heads SET pending = 0 WHERE pr_key = ? AND head_sha = ?", (key, head_sha)
+            )
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_delivery_store():
+    """
+    Return the process-wide store for the configured DELIVERY_STORE_BACKEND.
+    """
+    global _store
+    with _store_lock:
+        if _store is None:
+            if DELIVERY_STORE_BACKEND == "sqlite":
+                _store = SQLiteDeliveryStore()
+            elif DELIVERY_STORE_BACKEND == "memory":
+                _store = InMemoryDeliveryStore()
+            else:
+                raise ValueError(f"Unknown DELIVERY_STORE_BACKEND: {DELIVERY_STORE_BACKEND}")
+        return _store
@@ -0,0 +1,204 @@
+# diff_parser.py
+# Streaming unified-diff parser producing a compact per-file / per-hunk model
+
+import io
+import re
+import logging
+from dataclasses import dataclass, field
+
+logger = logging.getLogger(__name__)
+
+HUNK_HEADER_RE = re.compile(r"^@@ -(\d+)(?:,(\d+))? \+(\d+)(?:,(\d+))? @@ ?(.*)$")
+
+@dataclass
+class Hunk:
+    """
+    One @@ hunk. lines keep their ' ', '+', '-' or '\\' prefix.
+    """
+    old_start: int
+    old_count: int
+    new_start: int
+    new_count: int
+    section: str = ""
+    lines: list = field(default_factory=list)
+    added: int = 0
+    removed: int = 0
+
+    @property
+    def header(self):
+        section = f" {self.section}" if self.section else ""
+        return f"@@ -{self.old_start},{self.old_count} +{self.new_start},{self.new_count} @@{section}"
+
+    def to_patch(self):
+        return "\n".join([self.header] + self.lines)
+
+@dataclass
+class FileDiff:
+    """
+    All hunks for one file. status is one of added, removed, renamed or modified.
+    """
+    path: str
+    old_path: str = None
+    status: str = "modified"
+    is_binary: bool = False
+    hunks: list = field(default_factory=list)
+    added: int = 0
+    removed: int = 0
+
+    @property
+    def changes(self):
+        return self.added + self.removed
+
+    def to_patch(self):
+        """
+        Render the file back to unified diff text (e.g. for a single-file LLM prompt).
+        """
+        old_path = self.old_path or self.path
+        out = [f"diff --git a/{old_path} b/{self.path}"]
+        if self.status == "added":
+            out.append("new file mode 100644")
+        elif self.status == "removed":
+            out.append("deleted file mode 100644")
+        elif self.status == "renamed":
+            out.extend([f"rename from {old_path}", f"rename to {self.path}"])
+        if self.is_binary:
+            out.append(f"Binary files a/{old_path} and b/{self.path} differ")
+            return "\n".join(out)
+        if self.hunks:
+            out.append("--- /dev/null" if self.status == "added" else f"--- a/{old_path}")
+            out.append("+++ /dev/null" if self.status == "removed" else f"+++ b/{self.path}")
+            out.extend(hunk.to_patch() for hunk in self.hunks)
+        return "\n".join(out)
+
+def _strip_prefix(path):
+    path = path.strip()
+    if path.startswith('"') and path.endswith('"'):
+        path = path[1:-1]
+    if path == "/dev/null":
+        return None
+    if path[:2] in ("a/", "b/"):
+        return path[2:]
+    return path
+
+def _paths_from_git_header(line):
+    # "diff --git a/x b/y"; paths with spaces are ambiguous here and are corrected by ---/+++ lines
+    rest = line[len("diff --git "):]
+    if rest.startswith("a/") and " b/" in rest:
+        old, new = rest[2:].split(" b/", 1)
+        return old, new
+    parts = rest.split(" ")
+    return _strip_prefix(parts[0]), _strip_prefix(parts[-1])
+
+def parse_diff(lines):
+    """
+    Parse unified diff text incrementally, yielding one FileDiff per file.
+    Only the file currently being parsed is held in memory.
+    Args:
+        lines (iterable): Diff lines, with or without trailing newlines (e.g. response.iter_lines()).
+    Yields:
+        FileDiff: Parsed file records in diff order.
+    """
+    current = None
+    hunk = None
+    old_left = new_left = 0
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", errors="replace")
+        line = line.rstrip("\r\n")
+
+        # Inside a hunk, the header counts decide which lines are content
+        if hunk is not None and (old_left > 0 or new_left > 0 or line.startswith("\\")):
+            prefix = line[:1]
+            if prefix == "+":
+                hunk.added += 1
+                new_left -= 1
+            elif prefix == "-":
+                hunk.removed += 1
+                old_left -= 1
+            elif prefix == "\\":
+                pass  # "\ No newline at end of file"
+            else:
+                # Context line (some tools strip the leading space of blank context lines)
+                if not prefix:
+                    line = " "
+                old_left -= 1
+                new_left -= 1
+            hunk.lines.append(line)
+            continue
+        hunk = None
+
+        if line.startswith("diff --git "):
+            if current is not None:
+                yield _finish(current)
+            old, new = _paths_from_git_header(line)
+            current = FileDiff(path=new or old, old_path=old)
+        elif line.startswith("--- ") and (current is None or current.hunks):
+            # Plain (non-git) diff: a new file starts at its --- line
+            if current is not None:
+                yield _finish(current)
+            old = _strip_prefix(line[4:].split("\t")[0])
+            current = FileDiff(path=old, old_path=old)
+            if old is None:
+                current.status = "added"
+        elif current is None:
+            continue
+        elif line.startswith("--- "):
+            old = _strip_prefix(line[4:].split("\t")[0])
+            if old is None:
+                current.status = "added"
+            else:
+                current.old_path = old
+        elif line.startswith("+++ "):
+            new = _strip_prefix(line[4:].split("\t")[0])
+            if new is None:
+                current.status = "removed"
+            else:
+                current.path = new
+        elif line.startswith("new file mode"):
+            current.status = "added"
+        elif line.startswith("deleted file mode"):
+            current.status = "removed"
+        elif line.startswith("rename from "):
+            current.old_path = line[len("rename from "):]
+            current.status = "renamed"
+        elif line.startswith("rename to "):
+            current.path = line[len("rename to "):]
+            current.status = "renamed"
+        elif line.startswith("Binary files ") or line.startswith("GIT binary patch"):
+            current.is_binary = True
+        else:
+            match = HUNK_HEADER_RE.match(line)
+            if match:
+                old_start, old_count, new_start, new_count, section = match.groups()
+                hunk = Hunk(
+                    old_start=int(old_start),
+                    old_count=int(old_count) if old_count is not None else 1,
+                    new_start=int(new_start),
+                    new_count=int(new_count) if new_count is not None else 1,
+                    section=section,
+                )
+                old_left, new_left = hunk.old_count, hunk.new_count
+                current.hunks.append(hunk)
+    if current is not None:
+        yield _finish(current)
+
+def _finish(file_diff):
+    file_diff.added = sum(h.added for h in file_diff.hunks)
+    file_diff.removed = sum(h.removed for h in file_diff.hunks)
+    if file_diff.old_path == file_diff.path and file_diff.status != "renamed":
+        file_diff.old_path = None
+    if file_diff.status == "removed" and file_diff.old_path:
+        file_diff.path = file_diff.old_path
+    return file_diff
+
+def parse_diff_text(text):
+    """
+    Parse a complete diff string into a list of FileDiff records.
+    """
+    return list(parse_diff(io.StringIO(text)))
+
+def render_diff(files):
+    """
+    Join FileDiff records back into one unified diff string.
+    """
+    return "\n".join(f.to_patch() for f in files)
@@ -0,0 +1,239 @@
+# diff_pruner.py
+# Drop diff content nobody wants reviewed before it is sent to Prompt Flow
+
+import os
+import re
+import logging
+from dataclasses import dataclass, field
+from api.diff_parser import FileDiff
+from api.review_planner import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+# Files with more changed lines than this are summarized instead of reviewed (0 = no cap)
+DIFF_MAX_FILE_LINES = int(os.getenv("DIFF_MAX_FILE_LINES", "3000"))
+
+# (reason, globs). Patterns without a "/" match the file name in any directory.
+BUILTIN_RULES = (
+    ("lockfile", (
+        "package-lock.json", "npm-shrinkwrap.json", "yarn.lock", "pnpm-lock.yaml", "poetry.lock",
+        "Pipfile.lock", "Cargo.lock", "go.sum", "composer.lock", "Gemfile.lock", "packages.lock.json",
+        "*.lock",
+    )),
+    ("minified", ("*.min.js", "*.min.css", "*.map", "*.bundle.js")),
+    ("generated", (
+        "*_pb2.py", "*_pb2_grpc.py", "*.pb.go", "*.g.dart", "*.generated.*", "*.Designer.cs",
+        "**/generated/**", "dist/**", "build/**",
+    )),
+    ("vendored", ("vendor/**", "**/vendor/**", "node_modules/**", "**/node_modules/**", "third_party/**", "**/third_party/**")),
+    ("snapshot", ("**/__snapshots__/**", "*.snap")),
+)
+
+# Languages where indentation is syntax: re-indenting a line there changes what it means
+INDENT_SENSITIVE = (
+    "*.py", "*.pyi", "*.pyx", "*.yml", "*.yaml", "Makefile", "*.mk", "*.coffee", "*.haml", "*.pug",
+    "*.jade", "*.slim", "*.sass", "*.styl", "*.nim", "*.fs", "*.fsx",
+)
+
+def glob_to_regex(pattern):
+    """
+    Translate a gitignore-style glob (*, ?, ** across directories) into a compiled regex.
+    """
+    if "/" not in pattern:
+        pattern = "**/" + pattern
+    out = []
+    i = 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            out.append("(?:.*/)?")
+            i += 3
+        elif pattern.startswith("**", i):
+            out.append(".*")
+            i += 2
+        elif pattern[i] == "*":
+            out.append("[^/]*")
+            i += 1
+        elif pattern[i] == "?":
+            out.append("[^/]")
+            i += 1
+        else:
+            out.append(re.escape(pattern[i]))
+            i += 1
+    return re.compile("".join(out) + r"\Z")
+
+def _compile(patterns):
+    return [glob_to_regex(pattern) for pattern in patterns or []]
+
+def _matches(compiled, path):
+    return any(regex.match(path) for regex in compiled)
+
+_BUILTIN = [(reason, _compile(patterns)) for reason, patterns in BUILTIN_RULES]
+_INDENT_SENSITIVE = _compile(INDENT_SENSITIVE)
+
+def is_indent_sensitive(path):
+    return _matches(_INDENT_SENSITIVE, path)
+
+@dataclass
+class PruneReport:
+    """
+    What pruning removed from one review and how much it saved.
+    """
+    files: list = field(default_factory=list)  # FileDiff records left to review
+    skipped: list = field(default_factory=list)  # (path, reason)
+    whitespace_hunks: int = 0
+    lines_before: int = 0
+    lines_after: int = 0
+    tokens_before: int = 0
+    tokens_after: int = 0
+
+    @property
+    def lines_saved(self):
+        return self.lines_before - self.lines_after
+
+    @property
+    def tokens_saved(self):
+        return self.tokens_before - self.tokens_after
+
+    def summary(self):
+        """
+        One-line note listing what was not reviewed, for the review comment ("" if nothing was skipped).
+        """
+        if not self.skipped:
+            return ""
+        shown = ", ".join(f"`{path}` ({reason})" for path, reason in self.skipped[:10])
+        more = f" and {len(self.skipped) - 10} more" if len(self.skipped) > 10 else ""
+        return f"> ℹ️ Not reviewed: {shown}{more}."
+
+def _normalize(lines, keep_indent):
+    """
+    Lines without their diff prefix, with runs of whitespace inside them collapsed to one space
+    and trailing whitespace dropped. Leading indentation is kept as is when keep_indent is set.
+    Blank lines become "".
+    """
+    normalized = []
+    for line in lines:
+        content = line[1:]
+        body = re.sub(r"\s+", " ", content.strip())
+        indent = content[:len(content) - len(content.lstrip())] if keep_indent and body else ""
+        normalized.append(indent + body)
+    return normalized
+
+def is_whitespace_only(hunk, keep_indent=True):
+    """
+    True if the hunk's added and removed lines differ only in blank lines, trailing whitespace,
+    the width of whitespace runs inside a line and, unless keep_indent is set, indentation.
+    Whitespace that separates two tokens is never ignored ("return x" is not "returnx").
+    """
+    removed = [line for line in _normalize((l for l in hunk.lines if l.startswith("-")), keep_indent) if line]
+    added = [line for line in _normalize((l for l in hunk.lines if l.startswith("+")), keep_indent) if line]
+    return removed == added
+
+def _line_count(file_diff):
+    return sum(len(hunk.lines) for hunk in file_diff.hunks)
+
+def _skip_reason(file_diff, include, exclude, use_builtin):
+    path = file_diff.path
+    if include and not _matches(include, path):
+        return "not included"
+    if _matches(exclude, path):
+        return "excluded"
+    if file_diff.is_binary:
+        return "binary"
+    if use_builtin and not (include and _matches(include, path)):
+        for reason, compiled in _BUILTIN:
+            if _matches(compiled, path):
+                return reason
+    return None
+
+def _pattern_list(settings, key):
+    value = settings.get(key)
+    if value is None:
+        return []
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, list) and all(isinstance(pattern, str) for pattern in value):
+        return value
+    logger.warning(f"Ignoring pruning.{key} in .guidelines.yml: expected a list of globs, got {value!r}.")
+    return []
+
+def _pruning_settings(repo_config):
+    """
+    The `pruning` section of .guidelines.yml with each value type-checked.
+    Values of the wrong type are logged and replaced by their defaults, so a bad config cannot fail the review.
+    Returns:
+        tuple: (include globs, exclude globs, builtin_rules, max_file_lines).
+    """
+    settings = repo_config.get("pruning") if repo_config is not None else None
+    if settings is None:
+        settings = {}
+    if not isinstance(settings, dict):
+        logger.warning(f"Ignoring pruning in .guidelines.yml: expected a mapping, got {settings!r}.")
+        settings = {}
+    use_builtin = settings.get("builtin_rules", True)
+    if not isinstance(use_builtin, bool):
+        logger.warning(f"Ignoring pruning.builtin_rules in .guidelines.yml: expected true or false, got {use_builtin!r}.")
+        use_builtin = True
+    max_lines = settings.get("max_file_lines", DIFF_MAX_FILE_LINES)
+    if isinstance(max_lines, bool) or not isinstance(max_lines, int) or max_lines < 0:
+        logger.warning(f"Ignoring pruning.max_file_lines in .guidelines.yml: expected a non-negative integer, got {max_lines!r}.")
+        max_lines = DIFF_MAX_FILE_LINES
+    return _pattern_list(settings, "include"), _pattern_list(settings, "exclude"), use_builtin, max_lines
+
+def prune_diff(files, repo_config=None):
+    """
+    Remove lockfiles, minified/generated/vendored files, snapshots, binaries, whitespace-only hunks
+    (indentation counts in indentation-sensitive languages) and oversized files. Per-repo settings come from the `pruning` section of .guidelines.yml:
+
+        pruning:
+          include: ["src/**"]        # only review matching files (also overrides built-in rules)
+          exclude: ["docs/**"]       # never review matching files
+          builtin_rules: true        # set false to disable the built-in rules
+          max_file_lines: 3000       # summarize files with more changed lines (0 = no cap)
+
+    Args:
+        files (iterable): Parsed FileDiff records.
+        repo_config (RepoConfig): Optional per-repo configuration.
+    Returns:
+        PruneReport: The files left to review plus what was skipped and saved.
+    """
+    include, exclude, use_builtin, max_lines = _pruning_settings(repo_config)
+    include, exclude = _compile(include), _compile(exclude)
+
+    report = PruneReport()
+    for file_diff in files:
+        lines = _line_count(file_diff)
+        tokens = estimate_tokens(file_diff.to_patch())
+        report.lines_before += lines
+        report.tokens_before += tokens
+        reason = _skip_reason(file_diff, include, exclude, use_builtin)
+        if reason is None and max_lines and file_diff.changes > max_lines:
+            reason = f"{file_diff.changes} changed lines"
+        if reason is not None:
+            report.skipped.append((file_diff.path, reason))
+            continue
+        # Re-indenting is only noise where indentation is not syntax
+        keep_indent = is_indent_sensitive(file_diff.path)
+        hunks = [hunk for hunk in file_diff.hunks if not is_whitespace_only(hunk, keep_indent)]
+        report.whitespace_hunks += len(file_diff.hunks) - len(hunks)
+        if file_diff.hunks and not hunks:
+            report.skipped.append((file_diff.path, "whitespace-only" if file_diff.status != "renamed" else "rename-only"))
+            continue
+        if not hunks and file_diff.status == "renamed":
+            # A pure rename is cheap to describe and worth telling the reviewer about
+            report.skipped.append((file_diff.path, "rename-only"))
+            continue
+        if len(hunks) != len(file_diff.hunks):
+            file_diff = FileDiff(
+                path=file_diff.path,
+                old_path=file_diff.old_path,
+                status=file_diff.status,
+                is_binary=file_diff.is_binary,
+                hunks=hunks,
+                added=sum(h.added for h in hunks),
+                removed=sum(h.removed for h in hunks),
+            )
+            tokens = estimate_tokens(file_diff.to_patch())
+        report.files.append(file_diff)
+        report.lines_after += _line_count(file_diff)
+        report.tokens_after += tokens
+    return report
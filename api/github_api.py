@@ -1,30 +1,54 @@
 # github_api.py
 # Authenticate GitHub App using JWT and post PR comment via GitHub API
 
-import jwt
 import time
-import requests
 import json
 import logging
 import os
+import hashlib
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit, parse_qs
+from requests.utils import parse_header_links
+from api import http_client
+from api import telemetry
+from api import prompt_flow_client
+from api.diff_parser import parse_diff
+from api.languages import LanguageReport, detect_languages
+from api.rate_limit import governor as rate_limit_governor
 from api.config import get_secret, APP_METADATA
 
 GITHUB_API_URL = "https://api.github.com"
 
-# Load secrets securely from Azure Key Vault (do not use hardcoded values)
-GITHUB_APP_ID = get_secret("github-app-id")
-GITHUB_PRIVATE_KEY_PEM = get_secret("github-private-key-pem")
-GITHUB_WEBHOOK_SECRET = get_secret("github-webhook-secret")
-PROMPT_FLOW_API_KEY = get_secret("prompt-flow-api-key")
-AI_SEARCH_ENDPOINT = get_secret("ai-search-endpoint")
+# Secrets are loaded from Azure Key Vault on first use (see api.config.get_secret), never at import
 PROMPT_FLOW_ENDPOINT = os.getenv("PROMPT_FLOW_ENDPOINT") or APP_METADATA["prompt_flow_endpoint"]
 
+# Refresh cached credentials this many seconds before they expire
+INSTALLATION_TOKEN_REFRESH_MARGIN = int(os.getenv("INSTALLATION_TOKEN_REFRESH_MARGIN_SECONDS", "300"))
+JWT_REFRESH_MARGIN = 60
+# Used when the token response carries no expires_at (GitHub tokens live for one hour)
+DEFAULT_INSTALLATION_TOKEN_LIFETIME = 3600
+# Largest page size GitHub allows for list endpoints
+GITHUB_PER_PAGE = 100
+# Files up to this size are sent inline in the tree instead of as separate blobs
+COMMIT_INLINE_MAX_BYTES = int(os.getenv("COMMIT_INLINE_MAX_BYTES", str(64 * 1024)))
+COMMIT_BLOB_MAX_PARALLEL = int(os.getenv("COMMIT_BLOB_MAX_PARALLEL", "4"))
+
 logger = logging.getLogger(__name__)
 
+_jwt_cache = {}  # (app_id, private_key) -> (jwt, exp)
+_jwt_cache_lock = threading.Lock()
+_token_cache = {}  # installation_id -> (token, expires_at)
+_token_cache_lock = threading.Lock()
+_token_key_locks = {}  # installation_id -> Lock, so each key refreshes once (single-flight)
+
 def generate_jwt(app_id: str, private_key: str) -> str:
     """
     Generate a JWT for GitHub App authentication.
     """
+    # Imported here: PyJWT and its crypto backend are only needed when a token is minted
+    import jwt
     payload = {
         "iat": int(time.time()) - 60,  # issued at time
         "exp": int(time.time()) + 540,  # expires after 9 minutes (GitHub requires <10min)
@@ -35,9 +59,55 @@ def generate_jwt(app_id: str, private_key: str) -> str:
         token = token.decode("utf-8")
     return token
 
+def get_app_jwt(app_id: str, private_key: str) -> str:
+    """
+    Return a cached GitHub App JWT, signing a new one only when the cached one is close to expiry.
+    """
+    key = (str(app_id), private_key)
+    now = time.time()
+    with _jwt_cache_lock:
+        cached = _jwt_cache.get(key)
+        if cached and cached[1] - JWT_REFRESH_MARGIN > now:
+            return cached[0]
+        token = generate_jwt(app_id, private_key)
+        # Matches the exp claim set in generate_jwt
+        _jwt_cache[key] = (token, now + 540)
+        return token
+
+def _parse_expires_at(value):
+    """
+    Parse GitHub's ISO 8601 expires_at (e.g. 2016-07-11T22:14:10Z) into a Unix timestamp.
+    """
+    if not value:
+        return time.time() + DEFAULT_INSTALLATION_TOKEN_LIFETIME
+    try:
+        return datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        logger.warning(f"Unparseable installation token expires_at: {value}")
+        return time.time() + DEFAULT_INSTALLATION_TOKEN_LIFETIME
+
+def _cached_installation_token(installation_id):
+    with _token_cache_lock:
+        cached = _token_cache.get(installation_id)
+    if cached and cached[1] - INSTALLATION_TOKEN_REFRESH_MARGIN > time.time():
+        return cached[0]
+    return None
+
+def clear_token_cache():
+    """
+    Drop all cached JWTs and installation tokens.
+    """
+    with _jwt_cache_lock:
+        _jwt_cache.clear()
+    with _token_cache_lock:
+        _token_cache.clear()
+        _token_key_locks.clear()
+
+@telemetry.traced("github.installation_token")
 def get_installation_token(app_id=None, private_key_pem=None, installation_id=None):
     """
     Exchange JWT for a GitHub App installation access token.
+    Tokens are cached per installation and reused until shortly before their expires_at.
     If any argument is None, fetch from secrets/APP_METADATA.
     """
     if app_id is None:
@@ -49,37 +119,101 @@ def get_installation_token(app_id=None, private_key_pem=None, installation_id=No
     if not installation_id:
         logger.error("Installation ID is required but not found.")
         raise Exception("Installation ID is required.")
-    jwt_token = generate_jwt(app_id, private_key_pem)
-    headers = {
-        "Authorization": f"Bearer {jwt_token}",
-        "Accept": "application/vnd.github+json"
-    }
-    url = f"{GITHUB_API_URL}/app/installations/{installation_id}/access_tokens"
-    response = requests.post(url, headers=headers)
-    if response.status_code != 201:
-        logger.error(f"Failed to get installation token: {response.status_code} {response.text}")
-        raise Exception("Failed to get installation token")
-    return response.json()["token"]
+    token = _cached_installation_token(installation_id)
+    if token:
+        return token
+    with _token_cache_lock:
+        key_lock = _token_key_locks.setdefault(installation_id, threading.Lock())
+    with key_lock:
+        # Another caller may have refreshed the token while we waited for the lock
+        token = _cached_installation_token(installation_id)
+        if token:
+            return token
+        jwt_token = get_app_jwt(app_id, private_key_pem)
+        headers = {
+            "Authorization": f"Bearer {jwt_token}",
+            "Accept": "application/vnd.github+json"
+        }
+        url = f"{GITHUB_API_URL}/app/installations/{installation_id}/access_tokens"
+        response = http_client.post(url, endpoint="github", headers=headers)
+        if response.status_code != 201:
+            logger.error(f"Failed to get installation token: {response.status_code} {response.text}")
+            raise Exception("Failed to get installation token")
+        token_json = response.json()
+        token = token_json["token"]
+        expires_at = _parse_expires_at(token_json.get("expires_at"))
+        with _token_cache_lock:
+            _token_cache[installation_id] = (token, expires_at)
+        rate_limit_governor.register_token(token, installation_id, expires_at)
+        return token
 
+@telemetry.traced("github.fetch_pr_data")
 def fetch_pr_data(owner, repo, pr_number, token):
     """
     Fetch PR diff and commit message from GitHub.
     """
     url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/pulls/{pr_number}"
     headers = {"Authorization": f"token {token}", "Accept": "application/vnd.github.v3+json"}
-    pr = requests.get(url, headers=headers)
+    pr = http_client.get(url, endpoint="github", headers=headers)
     if pr.status_code != 200:
         logger.error(f"Failed to fetch PR data: {pr.status_code} {pr.text}")
         raise Exception("Failed to fetch PR data")
     pr_json = pr.json()
     diff_url = pr_json["diff_url"]
-    diff = requests.get(diff_url, headers=headers)
+    diff = http_client.get(diff_url, endpoint="github_diff", headers=headers)
     if diff.status_code != 200:
         logger.error(f"Failed to fetch PR diff: {diff.status_code} {diff.text}")
         raise Exception("Failed to fetch PR diff")
     commit_msg = pr_json["title"]
     return diff.text, commit_msg
 
+@telemetry.traced("github.fetch_compare_diff")
+def fetch_compare_diff(owner, repo, base, head, token):
+    """
+    Fetch the diff introduced between two commits via the compare API.
+    Returns None when head does not fast-forward from base (force-push or rebase),
+    so the caller can fall back to a full review.
+    """
+    url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/compare/{base}...{head}"
+    headers = {"Authorization": f"token {token}", "Accept": "application/vnd.github.v3+json"}
+    # Only the status is needed here; keep the commit list small
+    response = http_client.get(url, endpoint="github", headers=headers, params={"per_page": 1})
+    if response.status_code == 404:
+        logger.info(f"Compare base {base} not found (likely force-pushed); falling back to full review.")
+        return None
+    if response.status_code != 200:
+        logger.error(f"Failed to compare commits: {response.status_code} {response.text}")
+        raise Exception("Failed to compare commits")
+    status = response.json().get("status")
+    if status == "identical":
+        return ""
+    if status != "ahead":
+        logger.info(f"Compare status '{status}' for {base}...{head}; falling back to full review.")
+        return None
+    headers["Accept"] = "application/vnd.github.v3.diff"
+    diff = http_client.get(url, endpoint="github_diff", headers=headers)
+    if diff.status_code != 200:
+        logger.error(f"Failed to fetch compare diff: {diff.status_code} {diff.text}")
+        raise Exception("Failed to fetch compare diff")
+    return diff.text
+
+def stream_pr_diff(owner, repo, pr_number, token):
+    """
+    Stream the PR diff from GitHub and yield parsed FileDiff records one file at a time,
+    so multi-megabyte diffs are never held in memory as a single string.
+    """
+    url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/pulls/{pr_number}"
+    headers = {"Authorization": f"token {token}", "Accept": "application/vnd.github.v3.diff"}
+    response = http_client.get(url, endpoint="github_diff", headers=headers, stream=True)
+    try:
+        if response.status_code != 200:
+            logger.error(f"Failed to fetch PR diff: {response.status_code} {response.text}")
+            raise Exception("Failed to fetch PR diff")
+        yield from parse_diff(response.iter_lines(decode_unicode=True))
+    finally:
+        response.close()
+
+@telemetry.traced("github.post_pr_comment")
 def post_pr_comment(owner, repo, pr_number, comment, token):
     """
     Post a comment to a pull request using the GitHub App installation token.
@@ -87,24 +221,184 @@ def post_pr_comment(owner, repo, pr_number, comment, token):
     url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/issues/{pr_number}/comments"
     headers = {"Authorization": f"token {token}", "Accept": "application/vnd.github.v3+json"}
     data = {"body": comment}
-    response = requests.post(url, headers=headers, data=json.dumps(data))
+    response = http_client.post(url, endpoint="github", headers=headers, data=json.dumps(data))
     if response.status_code != 201:
         logger.error(f"Failed to post PR comment: {response.status_code} {response.text}")
         raise Exception("Failed to post PR comment")
     return response.status_code
 
-def get_pr_comments(owner, repo, pr_number, token):
+@telemetry.traced("github.create_pr_comment")
+def create_pr_comment(owner, repo, pr_number, comment, token):
     """
-    Fetch all comments for a pull request.
+    Post a comment to a pull request and return its id, so it can be edited in place later.
     """
     url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/issues/{pr_number}/comments"
     headers = {"Authorization": f"token {token}", "Accept": "application/vnd.github.v3+json"}
-    response = requests.get(url, headers=headers)
+    response = http_client.post(url, endpoint="github", headers=headers, data=json.dumps({"body": comment}))
+    if response.status_code != 201:
+        logger.error(f"Failed to post PR comment: {response.status_code} {response.text}")
+        raise Exception("Failed to post PR comment")
+    return response.json()["id"]
+
+@telemetry.traced("github.create_pr_review")
+def create_pr_review(owner, repo, pr_number, comments, body, token, commit_id=None):
+    """
+    Submit one pull request review (event COMMENT) carrying a batch of line comments.
+    Args:
+        comments (list): Review comment dicts (path, line, side, body, optional start_line/start_side).
+        body (str): The review's summary text.
+        commit_id (str): Head SHA the line numbers refer to (defaults to the PR's latest commit).
+    Returns:
+        int: The review id.
+    """
+    url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/pulls/{pr_number}/reviews"
+    headers = {"Authorization": f"token {token}", "Accept": "application/vnd.github.v3+json"}
+    data = {"event": "COMMENT", "body": body, "comments": comments}
+    if commit_id:
+        data["commit_id"] = commit_id
+    response = http_client.post(url, endpoint="github", headers=headers, data=json.dumps(data))
     if response.status_code != 200:
-        logger.error(f"Failed to fetch PR comments: {response.status_code} {response.text}")
-        raise Exception("Failed to fetch PR comments")
+        logger.error(f"Failed to create PR review: {response.status_code} {response.text}")
+        raise Exception(f"Failed to create PR review: {response.status_code}")
+    return response.json().get("id")
+
+@telemetry.traced("github.get_issue_comment")
+def get_issue_comment(owner, repo, comment_id, token):
+    """
+    Fetch one issue comment by id, or None if it no longer exists.
+    """
+    url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/issues/comments/{comment_id}"
+    headers = {"Authorization": f"token {token}", "Accept": "application/vnd.github.v3+json"}
+    response = http_client.get(url, endpoint="github", headers=headers)
+    if response.status_code == 404:
+        return None
+    if response.status_code != 200:
+        logger.error(f"Failed to fetch PR comment {comment_id}: {response.status_code} {response.text}")
+        raise Exception("Failed to fetch PR comment")
     return response.json()
 
+@telemetry.traced("github.update_pr_comment")
+def update_pr_comment(owner, repo, comment_id, comment, token):
+    """
+    Replace the body of an existing issue comment.
+    """
+    url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/issues/comments/{comment_id}"
+    headers = {"Authorization": f"token {token}", "Accept": "application/vnd.github.v3+json"}
+    # Sending the same body twice is harmless, so transient failures are retried
+    response = http_client.patch(url, endpoint="github", idempotent=True, headers=headers, data=json.dumps({"body": comment}))
+    if response.status_code != 200:
+        logger.error(f"Failed to update PR comment {comment_id}: {response.status_code} {response.text}")
+        raise Exception("Failed to update PR comment")
+    return response.status_code
+
+def _page_links(response):
+    """
+    Parse the Link header into {rel: url}.
+    """
+    link = response.headers.get("Link")
+    if not isinstance(link, str):
+        return {}
+    return {entry["rel"]: entry["url"] for entry in parse_header_links(link) if "rel" in entry}
+
+def _get_page(url, headers, params, what):
+    response = http_client.get(url, endpoint="github", headers=headers, params=params)
+    if response.status_code != 200:
+        logger.error(f"Failed to fetch {what}: {response.status_code} {response.text}")
+        raise Exception(f"Failed to fetch {what}")
+    return response
+
+def paginate(url, headers, what, params=None, newest_first=False):
+    """
+    Lazily yield the items of a paginated GitHub list endpoint, GITHUB_PER_PAGE at a time.
+    Pages are only requested as the consumer advances, so stopping early skips the remaining pages.
+    Args:
+        url (str): First-page URL.
+        headers (dict): Request headers.
+        what (str): Description used in errors.
+        params (dict): Extra query parameters.
+        newest_first (bool): Yield items in reverse order, starting from the last page.
+    Raises:
+        Exception: If a page cannot be fetched.
+    """
+    params = {"per_page": GITHUB_PER_PAGE, **(params or {})}
+    response = _get_page(url, headers, params, what)
+    first_page = response.json()
+    links = _page_links(response)
+    if not newest_first:
+        yield from first_page
+        while "next" in links:
+            # The next link already carries per_page and the page number
+            response = _get_page(links["next"], headers, None, what)
+            yield from response.json()
+            links = _page_links(response)
+        return
+    last_page = 1
+    if "last" in links:
+        last_page = int(parse_qs(urlsplit(links["last"]).query).get("page", ["1"])[0])
+    for page in range(last_page, 1, -1):
+        yield from reversed(_get_page(url, headers, {**params, "page": page}, what).json())
+    yield from reversed(first_page)
+
+def iter_pr_files(owner, repo, pr_number, token):
+    """
+    Lazily yield the changed files of a pull request (GitHub caps this list at 3000 files).
+    """
+    url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/pulls/{pr_number}/files"
+    headers = {"Authorization": f"token {token}", "Accept": "application/vnd.github.v3+json"}
+    return paginate(url, headers, "PR files")
+
+def iter_pr_comments(owner, repo, pr_number, token, newest_first=False):
+    """
+    Lazily yield the comments of a pull request, oldest first unless newest_first is set.
+    """
+    url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/issues/{pr_number}/comments"
+    headers = {"Authorization": f"token {token}", "Accept": "application/vnd.github.v3+json"}
+    return paginate(url, headers, "PR comments", newest_first=newest_first)
+
+@telemetry.traced("github.get_pr_comments")
+def get_pr_comments(owner, repo, pr_number, token, stop_at=None):
+    """
+    Fetch comments for a pull request, oldest first.
+    With stop_at (a predicate on a comment), pages are read newest-first and reading stops at the
+    newest matching comment; only that comment and the ones after it are returned.
+    """
+    if stop_at is None:
+        return list(iter_pr_comments(owner, repo, pr_number, token))
+    tail = []
+    for comment in iter_pr_comments(owner, repo, pr_number, token, newest_first=True):
+        tail.append(comment)
+        if stop_at(comment):
+            break
+    tail.reverse()
+    return tail
+
+@telemetry.traced("github.detect_pr_languages")
+def detect_pr_languages(owner, repo, pr_number, token):
+    """
+    Detect the languages of a PR in one pass over its changed files, weighted by changed lines.
+    Returns:
+        LanguageReport: Per-file languages and a dominant-language ranking (empty if the files cannot be read).
+    """
+    try:
+        return detect_languages(iter_pr_files(owner, repo, pr_number, token))
+    except Exception:
+        logger.warning("Could not fetch PR files for language detection.")
+        return LanguageReport()
+
+def detect_language_from_files(owner, repo, pr_number, token):
+    """
+    Detect the dominant programming language of a PR (DEFAULT_LANGUAGE if none is recognised).
+    """
+    return detect_pr_languages(owner, repo, pr_number, token).dominant
+
+def get_project_name_from_guidelines(owner, repo, token):
+    """
+    Return project_name from the repo's .guidelines.yml. If not found or error, fallback to repo name.
+    The parsed file is cached per repo and revalidated with If-None-Match.
+    """
+    from api.repo_config import get_repo_config
+    return get_repo_config(owner, repo, token).project_name
+
 def detect_apply_fix_command(comments, approval_users=None):
     """
     Detect if any comment contains '/apply-fix' or is an approval from a user with write access.
@@ -121,27 +415,27 @@ def detect_apply_fix_command(comments, approval_users=None):
     return False
 
 # Placeholder for Copilot integration (or Azure OpenAI with Copilot-like prompt)
+@telemetry.traced("prompt_flow.code_fix")
 def generate_code_fixes_with_copilot(diff, review_comments, prompt_flow_api_key=None):
     """
     Call the deployed Prompt Flow endpoint to generate code fixes based on the diff and review comments.
     Returns a dict mapping filenames to fixed code content.
     """
-    from api.config import CODE_FIX_PROMPT_FLOW_ENDPOINT, CODE_FIX_PROMPT_FLOW_API_KEY
+    from api.config import CODE_FIX_PROMPT_FLOW_ENDPOINT
     endpoint = CODE_FIX_PROMPT_FLOW_ENDPOINT
-    api_key = CODE_FIX_PROMPT_FLOW_API_KEY
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {api_key}"
-    }
+    primary = prompt_flow_client.FlowEndpoint(endpoint, get_secret("prompt-flow-api-key-2"))
     payload = {
         "code_diff": diff,
         "review_suggestions": review_comments
     }
-    response = requests.post(endpoint, headers=headers, json=payload)
-    if response.status_code != 200:
-        logger.error(f"Code fix Prompt Flow failed: {response.status_code} {response.text}")
-        raise Exception(f"Code fix Prompt Flow failed: {response.status_code} {response.text}")
-    result = response.json()
+    try:
+        # Not retried by the HTTP client; the breaker and CODE_FIX_PROMPT_FLOW_FALLBACK_* still apply
+        result = prompt_flow_client.score(
+            primary, payload, fallback=prompt_flow_client.code_fix_fallback(primary), idempotent=False,
+        )
+    except Exception as e:
+        logger.error(f"Code fix Prompt Flow failed: {e}")
+        raise Exception(f"Code fix Prompt Flow failed: {e}")
     # Accept both {"fixed_files": {...}} and direct file dicts
     if "fixed_files" in result and isinstance(result["fixed_files"], dict):
         fixed_files = result["fixed_files"]
@@ -152,49 +446,83 @@ def generate_code_fixes_with_copilot(diff, review_comments, prompt_flow_api_key=
         return {}
     return fixed_files
 
+def git_blob_sha(content):
+    """
+    Git object id of a blob with this content, as GitHub would compute it.
+    """
+    data = content.encode("utf-8") if isinstance(content, str) else content
+    return hashlib.sha1(b"blob %d\0" % len(data) + data).hexdigest()
+
+def _create_blob(owner, repo, path, content, headers):
+    blob_url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/git/blobs"
+    blob_data = {"content": content, "encoding": "utf-8"}
+    blob_resp = http_client.post(blob_url, endpoint="github", idempotent=True, headers=headers, data=json.dumps(blob_data))
+    if blob_resp.status_code != 201:
+        logger.error(f"Failed to create blob for {path}: {blob_resp.status_code} {blob_resp.text}")
+        raise Exception(f"Failed to create blob for {path}")
+    return blob_resp.json()['sha']
+
+@telemetry.traced("github.commit_code_changes")
 def commit_code_changes(owner, repo, branch, files, commit_message, token):
     """
     Commit code changes to the specified branch using the GitHub API.
     files: dict mapping file paths to new content (str)
+    Files identical to the branch (by locally computed blob SHA) are skipped; files up to
+    COMMIT_INLINE_MAX_BYTES are inlined in the tree and larger ones are uploaded as blobs in parallel.
+    Returns the new commit SHA, or the branch head if nothing changed.
     """
     # 1. Get the latest commit SHA of the branch
     ref_url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/git/refs/heads/{branch}"
     headers = {"Authorization": f"token {token}", "Accept": "application/vnd.github.v3+json"}
-    ref_resp = requests.get(ref_url, headers=headers)
+    ref_resp = http_client.get(ref_url, endpoint="github", headers=headers)
     if ref_resp.status_code != 200:
         logger.error(f"Failed to get branch ref: {ref_resp.status_code} {ref_resp.text}")
         raise Exception("Failed to get branch ref")
     latest_commit_sha = ref_resp.json()['object']['sha']
 
-    # 2. Get the tree SHA
-    commit_url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/git/commits/{latest_commit_sha}"
-    commit_resp = requests.get(commit_url, headers=headers)
-    if commit_resp.status_code != 200:
-        logger.error(f"Failed to get commit: {commit_resp.status_code} {commit_resp.text}")
-        raise Exception("Failed to get commit")
-    tree_sha = commit_resp.json()['tree']['sha']
+    # 2. Get the base tree (resolved from the commit) with the blob SHA and mode of every path
+    base_tree_url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/git/trees/{latest_commit_sha}"
+    tree_resp = http_client.get(base_tree_url, endpoint="github", headers=headers, params={"recursive": "1"})
+    if tree_resp.status_code != 200:
+        logger.error(f"Failed to get base tree: {tree_resp.status_code} {tree_resp.text}")
+        raise Exception("Failed to get base tree")
+    base_tree = tree_resp.json()
+    tree_sha = base_tree['sha']
+    # A truncated listing only means some unchanged files may be re-sent
+    base_entries = {entry['path']: entry for entry in base_tree.get('tree', []) if entry.get('type') == 'blob'}
 
-    # 3. Create blobs for each file
-    blob_shas = {}
+    # 3. Skip unchanged files, inline small ones and upload the rest concurrently
+    tree_entries = []
+    uploads = {}
     for path, content in files.items():
-        blob_url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/git/blobs"
-        blob_data = {"content": content, "encoding": "utf-8"}
-        blob_resp = requests.post(blob_url, headers=headers, data=json.dumps(blob_data))
-        if blob_resp.status_code != 201:
-            logger.error(f"Failed to create blob for {path}: {blob_resp.status_code} {blob_resp.text}")
-            raise Exception(f"Failed to create blob for {path}")
-        blob_shas[path] = blob_resp.json()['sha']
+        base_entry = base_entries.get(path)
+        if base_entry is not None and base_entry.get('sha') == git_blob_sha(content):
+            continue
+        entry = {"path": path, "mode": (base_entry or {}).get('mode', "100644"), "type": "blob"}
+        if len(content.encode("utf-8")) <= COMMIT_INLINE_MAX_BYTES:
+            entry["content"] = content
+        else:
+            uploads[path] = content
+        tree_entries.append(entry)
+    if not tree_entries:
+        logger.info(f"No file changes to commit on {owner}/{repo}@{branch}.")
+        return latest_commit_sha
+    if uploads:
+        with ThreadPoolExecutor(max_workers=min(COMMIT_BLOB_MAX_PARALLEL, len(uploads)), thread_name_prefix="blob") as pool:
+            blob_shas = dict(zip(uploads, pool.map(
+                lambda item: _create_blob(owner, repo, item[0], item[1], headers), uploads.items()
+            )))
+        for entry in tree_entries:
+            if entry["path"] in blob_shas:
+                entry["sha"] = blob_shas[entry["path"]]
 
     # 4. Create a new tree
     tree_url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/git/trees"
     tree_data = {
         "base_tree": tree_sha,
-        "tree": [
-            {"path": path, "mode": "100644", "type": "blob", "sha": sha}
-            for path, sha in blob_shas.items()
-        ]
+        "tree": tree_entries
     }
-    tree_resp = requests.post(tree_url, headers=headers, data=json.dumps(tree_data))
+    tree_resp = http_client.post(tree_url, endpoint="github", headers=headers, data=json.dumps(tree_data))
     if tree_resp.status_code != 201:
         logger.error(f"Failed to create tree: {tree_resp.status_code} {tree_resp.text}")
         raise Exception("Failed to create tree")
@@ -207,7 +535,7 @@ def commit_code_changes(owner, repo, branch, files, commit_message, token):
         "tree": new_tree_sha,
         "parents": [latest_commit_sha]
     }
-    commit_resp = requests.post(commit_url, headers=headers, data=json.dumps(commit_data))
+    commit_resp = http_client.post(commit_url, endpoint="github", headers=headers, data=json.dumps(commit_data))
     if commit_resp.status_code != 201:
         logger.error(f"Failed to create commit: {commit_resp.status_code} {commit_resp.text}")
         raise Exception("Failed to create commit")
@@ -216,7 +544,7 @@ def commit_code_changes(owner, repo, branch, files, commit_message, token):
     # 6. Update the branch reference
     update_url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/git/refs/heads/{branch}"
     update_data = {"sha": new_commit_sha}
-    update_resp = requests.patch(update_url, headers=headers, data=json.dumps(update_data))
+    update_resp = http_client.patch(update_url, endpoint="github", headers=headers, data=json.dumps(update_data))
     if update_resp.status_code not in (200, 201):
         logger.error(f"Failed to update branch ref: {update_resp.status_code} {update_resp.text}")
         raise Exception("Failed to update branch ref")
@@ -0,0 +1,257 @@
+# guideline_index.py
+# In-process BM25 retrieval over guidelines_index/, stored in a compact memory-mapped file
+
+import os
+import re
+import mmap
+import json
+import math
+import struct
+import hashlib
+import logging
+import tempfile
+import threading
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+GUIDELINES_INDEX_DIR = os.getenv(
+    "GUIDELINES_INDEX_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "guidelines_index"),
+)
+# Built on first use if missing or stale; point this at a prebuilt file to skip the build
+GUIDELINES_INDEX_FILE = os.getenv("GUIDELINES_INDEX_FILE", os.path.join(tempfile.gettempdir(), "guidelines.bm25"))
+# "local" passes retrieved_docs to Prompt Flow; "remote" leaves retrieval to the flow's AI Search node
+GUIDELINE_RETRIEVAL = os.getenv("GUIDELINE_RETRIEVAL", "local")
+GUIDELINE_TOP_K = int(os.getenv("GUIDELINE_TOP_K", "3"))
+GUIDELINE_CHUNK_CHARS = 800
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+SOURCE_EXTENSIONS = (".txt", ".md")
+# Files named e.g. "python-guidelines.txt" are tagged "python"; these tags, and untagged files
+# (any other name), apply to every review
+GENERAL_TAGS = {"general", "common", "all", ""}
+
+# Format version 2: files not named "<tag>-guidelines" are untagged ("")
+MAGIC = b"GBM25\x00\x02\x00"
+HEADER = struct.Struct("<8sII")  # magic, metadata length, postings length
+POSTING = struct.Struct("<If")  # doc id, precomputed BM25 term weight
+
+_TOKEN_RE = re.compile(r"[a-z0-9_]+")
+_STOPWORDS = frozenset("a an and are as at be by for from if in is it of on or the to use with".split())
+
+def tokenize(text):
+    return [token for token in _TOKEN_RE.findall(text.lower()) if len(token) > 1 and token not in _STOPWORDS]
+
+@dataclass
+class Passage:
+    text: str
+    source: str
+    tag: str
+    score: float
+
+def _source_tag(filename):
+    stem = os.path.splitext(filename)[0].lower()
+    return stem[:-len("-guidelines")] if stem.endswith("-guidelines") else ""
+
+def chunk_text(text, max_chars=GUIDELINE_CHUNK_CHARS):
+    """
+    Split a guideline document into passages on headings and blank lines, packing paragraphs
+    up to max_chars so each passage stays on one topic.
+    """
+    chunks = []
+    current = []
+    size = 0
+    for block in re.split(r"\n\s*\n|\n(?=#{1,6} )", text):
+        block = block.strip()
+        if not block:
+            continue
+        starts_section = block.startswith("#")
+        if current and (starts_section or size + len(block) > max_chars):
+            chunks.append("\n\n".join(current))
+            current, size = [], 0
+        current.append(block)
+        size += len(block)
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+def _read_sources(source_dir):
+    sources = []
+    if not os.path.isdir(source_dir):
+        return sources
+    for name in sorted(os.listdir(source_dir)):
+        if name.lower().endswith(SOURCE_EXTENSIONS):
+            with open(os.path.join(source_dir, name), encoding="utf-8") as f:
+                sources.append((name, f.read()))
+    return sources
+
+def _sources_digest(sources):
+    # The format is part of the digest, so cached reviews built with an older index are not reused
+    digest = hashlib.sha256(MAGIC)
+    for name, text in sources:
+        digest.update(f"{name}\0{len(text)}\0".encode())
+        digest.update(text.encode("utf-8"))
+    return digest.hexdigest()
+
+def build_index(source_dir=GUIDELINES_INDEX_DIR, path=GUIDELINES_INDEX_FILE, sources=None):
+    """
+    Chunk the guideline files, build the inverted index and write it to `path`.
+    Each posting stores its final BM25 term weight, so a query is a sum of lookups.
+    """
+    sources = _read_sources(source_dir) if sources is None else sources
+    docs = []
+    doc_terms = []
+    for name, text in sources:
+        tag = _source_tag(name)
+        for chunk in chunk_text(text):
+            docs.append({"source": name, "tag": tag, "text": chunk})
+            doc_terms.append(tokenize(chunk))
+    avgdl = (sum(len(terms) for terms in doc_terms) / len(docs)) if docs else 0.0
+    postings = {}  # term -> {doc_id: tf}
+    for doc_id, terms in enumerate(doc_terms):
+        for term in terms:
+            postings.setdefault(term, {}).setdefault(doc_id, 0)
+            postings[term][doc_id] += 1
+    vocabulary = {}
+    blob = bytearray()
+    for term in sorted(postings):
+        docs_with_term = postings[term]
+        idf = math.log(1 + (len(docs) - len(docs_with_term) + 0.5) / (len(docs_with_term) + 0.5))
+        vocabulary[term] = [len(blob) // POSTING.size, len(docs_with_term)]
+        for doc_id, tf in sorted(docs_with_term.items()):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * len(doc_terms[doc_id]) / avgdl)
+            blob += POSTING.pack(doc_id, idf * tf * (BM25_K1 + 1) / (tf + norm))
+    meta = json.dumps({
+        "digest": _sources_digest(sources),
+        "docs": docs,
+        "terms": vocabulary,
+    }, separators=(",", ":")).encode("utf-8")
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, len(meta), len(blob)))
+        f.write(meta)
+        f.write(blob)
+    os.replace(tmp_path, path)
+    logger.info(f"Built guideline index with {len(docs)} passages and {len(vocabulary)} terms at {path}.")
+    return path
+
+class GuidelineIndex:
+    """
+    Read-only BM25 index over a memory-mapped index file.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if os.fstat(f.fileno()).st_size else None
+        if self._mmap is None:
+            raise ValueError(f"Empty guideline index: {path}")
+        magic, meta_len, postings_len = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Not a guideline index: {path}")
+        meta = json.loads(self._mmap[HEADER.size:HEADER.size + meta_len])
+        self.digest = meta["digest"]
+        self.docs = meta["docs"]
+        self._terms = meta["terms"]
+        self._postings = memoryview(self._mmap)[HEADER.size + meta_len:HEADER.size + meta_len + postings_len]
+
+    def __len__(self):
+        return len(self.docs)
+
+    def search(self, query, top_k=GUIDELINE_TOP_K, tags=None):
+        """
+        Return the top_k passages for a query. With tags, passages tagged with another
+        language/project are excluded; general and untagged guidelines always qualify.
+        If none of those match, the result is empty rather than another language's guidelines.
+        """
+        scores = {}
+        for term in set(tokenize(query)):
+            entry = self._terms.get(term)
+            if entry is None:
+                continue
+            start, count = entry
+            view = self._postings[start * POSTING.size:(start + count) * POSTING.size]
+            for doc_id, weight in POSTING.iter_unpack(view):
+                scores[doc_id] = scores.get(doc_id, 0.0) + weight
+        if tags:
+            allowed = {tag.lower() for tag in tags if tag} | GENERAL_TAGS
+            scores = {doc_id: score for doc_id, score in scores.items() if self.docs[doc_id]["tag"] in allowed}
+        ranked = sorted(scores.items(), key=lambda item: (-item[1], item[0]))[:top_k]
+        return [
+            Passage(text=self.docs[doc_id]["text"], source=self.docs[doc_id]["source"], tag=self.docs[doc_id]["tag"], score=score)
+            for doc_id, score in ranked
+        ]
+
+    def close(self):
+        self._postings.release()
+        self._mmap.close()
+
+_index = None
+_index_lock = threading.Lock()
+
+def get_guideline_index():
+    """
+    Return the process-wide index, (re)building the file first if it is missing or older than the sources.
+    """
+    global _index
+    with _index_lock:
+        if _index is None:
+            sources = _read_sources(GUIDELINES_INDEX_DIR)
+            index = None
+            if os.path.exists(GUIDELINES_INDEX_FILE):
+                try:
+                    index = GuidelineIndex(GUIDELINES_INDEX_FILE)
+                except Exception as e:
+                    logger.warning(f"Ignoring unreadable guideline index {GUIDELINES_INDEX_FILE}: {e}")
+            # Without sources on disk (e.g. a prebuilt file deployed alone) the file is trusted as-is
+            if sources and (index is None or index.digest != _sources_digest(sources)):
+                if index is not None:
+                    index.close()
+                build_index(GUIDELINES_INDEX_DIR, GUIDELINES_INDEX_FILE, sources=sources)
+                index = GuidelineIndex(GUIDELINES_INDEX_FILE)
+            if index is None:
+                raise Exception(f"No guideline sources in {GUIDELINES_INDEX_DIR} and no index at {GUIDELINES_INDEX_FILE}")
+            _index = index
+        return _index
+
+def reset_guideline_index():
+    global _index
+    with _index_lock:
+        if _index is not None:
+            _index.close()
+        _index = None
+
+def format_passages(passages):
+    return "\n\n---\n\n".join(f"[{p.source}]\n{p.text}" for p in passages)
+
+def retrieve_guidelines(language, project_name, query_text="", top_k=GUIDELINE_TOP_K):
+    """
+    Retrieve the guidelines for a review as the `retrieved_docs` string for Prompt Flow.
+    Returns "" when local retrieval is disabled, fails or finds no guidelines for the language or project,
+    so the flow falls back to its own retriever.
+    """
+    if GUIDELINE_RETRIEVAL != "local":
+        return ""
+    try:
+        index = get_guideline_index()
+        query = " ".join(filter(None, [language, project_name, "guidelines standards", query_text]))
+        return format_passages(index.search(query, top_k=top_k, tags=[language, project_name]))
+    except Exception as e:
+        logger.warning(f"Local guideline retrieval failed: {e}")
+        return ""
+
+def index_version():
+    """
+    Digest of the loaded index, for review cache keys (empty when retrieval is remote or unavailable).
+    """
+    if GUIDELINE_RETRIEVAL != "local":
+        return ""
+    try:
+        return get_guideline_index().digest[:12]
+    except Exception:
+        return ""
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    build_index()
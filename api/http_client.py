@@ -0,0 +1,124 @@
+# http_client.py
+# Shared, pooled HTTP client for all GitHub and Prompt Flow calls
+
+import os
+import random
+import time
+import logging
+import threading
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from api.rate_limit import governor
+
+logger = logging.getLogger(__name__)
+
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "20"))
+MAX_RETRIES = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+RETRY_BACKOFF = float(os.getenv("HTTP_RETRY_BACKOFF_SECONDS", "0.5"))
+RETRY_STATUSES = {502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "PUT", "DELETE", "OPTIONS"}
+# Requests to these hosts are paced by the GitHub rate-limit governor
+GITHUB_HOSTS = {"api.github.com"}
+
+# (connect, read) timeouts in seconds, per endpoint class
+TIMEOUTS = {
+    "default": (3.05, 30),
+    "github": (3.05, 15),
+    "github_diff": (3.05, 60),
+    "prompt_flow": (3.05, 180),
+}
+
+_sessions = {}  # "scheme://host" -> requests.Session
+_sessions_lock = threading.Lock()
+
+def get_session(url):
+    """
+    Return the keep-alive session for the URL's host, creating it on first use.
+    Each host gets its own connection pool so GitHub and Prompt Flow traffic do not compete.
+    """
+    parts = urlsplit(url)
+    key = f"{parts.scheme}://{parts.netloc}"
+    with _sessions_lock:
+        session = _sessions.get(key)
+        if session is None:
+            session = requests.Session()
+            # Retries are handled in request() so they can be limited to idempotent calls
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=POOL_MAXSIZE, max_retries=0)
+            session.mount(f"{parts.scheme}://", adapter)
+            _sessions[key] = session
+        return session
+
+def close_sessions():
+    """
+    Close all pooled sessions (used by tests and on worker shutdown).
+    """
+    with _sessions_lock:
+        for session in _sessions.values():
+            session.close()
+        _sessions.clear()
+
+def _backoff_delay(attempt):
+    """
+    Exponential backoff with full jitter.
+    """
+    return random.uniform(0, RETRY_BACKOFF * (2 ** attempt))
+
+def request(method, url, endpoint="default", retries=None, idempotent=None, **kwargs):
+    """
+    Send an HTTP request over the pooled session for the URL's host.
+    Args:
+        method (str): HTTP method.
+        url (str): Request URL.
+        endpoint (str): Key into TIMEOUTS selecting connect/read timeouts.
+        retries (int): Retry budget for transient failures (defaults to MAX_RETRIES).
+        idempotent (bool): Override whether the call is safe to retry (defaults by method).
+    Returns:
+        requests.Response: The final response (possibly a retryable status once retries are exhausted).
+    Raises:
+        requests.RequestException: If the request cannot be sent after retries.
+    """
+    method = method.upper()
+    kwargs.setdefault("timeout", TIMEOUTS.get(endpoint, TIMEOUTS["default"]))
+    if idempotent is None:
+        idempotent = method in IDEMPOTENT_METHODS
+    retries = (MAX_RETRIES if retries is None else retries) if idempotent else 0
+    session = get_session(url)
+    governed = urlsplit(url).hostname in GITHUB_HOSTS
+    headers = kwargs.get("headers")
+    attempt = 0
+    while True:
+        if governed:
+            # Waits for budget, or raises RateLimitExceeded if the wait would be too long
+            governor.before_request(headers)
+        try:
+            response = session.request(method, url, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            if attempt >= retries:
+                raise
+            logger.warning(f"{method} {url} failed ({e}), retrying ({attempt+1}/{retries})")
+        else:
+            if governed and governor.after_response(headers, response):
+                if attempt >= retries:
+                    return response
+                # The governor now blocks this installation until Retry-After/reset; retry through it
+                logger.warning(f"{method} {url} was rate limited, retrying ({attempt+1}/{retries})")
+                response.close()
+                attempt += 1
+                continue
+            if response.status_code not in RETRY_STATUSES or attempt >= retries:
+                return response
+            logger.warning(f"{method} {url} returned {response.status_code}, retrying ({attempt+1}/{retries})")
+            # Return the connection to the pool now; a streamed body would otherwise hold it until GC
+            response.close()
+        time.sleep(_backoff_delay(attempt))
+        attempt += 1
+
+def get(url, endpoint="default", **kwargs):
+    return request("GET", url, endpoint=endpoint, **kwargs)
+
+def post(url, endpoint="default", **kwargs):
+    return request("POST", url, endpoint=endpoint, **kwargs)
+
+def patch(url, endpoint="default", **kwargs):
+    return request("PATCH", url, endpoint=endpoint, **kwargs)
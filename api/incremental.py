@@ -0,0 +1,49 @@
+# incremental.py
+# Helpers for incremental reviews of synchronize pushes
+
+import os
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+INCREMENTAL_REVIEW_ENABLED = os.getenv("INCREMENTAL_REVIEW", "true").lower() == "true"
+
+# Hidden marker appended to every review comment so later pushes can find the prior review
+REVIEW_MARKER_RE = re.compile(r"<!-- ai-code-review:head=([0-9a-f]{7,40}) -->")
+
+def review_marker(head_sha):
+    return f"<!-- ai-code-review:head={head_sha} -->" if head_sha else ""
+
+def find_prior_review(comments):
+    """
+    Return the most recent bot review comment (the last one carrying a review marker), or None.
+    """
+    for comment in reversed(comments or []):
+        match = REVIEW_MARKER_RE.search(comment.get("body") or "")
+        if match:
+            return {"url": comment.get("html_url"), "head_sha": match.group(1)}
+    return None
+
+def incremental_payload_shas(data):
+    """
+    Return (before, after) for a synchronize event when incremental review is enabled, else (None, None).
+    """
+    if not INCREMENTAL_REVIEW_ENABLED or data.get("action") != "synchronize":
+        return None, None
+    before, after = data.get("before"), data.get("after")
+    # An all-zero before SHA means there is no previous head to compare against
+    if not before or not after or set(before) == {"0"}:
+        return None, None
+    return before, after
+
+def incremental_header(before, after, prior_review=None):
+    """
+    Heading for an incremental review, linking the prior review when one is known.
+    """
+    header = f"### 🔄 Incremental review of `{before[:7]}..{after[:7]}`\n"
+    if prior_review and prior_review.get("url"):
+        header += f"Follows up on the [previous review]({prior_review['url']}); only changes pushed since then are reviewed.\n"
+    else:
+        header += "Only changes pushed since the previous review are covered.\n"
+    return header
@@ -0,0 +1,182 @@
+# inline_review.py
+# Anchor review findings to diff lines and submit them as batched pull request reviews
+
+import os
+import re
+import json
+import logging
+from dataclasses import dataclass
+from api import github_api
+
+logger = logging.getLogger(__name__)
+
+# Post findings the flow lists under "Inline findings" as line comments instead of in the summary
+REVIEW_INLINE_COMMENTS = os.getenv("REVIEW_INLINE_COMMENTS", "true").lower() == "true"
+# Comments per POST /pulls/{n}/reviews call, and the JSON size a batch may reach before it is split
+REVIEW_INLINE_BATCH_SIZE = int(os.getenv("REVIEW_INLINE_BATCH_SIZE", "50"))
+REVIEW_INLINE_BATCH_BYTES = int(os.getenv("REVIEW_INLINE_BATCH_BYTES", "262144"))
+# Upper bound on inline comments per review; the rest stay in the summary
+REVIEW_INLINE_MAX_COMMENTS = int(os.getenv("REVIEW_INLINE_MAX_COMMENTS", "100"))
+
+# The prompt asks for a "### 📍 Inline findings" section with one "- `path:line` message" item per finding
+FINDINGS_HEADING_RE = re.compile(r"^(#{2,4})\s*(?:📍\s*)?inline findings\s*:?\s*$", re.IGNORECASE)
+HEADING_RE = re.compile(r"^(#{1,6})\s")
+FINDING_RE = re.compile(r"^\s*[-*]\s+`(?P<path>[^`]+?):(?P<start>\d+)(?:-(?P<end>\d+))?`\s*(?:[—–:-]\s*)?(?P<body>\S.*)$")
+
+@dataclass
+class Finding:
+    path: str
+    line: int
+    body: str
+    start_line: int = None
+
+    def as_markdown(self):
+        lines = f"{self.start_line}-{self.line}" if self.start_line else f"{self.line}"
+        return f"- `{self.path}:{lines}` {self.body}"
+
+@dataclass
+class InlineComment:
+    """
+    A line comment on the new (RIGHT) side of the diff, as accepted by the Reviews API.
+    """
+    path: str
+    line: int
+    body: str
+    start_line: int = None
+
+    def to_api(self):
+        comment = {"path": self.path, "line": self.line, "side": "RIGHT", "body": self.body}
+        if self.start_line:
+            comment.update(start_line=self.start_line, start_side="RIGHT")
+        return comment
+
+def _normalize_path(path):
+    path = path.strip()
+    for prefix in ("./", "b/"):
+        if path.startswith(prefix):
+            path = path[len(prefix):]
+    return path
+
+def extract_findings(review):
+    """
+    Split review text into (text without the inline findings sections, [Finding]).
+    Items that do not look like "- `path:line` message" stay in the text.
+    """
+    kept, findings = [], []
+    section_level = None
+    for line in (review or "").split("\n"):
+        heading = FINDINGS_HEADING_RE.match(line.strip())
+        if heading:
+            section_level = len(heading.group(1))
+            continue
+        other_heading = HEADING_RE.match(line)
+        if section_level is not None and other_heading and len(other_heading.group(1)) <= section_level:
+            section_level = None
+        if section_level is not None:
+            match = FINDING_RE.match(line)
+            if match:
+                start, end = int(match.group("start")), match.group("end")
+                findings.append(Finding(
+                    path=_normalize_path(match.group("path")),
+                    line=int(end) if end else start,
+                    body=match.group("body").strip(),
+                    start_line=start if end and int(end) > start else None,
+                ))
+                continue
+            if not line.strip():
+                continue
+        kept.append(line)
+    return "\n".join(kept).strip(), findings
+
+def commentable_lines(file_diff):
+    """
+    New-side line numbers a review comment can be attached to (added and context lines),
+    each mapped to the index of its hunk so multi-line comments stay inside one hunk.
+    """
+    lines = {}
+    for index, hunk in enumerate(file_diff.hunks):
+        new_line = hunk.new_start
+        for line in hunk.lines:
+            prefix = line[:1]
+            if prefix in ("+", " "):
+                lines[new_line] = index
+                new_line += 1
+    return lines
+
+def map_findings(findings, diff_files, max_comments=None):
+    """
+    Anchor findings to lines of the parsed diff.
+    Returns:
+        tuple: ([InlineComment], [Finding that could not be anchored]).
+    """
+    max_comments = REVIEW_INLINE_MAX_COMMENTS if max_comments is None else max_comments
+    targets = {}
+    for file_diff in diff_files:
+        if file_diff.status != "removed" and not file_diff.is_binary:
+            targets[file_diff.path] = file_diff
+    comments, unmapped = [], []
+    line_maps = {}
+    for finding in findings:
+        file_diff = targets.get(finding.path)
+        if file_diff is None or len(comments) >= max_comments:
+            unmapped.append(finding)
+            continue
+        lines = line_maps.get(finding.path)
+        if lines is None:
+            lines = line_maps[finding.path] = commentable_lines(file_diff)
+        if finding.line not in lines:
+            unmapped.append(finding)
+            continue
+        start_line = finding.start_line
+        if start_line is not None and lines.get(start_line) != lines[finding.line]:
+            # A range must start inside the same hunk; anchor to its last line instead
+            start_line = None
+        comments.append(InlineComment(finding.path, finding.line, finding.body, start_line))
+    return comments, unmapped
+
+def batches(comments, max_comments=None, max_bytes=None):
+    """
+    Split comments into review batches of at most max_comments comments and roughly max_bytes of JSON.
+    """
+    max_comments = REVIEW_INLINE_BATCH_SIZE if max_comments is None else max_comments
+    max_bytes = REVIEW_INLINE_BATCH_BYTES if max_bytes is None else max_bytes
+    batch, size = [], 0
+    for comment in comments:
+        comment_size = len(json.dumps(comment.to_api()).encode("utf-8"))
+        if batch and (len(batch) >= max_comments or size + comment_size > max_bytes):
+            yield batch
+            batch, size = [], 0
+        batch.append(comment)
+        size += comment_size
+    if batch:
+        yield batch
+
+def findings_section(findings):
+    """
+    Markdown listing findings that were not posted inline ("" if none).
+    """
+    if not findings:
+        return ""
+    return "### 📍 Other findings\n" + "\n".join(finding.as_markdown() for finding in findings)
+
+def post_inline_comments(owner, repo, pr_number, comments, token, commit_id=None):
+    """
+    Submit comments as as few reviews as the batch limits allow (usually one request).
+    Returns:
+        tuple: (number of comments posted, [Finding] for batches that were rejected).
+    """
+    chunks = list(batches(comments))
+    posted, failed = 0, []
+    for index, batch in enumerate(chunks, start=1):
+        part = f" (part {index}/{len(chunks)})" if len(chunks) > 1 else ""
+        body = f"🤖 {len(batch)} inline finding{'s' if len(batch) != 1 else ''}{part}; see the review comment for the summary."
+        try:
+            github_api.create_pr_review(
+                owner, repo, pr_number, [comment.to_api() for comment in batch], body, token, commit_id=commit_id,
+            )
+            posted += len(batch)
+        except Exception as e:
+            # GitHub rejects the whole batch if any line is outside the PR diff; keep those findings in the summary
+            logger.warning(f"Failed to post {len(batch)} inline comments on PR #{pr_number}: {e}")
+            failed.extend(Finding(c.path, c.line, c.body, c.start_line) for c in batch)
+    return posted, failed
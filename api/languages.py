@@ -0,0 +1,104 @@
+# languages.py
+# Single-pass, change-weighted language detection for pull request files
+
+import os
+from dataclasses import dataclass, field
+
+# Used when no file in the PR maps to a known language
+DEFAULT_LANGUAGE = os.getenv("DEFAULT_REVIEW_LANGUAGE", "python")
+
+EXTENSION_LANGUAGES = {
+    ".py": "python", ".pyi": "python", ".pyx": "python",
+    ".js": "javascript", ".jsx": "javascript", ".mjs": "javascript", ".cjs": "javascript",
+    ".ts": "typescript", ".tsx": "typescript", ".mts": "typescript", ".cts": "typescript",
+    ".java": "java",
+    ".cs": "csharp",
+    ".go": "go",
+    ".rb": "ruby", ".rake": "ruby", ".gemspec": "ruby",
+    ".php": "php",
+    ".cpp": "cpp", ".cc": "cpp", ".cxx": "cpp", ".hpp": "cpp", ".hh": "cpp", ".hxx": "cpp", ".h": "cpp",
+    ".c": "c",
+    ".swift": "swift",
+    ".kt": "kotlin", ".kts": "kotlin",
+    ".rs": "rust",
+    ".scala": "scala",
+    ".sh": "shell", ".bash": "shell", ".zsh": "shell",
+    ".ps1": "powershell",
+    ".sql": "sql",
+    ".tf": "terraform",
+}
+
+# Exact file names that carry no (or a misleading) extension
+FILENAME_LANGUAGES = {
+    "Dockerfile": "dockerfile",
+    "Makefile": "makefile",
+    "Gemfile": "ruby",
+    "Rakefile": "ruby",
+    "Podfile": "ruby",
+    "Jenkinsfile": "groovy",
+    "CMakeLists.txt": "cmake",
+    "BUILD": "starlark",
+    "BUILD.bazel": "starlark",
+    "WORKSPACE": "starlark",
+}
+
+def language_for_path(path):
+    """
+    Map a file path to a language via the precomputed tables, or None if unknown.
+    """
+    name = os.path.basename(path)
+    language = FILENAME_LANGUAGES.get(name)
+    if language is not None:
+        return language
+    return EXTENSION_LANGUAGES.get(os.path.splitext(name)[1].lower())
+
+@dataclass
+class LanguageReport:
+    """
+    Per-file languages and changed-line weights for a pull request.
+    """
+    files: dict = field(default_factory=dict)  # path -> language
+    changes: dict = field(default_factory=dict)  # path -> changed lines
+    weights: dict = field(default_factory=dict)  # language -> changed lines
+
+    @property
+    def ranking(self):
+        """
+        Languages ordered by changed lines, heaviest first (ties keep first-seen order).
+        """
+        return sorted(self.weights, key=lambda language: -self.weights[language])
+
+    @property
+    def dominant(self):
+        ranking = self.ranking
+        return ranking[0] if ranking else DEFAULT_LANGUAGE
+
+    def dominant_for(self, paths, default=None):
+        """
+        Dominant language among a subset of files (e.g. one review chunk).
+        """
+        weights = {}
+        for path in paths:
+            language = self.files.get(path)
+            if language is not None:
+                weights[language] = weights.get(language, 0) + self.changes.get(path, 1)
+        if not weights:
+            return default or self.dominant
+        return max(weights, key=weights.get)
+
+def detect_languages(files):
+    """
+    Build a LanguageReport in one pass over files API entries (or dicts with a filename and changes).
+    Each file weighs as many changed lines as it has, with a minimum of one so renames and binaries count.
+    """
+    report = LanguageReport()
+    for f in files:
+        path = f["filename"]
+        language = language_for_path(path)
+        if language is None:
+            continue
+        weight = max(1, f.get("changes") or (f.get("additions", 0) + f.get("deletions", 0)))
+        report.files[path] = language
+        report.changes[path] = weight
+        report.weights[language] = report.weights.get(language, 0) + weight
+    return report
@@ -1,19 +1,58 @@
-from api.config import get_secret, APP_METADATA
+from api.config import get_secret, prefetch_secrets, APP_METADATA, WEBHOOK_SECRET_NAMES
 import hmac
 import hashlib
 import os
 import json
-import requests
+from api import telemetry
+from api import prompt_flow_client
 import logging
-from api.github_api import get_installation_token, fetch_pr_data, post_pr_comment
+from api import github_api
+from api.incremental import incremental_payload_shas, incremental_header, find_prior_review, review_marker
+from api.pr_context import gather_pr_context
+from api.review_cache import get_review_cache, file_cache_key, lookup_parts, GUIDELINES_VERSION, NO_REVIEW_OUTPUT
+from api.guideline_index import retrieve_guidelines, index_version
+from api.review_planner import ReviewChunk, review_units, plan_review_chunks, review_chunks, merge_reviews
+from api.diff_pruner import prune_diff
+from api.review_queue import get_review_queue, make_job, start_local_worker
+from api.delivery_store import get_delivery_store, pr_key, payload_head_sha, REVIEW_DEBOUNCE_SECONDS
+from api.review_scheduler import get_review_scheduler, lane_for
+from api.review_stream import REVIEW_STREAMING, ProgressiveComment
+from api.sticky_comment import REVIEW_STICKY_COMMENT, StickyComment
+from api.inline_review import REVIEW_INLINE_COMMENTS, extract_findings, map_findings, post_inline_comments, findings_section
 
 logger = logging.getLogger(__name__)
 
-GITHUB_APP_ID = get_secret("github-app-id")
-GITHUB_PRIVATE_KEY_PEM = get_secret("github-private-key-pem")
-GITHUB_WEBHOOK_SECRET = get_secret("github-webhook-secret")
-PROMPT_FLOW_API_KEY = get_secret("prompt-flow-api-key")
-AI_SEARCH_ENDPOINT = get_secret("ai-search-endpoint")
+# Importing this module does no network I/O: the secrets every webhook needs are loaded in one
+# concurrent batch on the first request, and later lookups are cache hits
+_secrets_warm = False
+
+FIX_OPTIONS = (
+    "---\n"
+    "### 🛠️ Want to fix issues automatically?\n"
+    "Comment `/apply-fix` to let the bot suggest a patch (no commit).\n"
+    "Comment `/apply-and-commit` to let the bot apply and commit the fix to this branch.\n"
+    "\n> Only users with write access can trigger these actions."
+)
+
+def is_bot_comment(comment):
+    """
+    True for comments written by the app (or any other bot), which never carry user commands.
+    The fix-options text is matched too, for installations whose comments are not typed as a bot.
+    """
+    user = comment.get("user") or {}
+    return user.get("type") == "Bot" or FIX_OPTIONS.strip() in (comment.get("body") or "")
+
+# "sync" reviews inline before responding; "async" acknowledges with 202 and reviews from the queue
+WEBHOOK_MODE = os.getenv("WEBHOOK_MODE", "sync")
+
+def warm_secrets():
+    """
+    Prefetch WEBHOOK_SECRET_NAMES once per process (a failure is retried on the next request).
+    """
+    global _secrets_warm
+    if not _secrets_warm:
+        prefetch_secrets(WEBHOOK_SECRET_NAMES)
+        _secrets_warm = True
 
 def validate_signature(payload, header_signature, secret):
     """
@@ -26,11 +65,53 @@ def validate_signature(payload, header_signature, secret):
     expected = f"sha256={mac.hexdigest()}"
     return hmac.compare_digest(expected, header_signature)
 
+def request_review(pf_endpoint, pf_api_key, flow_input, on_progress=None):
+    """
+    Call the review Prompt Flow endpoint and return the review text.
+    Goes through the endpoint's circuit breaker, falling back to PROMPT_FLOW_FALLBACK_* when configured.
+    With on_progress, the output is streamed and on_progress is called with the text received so far.
+    """
+    primary = prompt_flow_client.FlowEndpoint(pf_endpoint, pf_api_key)
+    fallback = prompt_flow_client.review_fallback(primary)
+    if on_progress is None:
+        result = prompt_flow_client.score(primary, flow_input, fallback=fallback)
+        return result.get("output") or NO_REVIEW_OUTPUT
+    output = ""
+    for delta in prompt_flow_client.stream_score(primary, flow_input, fallback=fallback):
+        output += delta
+        on_progress(output)
+    return output or NO_REVIEW_OUTPUT
+
+def finish_stream(stream, body):
+    """
+    Best-effort final edit of a streaming placeholder when no review will be posted into it.
+    """
+    if stream is None:
+        return
+    try:
+        stream.finish(body)
+    except Exception as e:
+        logger.warning(f"Failed to close streaming review comment: {e}")
+
 def main(req):
     """
     Azure Function entry point for handling GitHub PR webhooks.
+    Each delivery is timed as one trace whose child spans cover the pipeline stages (api/telemetry.py).
     """
-    secret = get_secret("github-webhook-secret")
+    with telemetry.span("webhook", delivery=req.headers.get("X-GitHub-Delivery")) as span:
+        result = handle_webhook(req)
+        span.set_attribute("outcome", result["status"])
+        if result["status"] >= 500:
+            span.set_error()
+        return result
+
+def handle_webhook(req):
+    """
+    Validate and deduplicate a webhook delivery, then review it inline or queue it.
+    """
+    with telemetry.span("secrets"):
+        warm_secrets()
+        secret = get_secret("github-webhook-secret")
     payload = req.get_body()
     signature = req.headers.get("X-Hub-Signature-256")
 
@@ -44,150 +125,321 @@ def main(req):
     if data.get("action") not in ["opened", "synchronize"]:
         return {"status": 200, "body": "Ignored event"}
 
+    # Redeliveries of an already handled webhook are acknowledged without a second review
+    delivery_id = req.headers.get("X-GitHub-Delivery")
+    if delivery_id and not get_delivery_store().claim_delivery(delivery_id):
+        logger.info(f"Ignoring duplicate delivery {delivery_id}.")
+        return {"status": 200, "body": "Duplicate delivery ignored."}
+    data = coalesce_push(data)
+
+    if WEBHOOK_MODE == "async":
+        result = enqueue_review(data, delivery_id)
+    else:
+        result = process_review(data)
+    if delivery_id and result["status"] >= 500:
+        # GitHub may redeliver a failed webhook; it must not be dropped as a duplicate
+        get_delivery_store().release_delivery(delivery_id)
+    return result
+
+def coalesce_push(data):
+    """
+    Record the payload's head SHA as the PR's latest and, for synchronize events, widen `before`
+    to cover earlier pushes whose reviews were superseded before they posted.
+    """
+    head_sha = payload_head_sha(data)
+    if not head_sha:
+        return data
+    base = get_delivery_store().record_push(pr_key(data), head_sha, data.get("before"))
+    if data.get("action") == "synchronize" and base != data.get("before"):
+        logger.info(f"Coalescing pushes for {pr_key(data)}: reviewing from {base or 'the PR base'}.")
+        data = dict(data, before=base)
+    return data
+
+def enqueue_review(data, delivery_id=None):
+    """
+    Queue a validated pull_request payload for background review and acknowledge immediately.
+    Synchronize reviews are debounced so a burst of pushes is reviewed once, at the latest head.
+    """
+    delay = REVIEW_DEBOUNCE_SECONDS if data.get("action") == "synchronize" else 0
+    try:
+        get_review_queue().enqueue(make_job(data, delivery_id), delay=delay)
+    except Exception as e:
+        logger.error(f"Failed to enqueue review job: {e}")
+        return {"status": 500, "body": "Failed to enqueue review."}
+    # Local backends are drained in-process; the azure backend is drained by the ReviewWorker function
+    start_local_worker(run_review_job)
+    return {"status": 202, "body": "Review queued."}
+
+def run_review_job(data):
+    """
+    Queue worker entry point. Raises on server-side failures so the job is retried.
+    """
+    result = process_review(data)
+    if result["status"] >= 500:
+        raise Exception(f"Review failed: {result['body']}")
+    return result
+
+def process_review(data):
+    """
+    Run the review pipeline for a validated pull_request webhook payload, timed as a "review" span
+    tagged with the installation, repo, PR, diff size and outcome.
+    """
+    repository = data.get("repository") or {}
+    with telemetry.span(
+        "review",
+        installation=(data.get("installation") or {}).get("id"),
+        repo=f"{(repository.get('owner') or {}).get('login')}/{repository.get('name')}",
+        pr=(data.get("pull_request") or {}).get("number"),
+    ) as span:
+        result = _review(data, span)
+        span.set_attribute("outcome", result["status"])
+        if result["status"] >= 500:
+            span.set_error()
+        return result
+
+def _review(data, span):
     # Use metadata defaults if not present in payload
     repo = data["repository"].get("name") or APP_METADATA["repo_name"]
     owner = data["repository"].get("owner", {}).get("login") or APP_METADATA["github_username"]
     pr_number = data["pull_request"].get("number")
     installation_id = data["installation"].get("id") or APP_METADATA["installation_id"]
+    # A newer push for the same PR makes this review obsolete; skip it before spending tokens
+    store, key, head_sha = get_delivery_store(), pr_key(data), payload_head_sha(data)
+    if head_sha and store.is_superseded(key, head_sha):
+        logger.info(f"Skipping review of {key} at {head_sha}: superseded by a newer push.")
+        return {"status": 200, "body": "Superseded by a newer push."}
 
-    app_id = get_secret("github-app-id")
-    private_key = get_secret("github-private-key-pem")
-    pf_api_key = get_secret("prompt-flow-api-key")
+    with telemetry.span("secrets"):
+        warm_secrets()
+        app_id = get_secret("github-app-id")
+        private_key = get_secret("github-private-key-pem")
+        pf_api_key = get_secret("prompt-flow-api-key")
     pf_endpoint = os.getenv("PROMPT_FLOW_ENDPOINT") or APP_METADATA["prompt_flow_endpoint"]
     if not pf_endpoint:
         logger.error("PROMPT_FLOW_ENDPOINT environment variable is not set and no fallback available.")
         return {"status": 500, "body": "Prompt Flow endpoint not configured."}
 
     try:
-        token = get_installation_token(app_id, private_key, installation_id)
-        code_diff, commit_msg = fetch_pr_data(owner, repo, pr_number, token)
+        token = github_api.get_installation_token(app_id, private_key, installation_id)
+        before, after = incremental_payload_shas(data)
+        with telemetry.span("gather_pr_context"):
+            context = gather_pr_context(
+                owner, repo, pr_number, token,
+                before=before, after=after, title=data["pull_request"].get("title"),
+            )
     except Exception as e:
         logger.error(f"GitHub API error: {e}")
         return {"status": 500, "body": "Failed to fetch PR data."}
+    span.set_attribute("diff_bytes", context.diff_bytes)
+    commit_msg = context.commit_msg
+    language, project_name = context.language, context.project_name
+    if context.incremental_base and not context.code_diff.strip():
+        logger.info(f"No new changes between {before} and {after} for PR #{pr_number}.")
+        store.mark_reviewed(key, head_sha)
+        return {"status": 200, "body": "No new changes to review."}
 
-    def detect_language_from_files(owner, repo, pr_number, token):
-        """
-        Detect programming language from PR file extensions.
-        """
-        url = f"https://api.github.com/repos/{owner}/{repo}/pulls/{pr_number}/files"
-        headers = {"Authorization": f"token {token}", "Accept": "application/vnd.github.v3+json"}
-        response = requests.get(url, headers=headers)
-        if response.status_code != 200:
-            logger.warning("Could not fetch PR files for language detection.")
-            return "python"  # fallback
-        files = response.json()
-        extensions = [os.path.splitext(f['filename'])[1] for f in files]
-        # Simple mapping, expand as needed
-        if any(ext in ['.py'] for ext in extensions):
-            return "python"
-        if any(ext in ['.js', '.jsx'] for ext in extensions):
-            return "javascript"
-        if any(ext in ['.ts', '.tsx'] for ext in extensions):
-            return "typescript"
-        if any(ext in ['.java'] for ext in extensions):
-            return "java"
-        if any(ext in ['.cs'] for ext in extensions):
-            return "csharp"
-        if any(ext in ['.go'] for ext in extensions):
-            return "go"
-        if any(ext in ['.rb'] for ext in extensions):
-            return "ruby"
-        if any(ext in ['.php'] for ext in extensions):
-            return "php"
-        if any(ext in ['.cpp', '.cc', '.cxx', '.hpp', '.h'] for ext in extensions):
-            return "cpp"
-        if any(ext in ['.c'] for ext in extensions):
-            return "c"
-        if any(ext in ['.swift'] for ext in extensions):
-            return "swift"
-        if any(ext in ['.kt', '.kts'] for ext in extensions):
-            return "kotlin"
-        return "python"  # default fallback
-
-    def get_project_name_from_guidelines(owner, repo, token):
-        """
-        Try to fetch and parse .guidelines.yml from the repo root. If not found or error, fallback to repo name.
-        """
-        url = f"https://api.github.com/repos/{owner}/{repo}/contents/.guidelines.yml"
-        headers = {"Authorization": f"token {token}", "Accept": "application/vnd.github.v3.raw"}
-        response = requests.get(url, headers=headers)
-        if response.status_code == 200:
-            try:
-                import yaml
-                yml_content = response.text
-                yml_data = yaml.safe_load(yml_content)
-                # Try to get a project_name field, fallback to repo name if not present
-                return yml_data.get("project_name", repo)
-            except Exception as e:
-                logger.warning(f"Failed to parse .guidelines.yml: {e}")
-                return repo
-        else:
-            logger.info(".guidelines.yml not found, using repo name as project_name.")
-            return repo
-
-    language = detect_language_from_files(owner, repo, pr_number, token)
-    project_name = get_project_name_from_guidelines(owner, repo, token)
-
+    # code_diff is filled in per chunk, so a streamed diff is never joined into one string for review
     flow_input = {
         "commit_msg": commit_msg,
-        "code_diff": code_diff,
         "project_name": project_name,
         "language": language
     }
+    # Every Prompt Flow call waits for a fair-share slot (global, per-installation and per-repo caps)
+    scheduler = get_review_scheduler()
+    repo_slug = f"{owner}/{repo}"
 
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {pf_api_key}"
-    }
+    def scheduled_review(review_input, on_progress=None):
+        # Guidelines come from the in-process index; without a match the flow's own retriever is used
+        with telemetry.span("guideline_retrieval"):
+            retrieved_docs = retrieve_guidelines(review_input["language"], project_name, commit_msg)
+        if retrieved_docs:
+            review_input = dict(review_input, retrieved_docs=retrieved_docs)
+        # Waiting for a slot and the call itself are timed separately
+        with telemetry.span("scheduler_wait"):
+            scheduler.acquire(installation_id, repo_slug, lane_for(data))
+        try:
+            with telemetry.span("prompt_flow", diff_bytes=len(review_input["code_diff"]), language=review_input["language"]):
+                return request_review(pf_endpoint, pf_api_key, review_input, on_progress=on_progress)
+        finally:
+            scheduler.release(installation_id, repo_slug)
+
+    # Lockfiles, generated/vendored files, binaries and whitespace-only hunks are not sent to the LLM
+    with telemetry.span("diff_pruning"):
+        pruned = prune_diff(context.diff_files, context.repo_config)
+    span.set_attributes(files=len(pruned.files), skipped_files=len(pruned.skipped))
+    if pruned.skipped or pruned.whitespace_hunks:
+        logger.info(
+            f"Diff pruning for PR #{pr_number}: skipped {len(pruned.skipped)} files and "
+            f"{pruned.whitespace_hunks} whitespace-only hunks, saving {pruned.lines_saved} lines "
+            f"(~{pruned.tokens_saved} tokens)."
+        )
+
+    # One sticky comment per PR carries the review and the fix options; the review it held is collapsed
+    sticky = None
+    if REVIEW_STICKY_COMMENT:
+        sticky = StickyComment(owner, repo, pr_number, token, key, context.comments, footer=FIX_OPTIONS)
+
+    # In streaming mode a placeholder comment is posted now and edited as the review arrives
+    stream = None
+    if REVIEW_STREAMING:
+        try:
+            stream = ProgressiveComment(
+                owner, repo, pr_number, token,
+                comment_id=sticky.comment_id if sticky else None, render=sticky.render if sticky else None,
+            ).start()
+            if sticky is not None:
+                sticky.attach(stream.comment_id)
+        except Exception as e:
+            logger.warning(f"Failed to post placeholder comment, posting the review when done: {e}")
 
     try:
-        pf_response = requests.post(pf_endpoint, headers=headers, json=flow_input)
-        pf_response.raise_for_status()
-        review_comment = pf_response.json().get("output", "No review output.")
+        units = review_units(pruned.files)
+        if not context.diff_files:
+            # Nothing parseable (e.g. an empty or non-unified diff): send it as-is
+            review_comment = scheduled_review(
+                dict(flow_input, code_diff=context.diff_text()), on_progress=stream.partial if stream else None,
+            )
+        elif not units:
+            review_comment = "## 🤖 Automated Review\n\nNo reviewable changes: every changed file was skipped."
+        else:
+            # Each chunk is reviewed against the guidelines of its own dominant language
+            def chunk_language(chunk):
+                return context.languages.dominant_for(chunk.paths, default=language)
+
+            cache = get_review_cache()
+            # Reviews built from a different local guideline index are not reused
+            guidelines_version = f"{GUIDELINES_VERSION}:{index_version()}"
+
+            def unit_key(unit):
+                return file_cache_key(
+                    unit, context.languages.dominant_for([unit.path], default=language), project_name,
+                    guidelines_version=guidelines_version,
+                )
+
+            # Files (or slices of large files) reviewed before are served from the review cache; the rest
+            # are packed into token-budgeted chunks, reviewed in parallel and merged into one comment
+            cached_parts, remaining = lookup_parts(cache, units, unit_key)
+            chunks = plan_review_chunks([units[index] for index in remaining])
+            if len(chunks) > 1:
+                logger.info(f"Reviewing PR #{pr_number} in {len(chunks)} chunks.")
+            span.set_attributes(chunks=len(chunks), cached_parts=len(cached_parts))
+            # Cached parts and reviewed chunks, in diff order (by the index of their first unit)
+            ordered = sorted(
+                [(min(indices), (ReviewChunk(files=[units[i] for i in indices]), review, None), None)
+                 for indices, review in cached_parts]
+                + [(remaining[chunk.first], (chunk, None, None), number) for number, chunk in enumerate(chunks)],
+                key=lambda entry: entry[0],
+            )
+            partial_results = [result for _, result, _ in ordered]
+            # Slot in partial_results of each chunk, by chunk number
+            slot_of = {number: slot for slot, (_, _, number) in enumerate(ordered) if number is not None}
+            # A lone chunk streams its output; otherwise the review shows each part as it finishes
+            chunk_progress = stream.partial if stream and len(partial_results) == 1 else None
+
+            def show_partial(index, result):
+                partial_results[slot_of[index]] = result
+                stream.update(merge_reviews(list(partial_results)))
+
+            results = review_chunks(
+                chunks,
+                # Chunk reviews run on worker threads; their spans stay under this review
+                telemetry.propagate(lambda chunk: scheduled_review(dict(
+                    flow_input, code_diff=chunk.code_diff, language=chunk_language(chunk),
+                ), on_progress=chunk_progress)),
+                cache=cache,
+                cache_key=unit_key,
+                on_result=show_partial if stream and len(partial_results) > 1 else None,
+            )
+            for number, result in enumerate(results):
+                partial_results[slot_of[number]] = result
+            review_comment = merge_reviews(partial_results)
+            logger.info(f"Review cache stats: {cache.stats()}")
+        logger.info(f"Review scheduler stats: {scheduler.stats()}")
     except Exception as e:
         logger.error(f"Prompt Flow call failed: {e}")
+        finish_stream(stream, "## 🤖 Automated Review\n\n⚠️ The review could not be completed.")
         return {"status": 500, "body": "Prompt Flow call failed."}
+    if stream is not None:
+        span.set_attributes(stream_updates=stream.updates, first_feedback_seconds=stream.first_update_seconds)
+
+    # Findings listed under "Inline findings" are anchored to diff lines and posted as one review;
+    # the code-fix flow still gets the full review text
+    fix_context = review_comment
+    inline_comments, unposted = [], []
+    if REVIEW_INLINE_COMMENTS and context.diff_files:
+        review_comment, findings = extract_findings(review_comment)
+        inline_comments, unposted = map_findings(findings, context.diff_files)
+
+    if pruned.summary():
+        review_comment = f"{review_comment}\n\n{pruned.summary()}"
+    if context.incremental_base:
+        # The sticky comment holds the previous review itself, collapsed below this one
+        prior_review = None if sticky else find_prior_review(context.comments)
+        review_comment = incremental_header(before, after, prior_review) + "\n" + review_comment
+
+    # Cancel if a newer push arrived while this review was running; its review covers these changes
+    if head_sha and store.is_superseded(key, head_sha):
+        logger.info(f"Discarding review of {key} at {head_sha}: superseded by a newer push.")
+        finish_stream(stream, "## 🤖 Automated Review\n\n~~Superseded by a newer push.~~")
+        return {"status": 200, "body": "Superseded by a newer push."}
 
+    if inline_comments:
+        posted, failed = post_inline_comments(owner, repo, pr_number, inline_comments, token, commit_id=head_sha)
+        span.set_attribute("inline_comments", posted)
+        unposted = failed + unposted
+        if posted:
+            review_comment = f"{review_comment}\n\n> 💬 {posted} finding{'s' if posted != 1 else ''} posted as inline comments."
+    if unposted:
+        review_comment = f"{review_comment}\n\n{findings_section(unposted)}"
+    review_comment = f"{review_comment}\n\n{review_marker(head_sha)}".rstrip()
     try:
-        status = post_pr_comment(owner, repo, pr_number, review_comment, token)
+        if stream is not None:
+            stream.finish(review_comment)
+        elif sticky is not None:
+            sticky.publish(review_comment)
+        else:
+            github_api.post_pr_comment(owner, repo, pr_number, review_comment, token)
     except Exception as e:
         logger.error(f"Failed to post PR comment: {e}")
         return {"status": 500, "body": "Failed to post PR comment."}
+    if head_sha:
+        store.mark_reviewed(key, head_sha)
 
-    # Post follow-up comment with fix options
-    try:
-        fix_options_comment = (
-            "\n---\n"
-            "### 🛠️ Want to fix issues automatically?\n"
-            "Comment `/apply-fix` to let the bot suggest a patch (no commit).\n"
-            "Comment `/apply-and-commit` to let the bot apply and commit the fix to this branch.\n"
-            "\n> Only users with write access can trigger these actions."
-        )
-        post_pr_comment(owner, repo, pr_number, fix_options_comment, token)
-    except Exception as e:
-        logger.warning(f"Failed to post fix options comment: {e}")
+    # Without a sticky comment the fix options are a follow-up comment
+    if sticky is None:
+        try:
+            github_api.post_pr_comment(owner, repo, pr_number, "\n" + FIX_OPTIONS, token)
+        except Exception as e:
+            logger.warning(f"Failed to post fix options comment: {e}")
 
-    # Listen for /apply-fix or /apply-and-commit commands
-    from api.github_api import get_pr_comments, detect_apply_fix_command, generate_code_fixes_with_copilot, commit_code_changes
-    comments = get_pr_comments(owner, repo, pr_number, token)
+    # Listen for /apply-fix or /apply-and-commit commands (comments were fetched with the PR context);
+    # commands up to the sticky comment's seen watermark were handled by the run that wrote it
+    comments = sticky.new_comments(context.comments) if sticky else context.comments
+    # The bot's own fix-options comment mentions the commands; only user comments can trigger them
+    comments = [comment for comment in comments if not is_bot_comment(comment)]
     # Optionally, fetch list of users with write access for approval (not implemented here)
     # approval_users = ...
     apply_fix = False
     apply_and_commit = False
-    for comment in comments:
+    # The newest command wins; older ones are not scanned
+    for comment in reversed(comments):
         body = comment.get('body', '').strip().lower()
         if '/apply-fix' in body:
             apply_fix = True
         if '/apply-and-commit' in body:
             apply_and_commit = True
+        if apply_fix or apply_and_commit:
+            break
     if apply_fix or apply_and_commit:
         try:
-            # Use review_comment as context for the LLM/code-fix engine
+            # Use the review (including inline findings) as context for the LLM/code-fix engine
             try:
-                # Pass review_comment as an input to the code fix generator (Copilot/OpenAI)
-                fixed_files = generate_code_fixes_with_copilot(
-                    code_diff, review_comment, pf_api_key
-                )
+                # Pass the review as an input to the code fix generator (Copilot/OpenAI).
+                # Explicit user commands take the high-priority lane.
+                with scheduler.slot(installation_id, repo_slug, "high"):
+                    fixed_files = github_api.generate_code_fixes_with_copilot(
+                        context.diff_text(), fix_context, pf_api_key
+                    )
             except NotImplementedError:
                 # For demo, show a dummy patch preview if not implemented
                 dummy_patch = {'example.py': '# Example fix\nprint("Hello, fixed!")\n'}
@@ -195,20 +447,20 @@ def main(req):
                     patch_preview = '\n'.join([
                         f"**{path}**\n```diff\n{dummy_patch[path]}\n```" for path in dummy_patch
                     ])
-                    post_pr_comment(
+                    github_api.post_pr_comment(
                         owner, repo, pr_number,
                         f"### 🤖 Suggested Fixes (Preview)\n{patch_preview}\n\n*Copilot code fix generation is not implemented in this demo.*",
                         token
                     )
                 if apply_and_commit:
-                    post_pr_comment(
+                    github_api.post_pr_comment(
                         owner, repo, pr_number,
                         "Copilot code fix generation and commit is not implemented.",
                         token
                     )
                 return {"status": 200, "body": "Fix feature not implemented."}
             if not fixed_files or not isinstance(fixed_files, dict):
-                post_pr_comment(
+                github_api.post_pr_comment(
                     owner, repo, pr_number,
                     "No fixable suggestions were found or fixes could not be generated based on the review and guidelines.",
                     token
@@ -218,23 +470,23 @@ def main(req):
                 patch_preview = '\n'.join([
                     f"**{path}**\n```diff\n{fixed_files[path]}\n```" for path in fixed_files
                 ])
-                post_pr_comment(owner, repo, pr_number, f"### 🤖 Suggested Fixes (Preview)\n{patch_preview}", token)
+                github_api.post_pr_comment(owner, repo, pr_number, f"### 🤖 Suggested Fixes (Preview)\n{patch_preview}", token)
             if apply_and_commit:
                 try:
                     commit_msg = f"chore(bot): apply automated fixes for PR #{pr_number}"
                     branch = data["pull_request"]["head"]["ref"]
-                    commit_code_changes(owner, repo, branch, fixed_files, commit_msg, token)
-                    post_pr_comment(owner, repo, pr_number, "✅ Automated fixes have been committed to this branch.", token)
+                    github_api.commit_code_changes(owner, repo, branch, fixed_files, commit_msg, token)
+                    github_api.post_pr_comment(owner, repo, pr_number, "✅ Automated fixes have been committed to this branch.", token)
                 except Exception as e:
                     logger.error(f"Failed to commit code fixes: {e}")
-                    post_pr_comment(owner, repo, pr_number, f"Failed to commit code fixes: {e}", token)
+                    github_api.post_pr_comment(owner, repo, pr_number, f"Failed to commit code fixes: {e}", token)
                     return {"status": 500, "body": "Failed to commit code fixes."}
         except Exception as e:
             logger.error(f"Failed to generate code fixes: {e}")
-            post_pr_comment(owner, repo, pr_number, f"Failed to generate code fixes: {e}", token)
+            github_api.post_pr_comment(owner, repo, pr_number, f"Failed to generate code fixes: {e}", token)
             return {"status": 500, "body": "Failed to generate code fixes."}
 
-    return {"status": status, "body": "Review posted."}
+    return {"status": 200, "body": "Review posted."}
 
 # Security Note:
 # - Never log or print secret values.
@@ -0,0 +1,128 @@
+# pr_context.py
+# Gather everything the review needs from GitHub with one concurrent fan-out per webhook
+
+import io
+import os
+import logging
+from dataclasses import dataclass, field
+from functools import cached_property
+from concurrent.futures import ThreadPoolExecutor
+from api import github_api
+from api import telemetry
+from api.diff_parser import parse_diff, render_diff
+from api.incremental import REVIEW_MARKER_RE
+from api.languages import LanguageReport
+from api.repo_config import RepoConfig, get_repo_config
+from api.sticky_comment import STICKY_MARKER
+
+logger = logging.getLogger(__name__)
+
+PR_CONTEXT_MAX_WORKERS = int(os.getenv("PR_CONTEXT_MAX_WORKERS", "4"))
+
+@dataclass
+class PRContext:
+    """
+    Joined result of the independent GitHub reads for one pull request.
+    """
+    owner: str
+    repo: str
+    pr_number: int
+    commit_msg: str
+    language: str
+    project_name: str
+    comments: list = field(default_factory=list)
+    repo_config: RepoConfig = None
+    # Set to the previous head SHA when code_diff only covers the commits pushed since then
+    incremental_base: str = None
+    # Per-file languages and ranking; `language` is its dominant entry
+    languages: LanguageReport = field(default_factory=LanguageReport)
+    # Diff text, for diffs fetched in one piece (the incremental compare diff)
+    code_diff: str = None
+    # FileDiff records parsed while the full PR diff streamed in; its raw text is never held
+    files: list = None
+
+    @cached_property
+    def diff_files(self):
+        """
+        Parsed per-file / per-hunk model of the diff, built once and shared by later stages.
+        """
+        if self.files is not None:
+            return self.files
+        return list(parse_diff(io.StringIO(self.code_diff or "")))
+
+    @property
+    def diff_bytes(self):
+        if self.code_diff is not None:
+            return len(self.code_diff)
+        return sum(len(line) + 1 for file_diff in self.files for hunk in file_diff.hunks for line in hunk.lines)
+
+    def diff_text(self):
+        """
+        The diff as unified-diff text, rendered from the parsed files when it was streamed.
+        Only for stages that need the whole diff as one string (the code-fix flow).
+        """
+        return self.code_diff if self.code_diff is not None else render_diff(self.files)
+
+def _is_bot_review(comment):
+    # The sticky comment counts even while it only holds a placeholder; user comments quoting
+    # the markers do not
+    if (comment.get("user") or {}).get("type") != "Bot":
+        return False
+    body = comment.get("body") or ""
+    return REVIEW_MARKER_RE.search(body) is not None or STICKY_MARKER in body
+
+def _fetch_comments(owner, repo, pr_number, token):
+    # Comments only drive the /apply-fix scan, so a failure here must not block the review.
+    # Only the previous bot review and the comments after it are read: older commands were
+    # handled by that review's run, and busy PRs would otherwise page through every comment.
+    try:
+        return github_api.get_pr_comments(owner, repo, pr_number, token, stop_at=_is_bot_review)
+    except Exception as e:
+        logger.warning(f"Could not fetch PR comments: {e}")
+        return []
+
+def _fetch_diff(owner, repo, pr_number, token, before=None, after=None, title=None):
+    """
+    Return (code_diff, files, commit_msg, incremental_base). With before/after SHAs and the PR title
+    from the payload, only the pushed delta is fetched, as text. Otherwise (or after a force-push) the
+    full PR diff is parsed file by file as it streams in; only without a title is it read in one piece
+    together with the PR's JSON.
+    """
+    if before and after and title is not None:
+        delta = github_api.fetch_compare_diff(owner, repo, before, after, token)
+        if delta is not None:
+            return delta, None, title, before
+    if title is not None:
+        return None, list(github_api.stream_pr_diff(owner, repo, pr_number, token)), title, None
+    code_diff, commit_msg = github_api.fetch_pr_data(owner, repo, pr_number, token)
+    return code_diff, None, commit_msg, None
+
+def gather_pr_context(owner, repo, pr_number, token, before=None, after=None, title=None):
+    """
+    Fetch PR data, language, project name and comments concurrently and join them into a PRContext.
+    Latency is that of the slowest read rather than the sum of all of them.
+    Pass the synchronize payload's before/after SHAs and PR title for an incremental diff.
+    Raises:
+        Exception: If the PR data itself cannot be fetched.
+    """
+    # Each read is timed as a child of the caller's span
+    with ThreadPoolExecutor(max_workers=PR_CONTEXT_MAX_WORKERS, thread_name_prefix="pr-context") as pool:
+        pr_future = pool.submit(telemetry.propagate(_fetch_diff), owner, repo, pr_number, token, before, after, title)
+        languages_future = pool.submit(telemetry.propagate(github_api.detect_pr_languages), owner, repo, pr_number, token)
+        config_future = pool.submit(telemetry.propagate(get_repo_config), owner, repo, token)
+        comments_future = pool.submit(telemetry.propagate(_fetch_comments), owner, repo, pr_number, token)
+        code_diff, files, commit_msg, incremental_base = pr_future.result()
+        return PRContext(
+            owner=owner,
+            repo=repo,
+            pr_number=pr_number,
+            code_diff=code_diff,
+            files=files,
+            commit_msg=commit_msg,
+            language=languages_future.result().dominant,
+            languages=languages_future.result(),
+            project_name=config_future.result().project_name,
+            repo_config=config_future.result(),
+            comments=comments_future.result(),
+            incremental_base=incremental_base,
+        )
@@ -0,0 +1,438 @@
+# prompt_flow_client.py
+# Resilient calls to the Prompt Flow scoring endpoints: per-endpoint circuit breakers,
+# p95-based hedged requests and a fallback endpoint or deployment
+
+import os
+import json
+import time
+import logging
+import threading
+from collections import deque
+from dataclasses import dataclass
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from api import http_client
+from api import telemetry
+from api.config import get_secret
+
+logger = logging.getLogger(__name__)
+
+# The breaker opens when at least MIN_CALLS of the last WINDOW calls were made and the share
+# of failures (5xx, 429, timeouts, connection errors and calls slower than SLOW_SECONDS) reaches the threshold
+PROMPT_FLOW_BREAKER_WINDOW = int(os.getenv("PROMPT_FLOW_BREAKER_WINDOW", "20"))
+PROMPT_FLOW_BREAKER_MIN_CALLS = int(os.getenv("PROMPT_FLOW_BREAKER_MIN_CALLS", "10"))
+PROMPT_FLOW_BREAKER_ERROR_RATIO = float(os.getenv("PROMPT_FLOW_BREAKER_ERROR_RATIO", "0.5"))
+PROMPT_FLOW_BREAKER_SLOW_SECONDS = float(os.getenv("PROMPT_FLOW_BREAKER_SLOW_SECONDS", "90"))
+# How long an open breaker rejects calls before letting one probe through
+PROMPT_FLOW_BREAKER_OPEN_SECONDS = float(os.getenv("PROMPT_FLOW_BREAKER_OPEN_SECONDS", "30"))
+# Hedging sends a second identical request once the first has run longer than the endpoint's p95
+PROMPT_FLOW_HEDGE = os.getenv("PROMPT_FLOW_HEDGE", "false").lower() == "true"
+PROMPT_FLOW_HEDGE_QUANTILE = float(os.getenv("PROMPT_FLOW_HEDGE_QUANTILE", "0.95"))
+PROMPT_FLOW_HEDGE_MIN_SAMPLES = int(os.getenv("PROMPT_FLOW_HEDGE_MIN_SAMPLES", "20"))
+PROMPT_FLOW_HEDGE_MIN_DELAY = float(os.getenv("PROMPT_FLOW_HEDGE_MIN_DELAY_SECONDS", "1"))
+PROMPT_FLOW_HEDGE_MAX_WORKERS = int(os.getenv("PROMPT_FLOW_HEDGE_MAX_WORKERS", "8"))
+# Recent successful call latencies kept per endpoint for the hedge delay
+LATENCY_SAMPLE_SIZE = 200
+# Azure ML online endpoints route to a named deployment with this header
+DEPLOYMENT_HEADER = "azureml-model-deployment"
+
+# Secondary endpoint and/or deployment tried when the primary is failing or its circuit is open.
+# A fallback URL uses its own API key when *_KEY_SECRET names one in Key Vault, else the primary's key.
+PROMPT_FLOW_FALLBACK_ENDPOINT = os.getenv("PROMPT_FLOW_FALLBACK_ENDPOINT")
+PROMPT_FLOW_FALLBACK_DEPLOYMENT = os.getenv("PROMPT_FLOW_FALLBACK_DEPLOYMENT")
+PROMPT_FLOW_FALLBACK_KEY_SECRET = os.getenv("PROMPT_FLOW_FALLBACK_KEY_SECRET")
+CODE_FIX_PROMPT_FLOW_FALLBACK_ENDPOINT = os.getenv("CODE_FIX_PROMPT_FLOW_FALLBACK_ENDPOINT")
+CODE_FIX_PROMPT_FLOW_FALLBACK_DEPLOYMENT = os.getenv("CODE_FIX_PROMPT_FLOW_FALLBACK_DEPLOYMENT")
+CODE_FIX_PROMPT_FLOW_FALLBACK_KEY_SECRET = os.getenv("CODE_FIX_PROMPT_FLOW_FALLBACK_KEY_SECRET")
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+class CircuitOpenError(Exception):
+    """
+    Raised when every configured endpoint is rejected by its open circuit breaker.
+    """
+
+@dataclass(frozen=True)
+class FlowEndpoint:
+    url: str
+    api_key: str
+    deployment: str = None
+
+    @property
+    def name(self):
+        return f"{self.url}#{self.deployment}" if self.deployment else self.url
+
+def fallback_endpoint(primary, url=None, deployment=None, key_secret=None):
+    """
+    The fallback for `primary`: another endpoint URL and/or another deployment behind the same URL.
+    Returns None when neither is configured.
+    """
+    if not url and not deployment:
+        return None
+    api_key = get_secret(key_secret) if key_secret else primary.api_key
+    return FlowEndpoint(url or primary.url, api_key, deployment)
+
+def review_fallback(primary):
+    return fallback_endpoint(primary, PROMPT_FLOW_FALLBACK_ENDPOINT, PROMPT_FLOW_FALLBACK_DEPLOYMENT, PROMPT_FLOW_FALLBACK_KEY_SECRET)
+
+def code_fix_fallback(primary):
+    return fallback_endpoint(
+        primary, CODE_FIX_PROMPT_FLOW_FALLBACK_ENDPOINT, CODE_FIX_PROMPT_FLOW_FALLBACK_DEPLOYMENT,
+        CODE_FIX_PROMPT_FLOW_FALLBACK_KEY_SECRET,
+    )
+
+class CircuitBreaker:
+    """
+    Count-based sliding-window breaker: closed -> open on too many failures, open -> half_open
+    after open_seconds, half_open -> closed when the single probe call succeeds (open again if not).
+    """
+    def __init__(self, name, window=None, min_calls=None, error_ratio=None, slow_seconds=None, open_seconds=None):
+        self.name = name
+        self.min_calls = PROMPT_FLOW_BREAKER_MIN_CALLS if min_calls is None else min_calls
+        self.error_ratio = PROMPT_FLOW_BREAKER_ERROR_RATIO if error_ratio is None else error_ratio
+        self.slow_seconds = PROMPT_FLOW_BREAKER_SLOW_SECONDS if slow_seconds is None else slow_seconds
+        self.open_seconds = PROMPT_FLOW_BREAKER_OPEN_SECONDS if open_seconds is None else open_seconds
+        self.state = CLOSED
+        self._outcomes = deque(maxlen=PROMPT_FLOW_BREAKER_WINDOW if window is None else window)  # True for a failed call
+        self._latencies = deque(maxlen=LATENCY_SAMPLE_SIZE)  # full responses; drives hedging
+        self._ttft_latencies = deque(maxlen=LATENCY_SAMPLE_SIZE)  # time to first token of streamed calls
+        self._opened_at = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+        self.trips = 0
+        self.rejected = 0
+        self.hedges = 0
+
+    def _transition(self, state):
+        if state != self.state:
+            logger.warning(f"Prompt Flow circuit for {self.name}: {self.state} -> {state}")
+            self.state = state
+
+    def allow(self):
+        """
+        True if a call may be sent now. In half_open only one probe call is let through at a time.
+        """
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self._opened_at >= self.open_seconds:
+                self._transition(HALF_OPEN)
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and not self._probe_in_flight:
+                self._probe_in_flight = True
+                return True
+            self.rejected += 1
+            return False
+
+    def _open(self):
+        self._transition(OPEN)
+        self._opened_at = time.monotonic()
+        self.trips += 1
+
+    def record_success(self, latency, first_token=False):
+        """
+        first_token=True marks a streamed call's time to first token, kept apart from full-response
+        latencies so it does not pull down the hedge delay.
+        """
+        with self._lock:
+            (self._ttft_latencies if first_token else self._latencies).append(latency)
+            slow = self.slow_seconds and latency > self.slow_seconds
+            self._record(failed=bool(slow))
+
+    def record_failure(self):
+        with self._lock:
+            self._record(failed=True)
+
+    def record_client_error(self):
+        """
+        A 4xx answer (other than 429): not counted in the window, but it shows the endpoint is up,
+        so a half-open probe that gets one closes the circuit.
+        """
+        with self._lock:
+            if self.state == HALF_OPEN:
+                self._probe_in_flight = False
+                self._transition(CLOSED)
+                self._outcomes.clear()
+
+    def release_probe(self):
+        """
+        Let the next half-open probe through even if this call recorded no outcome (e.g. it was abandoned).
+        """
+        with self._lock:
+            self._probe_in_flight = False
+
+    def _record(self, failed):
+        if self.state == HALF_OPEN:
+            self._probe_in_flight = False
+            if failed:
+                self._open()
+            else:
+                self._transition(CLOSED)
+                self._outcomes.clear()
+            return
+        self._outcomes.append(failed)
+        if self.state == CLOSED and len(self._outcomes) >= self.min_calls:
+            if sum(self._outcomes) / len(self._outcomes) >= self.error_ratio:
+                self._open()
+
+    def record_hedge(self):
+        with self._lock:
+            self.hedges += 1
+
+    def latency_quantile(self, q):
+        """
+        The q-th quantile of recent full-response latencies, or None with too few samples to trust.
+        """
+        with self._lock:
+            if len(self._latencies) < PROMPT_FLOW_HEDGE_MIN_SAMPLES:
+                return None
+            ordered = sorted(self._latencies)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def snapshot(self):
+        with self._lock:
+            calls = len(self._outcomes)
+            failures = sum(self._outcomes)
+            ordered = sorted(self._latencies)
+            ttft = sorted(self._ttft_latencies)
+            return {
+                "state": self.state,
+                "calls": calls,
+                "failures": failures,
+                "failure_ratio": failures / calls if calls else 0.0,
+                "trips": self.trips,
+                "rejected": self.rejected,
+                "hedges": self.hedges,
+                "latency_p50": ordered[len(ordered) // 2] if ordered else 0.0,
+                "latency_p95": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] if ordered else 0.0,
+                "ttft_p50": ttft[len(ttft) // 2] if ttft else 0.0,
+                "ttft_p95": ttft[min(len(ttft) - 1, int(0.95 * len(ttft)))] if ttft else 0.0,
+                "open_for": max(0.0, self.open_seconds - (time.monotonic() - self._opened_at)) if self.state == OPEN else 0.0,
+            }
+
+_breakers = {}  # endpoint name -> CircuitBreaker
+_breakers_lock = threading.Lock()
+_hedge_pool = None
+
+def get_breaker(name):
+    with _breakers_lock:
+        breaker = _breakers.get(name)
+        if breaker is None:
+            breaker = _breakers[name] = CircuitBreaker(name)
+        return breaker
+
+def breaker_states():
+    """
+    Snapshot of every endpoint's breaker, keyed by endpoint.
+    """
+    with _breakers_lock:
+        breakers = list(_breakers.values())
+    return {breaker.name: breaker.snapshot() for breaker in breakers}
+
+def reset_breakers():
+    with _breakers_lock:
+        _breakers.clear()
+
+def _get_hedge_pool():
+    global _hedge_pool
+    with _breakers_lock:
+        if _hedge_pool is None:
+            _hedge_pool = ThreadPoolExecutor(max_workers=PROMPT_FLOW_HEDGE_MAX_WORKERS, thread_name_prefix="pf-hedge")
+        return _hedge_pool
+
+def _is_failure(error):
+    """
+    Server-side trouble counts against the breaker; other 4xx responses are the caller's problem.
+    """
+    response = getattr(error, "response", None)
+    status = getattr(response, "status_code", None)
+    return not isinstance(status, int) or status >= 500 or status == 429
+
+def _headers(endpoint, accept=None):
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {endpoint.api_key}"
+    }
+    if accept:
+        headers["Accept"] = accept
+    if endpoint.deployment:
+        headers[DEPLOYMENT_HEADER] = endpoint.deployment
+    return headers
+
+def _attempt(endpoint, payload, breaker, idempotent):
+    headers = _headers(endpoint)
+    started = time.monotonic()
+    try:
+        response = http_client.post(endpoint.url, endpoint="prompt_flow", idempotent=idempotent, headers=headers, json=payload)
+        response.raise_for_status()
+        result = response.json()
+    except Exception as e:
+        if _is_failure(e):
+            breaker.record_failure()
+        else:
+            breaker.record_client_error()
+        raise
+    breaker.record_success(time.monotonic() - started)
+    return result
+
+def _call(endpoint, payload, breaker, idempotent, hedge):
+    # A hedge sends the request twice, which only a call that may be repeated can afford
+    delay = breaker.latency_quantile(PROMPT_FLOW_HEDGE_QUANTILE) if hedge and idempotent else None
+    if delay is None:
+        return _attempt(endpoint, payload, breaker, idempotent)
+    pool = _get_hedge_pool()
+    attempt = telemetry.propagate(_attempt)
+    pending = {pool.submit(attempt, endpoint, payload, breaker, idempotent)}
+    done, pending = wait(pending, timeout=max(delay, PROMPT_FLOW_HEDGE_MIN_DELAY))
+    if not done:
+        # The first request is slower than p95 so far: race an identical one and keep the first success
+        breaker.record_hedge()
+        span = telemetry.current_span()
+        if span is not None:
+            span.set_attribute("hedged", True)
+        pending.add(pool.submit(attempt, endpoint, payload, breaker, idempotent))
+    error = None
+    while done or pending:
+        for future in done:
+            try:
+                return future.result()
+            except Exception as e:
+                error = e
+        if not pending:
+            break
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+    raise error
+
+def score(primary, payload, fallback=None, idempotent=True, hedge=None):
+    """
+    POST payload to a Prompt Flow endpoint and return the parsed JSON response.
+    Endpoints whose breaker is open are skipped; when the primary is unavailable or fails,
+    the fallback endpoint/deployment (if any) is tried.
+    Args:
+        primary (FlowEndpoint): The endpoint to call.
+        payload (dict): Flow inputs.
+        fallback (FlowEndpoint): Optional secondary endpoint or deployment.
+        idempotent (bool): Whether transient failures may be retried by the HTTP client.
+        hedge (bool): Override PROMPT_FLOW_HEDGE. Non-idempotent calls are never hedged.
+    Raises:
+        CircuitOpenError: If every endpoint's breaker is open.
+        Exception: The last endpoint's error otherwise.
+    """
+    hedge = PROMPT_FLOW_HEDGE if hedge is None else hedge
+    span = telemetry.current_span()
+    error = None
+    for role, endpoint in (("primary", primary), ("fallback", fallback)):
+        if endpoint is None:
+            continue
+        breaker = get_breaker(endpoint.name)
+        if not breaker.allow():
+            logger.warning(f"Skipping Prompt Flow endpoint {endpoint.name}: circuit open.")
+            continue
+        try:
+            result = _call(endpoint, payload, breaker, idempotent, hedge)
+        except Exception as e:
+            logger.warning(f"Prompt Flow call to {endpoint.name} failed: {e}")
+            error = e
+            continue
+        finally:
+            breaker.release_probe()
+        if span is not None:
+            span.set_attribute("endpoint", role)
+        return result
+    if error is None:
+        raise CircuitOpenError("Every Prompt Flow endpoint has an open circuit breaker.")
+    raise error
+
+def _output_delta(line):
+    """
+    Text carried by one line of a streamed response: a server-sent event ("data: {...}") or a JSON line,
+    with the text under "output" as Prompt Flow streams it. None for keep-alives and other events.
+    """
+    if line.startswith("data:"):
+        line = line[len("data:"):].strip()
+    if not line or line == "[DONE]":
+        return None
+    try:
+        event = json.loads(line)
+    except ValueError:
+        return None
+    if isinstance(event, dict):
+        delta = event.get("output")
+        return delta if isinstance(delta, str) else None
+    return None
+
+def _stream_attempt(endpoint, payload, breaker):
+    started = time.monotonic()
+    first_chunk = True
+    try:
+        response = http_client.post(
+            endpoint.url, endpoint="prompt_flow", idempotent=True, stream=True,
+            headers=_headers(endpoint, accept="text/event-stream"), json=payload,
+        )
+        try:
+            response.raise_for_status()
+            content_type = response.headers.get("Content-Type") or ""
+            if "json" in content_type and "jsonl" not in content_type and "ndjson" not in content_type:
+                # The deployment ignored the streaming request and answered in one piece
+                output = response.json().get("output")
+                breaker.record_success(time.monotonic() - started)
+                first_chunk = False
+                if output:
+                    yield output
+                return
+            for line in response.iter_lines(decode_unicode=True):
+                delta = _output_delta(line or "")
+                if delta:
+                    if first_chunk:
+                        # Time to first token goes to the breaker's separate TTFT window
+                        breaker.record_success(time.monotonic() - started, first_token=True)
+                        first_chunk = False
+                    yield delta
+            if first_chunk:
+                breaker.record_success(time.monotonic() - started)
+                first_chunk = False
+        finally:
+            response.close()
+    except Exception as e:
+        if first_chunk:
+            if _is_failure(e):
+                breaker.record_failure()
+            else:
+                breaker.record_client_error()
+        raise
+
+def stream_score(primary, payload, fallback=None):
+    """
+    Like score(), but POSTs with Accept: text/event-stream and yields the output text as it arrives.
+    The fallback is only tried while nothing has been yielded; a stream that breaks later raises.
+    Raises:
+        CircuitOpenError: If every endpoint's breaker is open.
+        Exception: The last endpoint's error otherwise.
+    """
+    span = telemetry.current_span()
+    error = None
+    for role, endpoint in (("primary", primary), ("fallback", fallback)):
+        if endpoint is None:
+            continue
+        breaker = get_breaker(endpoint.name)
+        if not breaker.allow():
+            logger.warning(f"Skipping Prompt Flow endpoint {endpoint.name}: circuit open.")
+            continue
+        started = False
+        try:
+            for delta in _stream_attempt(endpoint, payload, breaker):
+                if not started and span is not None:
+                    span.set_attribute("endpoint", role)
+                started = True
+                yield delta
+            if span is not None:
+                span.set_attribute("endpoint", role)
+            return
+        except Exception as e:
+            if started:
+                raise
+            logger.warning(f"Prompt Flow call to {endpoint.name} failed: {e}")
+            error = e
+        finally:
+            breaker.release_probe()
+    if error is None:
+        raise CircuitOpenError("Every Prompt Flow endpoint has an open circuit breaker.")
+    raise error
@@ -0,0 +1,172 @@
+# rate_limit.py
+# Per-installation GitHub rate-limit governor driven by X-RateLimit-* and Retry-After headers
+
+import os
+import time
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Start pacing when the remaining budget falls below this many requests
+RATE_LIMIT_RESERVE = int(os.getenv("RATE_LIMIT_RESERVE", "100"))
+# Longest a request will wait for budget in-process: pacing is capped at this, and an exhausted
+# budget that resets later raises RateLimitExceeded instead
+RATE_LIMIT_MAX_WAIT = float(os.getenv("RATE_LIMIT_MAX_WAIT_SECONDS", "30"))
+# Used for secondary-limit responses without Retry-After (GitHub recommends waiting at least a minute)
+SECONDARY_LIMIT_DEFAULT_WAIT = 60
+
+class RateLimitExceeded(Exception):
+    """
+    Raised when a request would have to wait longer than RATE_LIMIT_MAX_WAIT for budget.
+    retry_at is the Unix time at which the installation is expected to have budget again.
+    """
+    def __init__(self, key, retry_at):
+        super().__init__(f"GitHub rate limit exhausted for {key}; retry after {time.ctime(retry_at)}")
+        self.key = key
+        self.retry_at = retry_at
+
+def _int_header(headers, name):
+    value = headers.get(name)
+    if not isinstance(value, (str, int)):
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+class RateLimitGovernor:
+    """
+    Tracks the remaining GitHub budget per installation and paces or defers requests as it nears zero.
+    """
+    def __init__(self, reserve=RATE_LIMIT_RESERVE, max_wait=RATE_LIMIT_MAX_WAIT):
+        self.reserve = reserve
+        self.max_wait = max_wait
+        self._budgets = {}  # key -> {"remaining", "limit", "reset", "resource"}
+        self._blocked_until = {}  # key -> Unix time
+        self._token_keys = {}  # token -> (installation key, expiry Unix time or None)
+        self._lock = threading.Lock()
+
+    def register_token(self, token, installation_id, expires_at=None):
+        """
+        Associate an installation token with its installation so budgets are tracked per installation.
+        Tokens past expires_at are forgotten so the mapping does not grow with every token refresh.
+        """
+        now = time.time()
+        with self._lock:
+            self._evict_expired_tokens(now)
+            self._token_keys[token] = (f"installation:{installation_id}", expires_at)
+
+    def _evict_expired_tokens(self, now):
+        expired = [token for token, (_, expires_at) in self._token_keys.items() if expires_at is not None and expires_at <= now]
+        for token in expired:
+            del self._token_keys[token]
+
+    def key_for(self, headers):
+        auth = (headers or {}).get("Authorization") or ""
+        scheme, _, credential = auth.partition(" ")
+        if not credential:
+            return "anonymous"
+        if scheme.lower() == "bearer":
+            return "app"
+        with self._lock:
+            key, expires_at = self._token_keys.get(credential, (None, None))
+            if expires_at is not None and expires_at <= time.time():
+                del self._token_keys[credential]
+                key = None
+        return key or f"token:{hashlib.sha256(credential.encode()).hexdigest()[:12]}"
+
+    def delay_for(self, key, now=None):
+        """
+        Seconds to wait before the next request for `key` (0 when budget is healthy).
+        Pacing while budget remains is capped at max_wait; only an exhausted budget or a rate-limit
+        rejection can ask for a longer wait.
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            blocked_until = self._blocked_until.get(key, 0)
+            budget = self._budgets.get(key)
+        if blocked_until > now:
+            return blocked_until - now
+        if not budget or budget["reset"] is None or budget["reset"] <= now:
+            return 0
+        remaining = budget["remaining"]
+        if remaining is None or remaining > self.reserve:
+            return 0
+        if remaining <= 0:
+            return budget["reset"] - now
+        # Spread the remaining reserve evenly over the time left in the window
+        return min((budget["reset"] - now) / remaining, self.max_wait)
+
+    def before_request(self, headers):
+        """
+        Wait for budget if needed. Raises RateLimitExceeded when the budget is exhausted (or the
+        installation is blocked) for longer than max_wait.
+        """
+        key = self.key_for(headers)
+        delay = self.delay_for(key)
+        if delay <= 0:
+            return
+        if delay > self.max_wait:
+            raise RateLimitExceeded(key, time.time() + delay)
+        logger.info(f"Pacing GitHub request for {key}: waiting {delay:.2f}s")
+        time.sleep(delay)
+
+    def after_response(self, headers, response):
+        """
+        Record budget headers and any primary/secondary rate-limit response.
+        Returns True if the response was a rate-limit rejection.
+        """
+        key = self.key_for(headers)
+        now = time.time()
+        response_headers = response.headers or {}
+        remaining = _int_header(response_headers, "X-RateLimit-Remaining")
+        reset = _int_header(response_headers, "X-RateLimit-Reset")
+        if remaining is not None:
+            with self._lock:
+                self._budgets[key] = {
+                    "remaining": remaining,
+                    "limit": _int_header(response_headers, "X-RateLimit-Limit"),
+                    "reset": reset,
+                    "resource": response_headers.get("X-RateLimit-Resource"),
+                }
+        if response.status_code not in (403, 429):
+            return False
+        retry_after = _int_header(response_headers, "Retry-After")
+        if retry_after is not None:
+            blocked_until = now + retry_after
+        elif remaining == 0 and reset is not None:
+            blocked_until = reset
+        elif response.status_code == 429:
+            blocked_until = now + SECONDARY_LIMIT_DEFAULT_WAIT
+        else:
+            # A plain 403 (e.g. missing permission) is not a rate limit
+            return False
+        with self._lock:
+            self._blocked_until[key] = max(self._blocked_until.get(key, 0), blocked_until)
+        logger.warning(f"GitHub rate limit hit for {key} ({response.status_code}); blocked for {blocked_until - now:.0f}s")
+        return True
+
+    def snapshot(self):
+        """
+        Current budget per installation, for metrics export.
+        """
+        now = time.time()
+        with self._lock:
+            keys = set(self._budgets) | set(self._blocked_until)
+            return {
+                key: {
+                    **self._budgets.get(key, {"remaining": None, "limit": None, "reset": None, "resource": None}),
+                    "blocked_for": max(0.0, self._blocked_until.get(key, 0) - now),
+                }
+                for key in keys
+            }
+
+    def reset(self):
+        with self._lock:
+            self._budgets.clear()
+            self._blocked_until.clear()
+            self._token_keys.clear()
+
+governor = RateLimitGovernor()
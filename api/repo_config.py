@@ -0,0 +1,100 @@
+# repo_config.py
+# Per-repo configuration (.guidelines.yml) cached with ETag revalidation
+
+import time
+import logging
+import threading
+from dataclasses import dataclass, field
+from api import http_client
+from api import telemetry
+from api.github_api import GITHUB_API_URL
+
+logger = logging.getLogger(__name__)
+
+# Missing .guidelines.yml (404 carries no ETag) is remembered for this many seconds
+REPO_CONFIG_MISSING_TTL = 300
+
+@dataclass
+class RepoConfig:
+    """
+    Parsed .guidelines.yml for one repository. Missing or invalid files give an empty config.
+    """
+    repo: str
+    data: dict = field(default_factory=dict)
+
+    @property
+    def project_name(self):
+        return self.data.get("project_name") or self.repo
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+@dataclass
+class _CacheEntry:
+    value: object
+    etag: str = None
+    expires_at: float = None
+
+_cache = {}  # url -> _CacheEntry
+_cache_lock = threading.Lock()
+
+def clear_repo_config_cache():
+    with _cache_lock:
+        _cache.clear()
+
+def _conditional_get(url, headers, parse, missing=None):
+    """
+    GET with If-None-Match against the cached ETag. A 304 returns the cached parsed value without
+    re-parsing (and does not count against the GitHub rate limit). A 404 caches `missing` briefly.
+    Other failures return the last cached value, or `missing` if there is none.
+    """
+    with _cache_lock:
+        entry = _cache.get(url)
+    if entry is not None and entry.expires_at is not None and entry.expires_at > time.time():
+        return entry.value
+    headers = dict(headers)
+    if entry is not None and entry.etag:
+        headers["If-None-Match"] = entry.etag
+    try:
+        response = http_client.get(url, endpoint="github", headers=headers)
+    except Exception as e:
+        logger.warning(f"Request for {url} failed: {e}")
+        return entry.value if entry is not None else missing
+    if response.status_code == 304 and entry is not None:
+        return entry.value
+    if response.status_code == 200:
+        value = parse(response)
+        etag = response.headers.get("ETag")
+        with _cache_lock:
+            _cache[url] = _CacheEntry(value=value, etag=etag if isinstance(etag, str) else None)
+        return value
+    if response.status_code == 404:
+        with _cache_lock:
+            _cache[url] = _CacheEntry(value=missing, expires_at=time.time() + REPO_CONFIG_MISSING_TTL)
+        return missing
+    logger.warning(f"Unexpected status {response.status_code} for {url}")
+    return entry.value if entry is not None else missing
+
+@telemetry.traced("github.repo_config")
+def get_repo_config(owner, repo, token):
+    """
+    Return the repository's parsed .guidelines.yml as a RepoConfig, revalidated with its ETag.
+    """
+    url = f"{GITHUB_API_URL}/repos/{owner}/{repo}/contents/.guidelines.yml"
+    headers = {"Authorization": f"token {token}", "Accept": "application/vnd.github.v3.raw"}
+
+    def parse(response):
+        try:
+            import yaml
+            data = yaml.safe_load(response.text)
+            if not isinstance(data, dict):
+                raise ValueError("top-level YAML value is not a mapping")
+            return RepoConfig(repo=repo, data=data)
+        except Exception as e:
+            logger.warning(f"Failed to parse .guidelines.yml: {e}")
+            return RepoConfig(repo=repo)
+
+    config = _conditional_get(url, headers, parse, missing=RepoConfig(repo=repo))
+    if not config.data:
+        logger.info(".guidelines.yml not found or empty, using repo name as project_name.")
+    return config
@@ -0,0 +1,304 @@
+# review_cache.py
+# Content-addressed cache of Prompt Flow review output, keyed by normalized hunk content
+
+import os
+import re
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+REVIEW_CACHE_BACKEND = os.getenv("REVIEW_CACHE_BACKEND", "memory")  # memory, sqlite or none
+REVIEW_CACHE_PATH = os.getenv("REVIEW_CACHE_PATH", "review_cache.sqlite3")
+REVIEW_CACHE_MAX_BYTES = int(os.getenv("REVIEW_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+# Bump when the prompt or guidelines change so stale reviews are not reused
+PROMPT_TEMPLATE_VERSION = os.getenv("PROMPT_TEMPLATE_VERSION", "1")
+GUIDELINES_VERSION = os.getenv("GUIDELINES_VERSION", "1")
+
+# Stand-in text for a flow response without output; never cached
+NO_REVIEW_OUTPUT = "No review output."
+# "file:<unit key>" entries point to the "part:<key>" entry holding the review the unit was part of
+FILE_PREFIX = "file:"
+PART_PREFIX = "part:"
+# `path:LINE` / `path:START-END` references, as used for inline findings
+LINE_REF_RE = re.compile(r"`(?P<path>[^`\s:]+):(?P<start>\d+)(?:-(?P<end>\d+))?`")
+
+def normalize_hunk(hunk):
+    """
+    Canonical text for a hunk: line payloads without line numbers or trailing whitespace,
+    so the same change hits the cache after a rebase moves it.
+    """
+    return "\n".join(line.rstrip() for line in hunk.lines)
+
+def file_cache_key(file_diff, language, project_name,
+                   guidelines_version=GUIDELINES_VERSION, prompt_version=PROMPT_TEMPLATE_VERSION):
+    """
+    Hash of (path, status, normalized hunk content, language, project_name, guidelines version,
+    prompt version) for one review unit: a file, or a hunk slice of a file too large for one chunk.
+    """
+    digest = hashlib.sha256()
+    digest.update(json.dumps([language, project_name, guidelines_version, prompt_version]).encode())
+    digest.update(f"\0{file_diff.path}\0{file_diff.status}\0".encode())
+    for hunk in file_diff.hunks:
+        digest.update(hashlib.sha256(normalize_hunk(hunk).encode()).digest())
+    return digest.hexdigest()
+
+def _normalize_path(path):
+    for prefix in ("./", "b/"):
+        if path.startswith(prefix):
+            path = path[len(prefix):]
+    return path
+
+def rebase_line_refs(review, moves):
+    """
+    Shift `path:LINE` references in a cached review to where their hunks are now.
+    Args:
+        moves (dict): path -> [(old new-side start, line count, offset)] for each hunk of the path.
+    """
+    if not moves:
+        return review
+
+    def shift(path, line):
+        for start, count, offset in moves.get(path, ()):
+            if start <= line < start + max(count, 1):
+                return line + offset
+        return line
+
+    def replace(match):
+        path = _normalize_path(match.group("path"))
+        if path not in moves:
+            return match.group(0)
+        start = shift(path, int(match.group("start")))
+        end = f"-{shift(path, int(match.group('end')))}" if match.group("end") else ""
+        return f"`{match.group('path')}:{start}{end}`"
+
+    return LINE_REF_RE.sub(replace, review)
+
+def lookup_parts(cache, units, key_fn):
+    """
+    Reviews cached for earlier chunks whose units (files or file slices) all appear unchanged in `units`.
+    A part is reused whole, so an edit re-reviews only the chunk its file was reviewed in, whatever
+    else the PR adds or reorders. Line references are re-based to where the hunks are now.
+    Args:
+        units (list): FileDiff records as returned by review_planner.review_units().
+        key_fn (callable): Maps a unit to its file_cache_key().
+    Returns:
+        tuple: ([(unit indices, review)] in diff order, [indices of units without a cached review]),
+            with indices into `units`.
+    """
+    if cache is None:
+        return [], list(range(len(units)))
+    keys = [key_fn(unit) for unit in units]
+    by_key = {}
+    for index, key in enumerate(keys):
+        by_key.setdefault(key, index)
+    covered = set()
+    parts = []
+    for key in by_key:
+        if key in covered:
+            continue
+        part_key = cache.get(FILE_PREFIX + key)
+        raw = cache.get(PART_PREFIX + part_key, record_stats=False) if part_key is not None else None
+        if raw is None:
+            continue
+        part = json.loads(raw)
+        if any(k not in by_key or k in covered for k in part["units"]):
+            continue
+        moves = {}
+        for k, ranges in zip(part["units"], part["hunks"]):
+            current = units[by_key[k]]
+            for (start, count), hunk in zip(ranges, current.hunks):
+                if hunk.new_start != start:
+                    moves.setdefault(current.path, []).append((start, count, hunk.new_start - start))
+        covered.update(part["units"])
+        parts.append(([by_key[k] for k in part["units"]], rebase_line_refs(part["review"], moves)))
+    parts.sort(key=lambda part: min(part[0]))
+    remaining = [index for index, key in enumerate(keys) if key not in covered]
+    return parts, remaining
+
+def store_part(cache, units, review, key_fn):
+    """
+    Cache the review of a chunk of units, findable from each unit's key. Placeholder output is not cached.
+    """
+    if cache is None or not review or review.strip() == NO_REVIEW_OUTPUT:
+        return
+    keys = [key_fn(unit) for unit in units]
+    part_key = hashlib.sha256("\0".join(keys).encode()).hexdigest()
+    cache.set(PART_PREFIX + part_key, json.dumps({
+        "units": keys,
+        "hunks": [[[hunk.new_start, hunk.new_count] for hunk in unit.hunks] for unit in units],
+        "review": review,
+    }))
+    for key in keys:
+        cache.set(FILE_PREFIX + key, part_key)
+
+class ReviewCache:
+    """
+    Interface for review cache backends. Tracks hit/miss/eviction counters.
+    """
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._stats_lock = threading.Lock()
+
+    def get(self, key, record_stats=True):
+        """
+        Cached value for key, or None. With record_stats=False the lookup is not counted as a hit or miss
+        (e.g. the part entry behind a "file:" entry, which was already counted).
+        """
+        value = self._get(key)
+        if not record_stats:
+            return value
+        with self._stats_lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key, value):
+        evicted = self._set(key, value)
+        if evicted:
+            with self._stats_lock:
+                self.evictions += evicted
+
+    def stats(self):
+        with self._stats_lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+            }
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _set(self, key, value):
+        """
+        Store a value and return the number of evicted entries.
+        """
+        raise NotImplementedError
+
+class NullReviewCache(ReviewCache):
+    def _get(self, key):
+        return None
+
+    def _set(self, key, value):
+        return 0
+
+class LRUReviewCache(ReviewCache):
+    """
+    In-memory LRU bounded by the total size of cached review text.
+    """
+    def __init__(self, max_bytes=REVIEW_CACHE_MAX_BYTES):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def _set(self, key, value):
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return 0
+        evicted = 0
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old.encode("utf-8"))
+            self._entries[key] = value
+            self._size += size
+            while self._size > self.max_bytes:
+                _, dropped = self._entries.popitem(last=False)
+                self._size -= len(dropped.encode("utf-8"))
+                evicted += 1
+        return evicted
+
+    def __len__(self):
+        with self._lock:
+            return len(self._entries)
+
+class SQLiteReviewCache(ReviewCache):
+    """
+    On-disk cache shared across function restarts; least recently used rows are evicted by total size.
+    """
+    def __init__(self, path=REVIEW_CACHE_PATH, max_bytes=REVIEW_CACHE_MAX_BYTES):
+        super().__init__()
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS review_cache ("
+            " key TEXT PRIMARY KEY,"
+            " value TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_access REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS review_cache_lru ON review_cache (last_access)")
+
+    def _get(self, key):
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM review_cache WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            self._conn.execute("UPDATE review_cache SET last_access = ? WHERE key = ?", (time.time(), key))
+            return row[0]
+
+    def _set(self, key, value):
+        size = len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return 0
+        evicted = 0
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO review_cache (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time()),
+            )
+            total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM review_cache").fetchone()[0]
+            while total > self.max_bytes:
+                oldest = self._conn.execute(
+                    "SELECT key, size FROM review_cache ORDER BY last_access LIMIT 1"
+                ).fetchone()
+                self._conn.execute("DELETE FROM review_cache WHERE key = ?", (oldest[0],))
+                total -= oldest[1]
+                evicted += 1
+        return evicted
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM review_cache").fetchone()[0]
+
+_cache = None
+_cache_lock = threading.Lock()
+
+def get_review_cache():
+    """
+    Return the process-wide review cache for the configured REVIEW_CACHE_BACKEND.
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            if REVIEW_CACHE_BACKEND == "sqlite":
+                _cache = SQLiteReviewCache()
+            elif REVIEW_CACHE_BACKEND == "none":
+                _cache = NullReviewCache()
+            elif REVIEW_CACHE_BACKEND == "memory":
+                _cache = LRUReviewCache()
+            else:
+                raise ValueError(f"Unknown REVIEW_CACHE_BACKEND: {REVIEW_CACHE_BACKEND}")
+        return _cache
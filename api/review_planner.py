@@ -0,0 +1,197 @@
+# review_planner.py
+# Split large PRs into token-budgeted chunks, review them in parallel and merge the results
+
+import os
+import logging
+from dataclasses import dataclass, field
+from concurrent.futures import ThreadPoolExecutor
+from api.diff_parser import FileDiff
+from api.review_cache import store_part
+
+logger = logging.getLogger(__name__)
+
+# Budget for the diff portion of one Prompt Flow request (prompt + guidelines + output need headroom)
+REVIEW_CHUNK_TOKEN_BUDGET = int(os.getenv("REVIEW_CHUNK_TOKEN_BUDGET", "6000"))
+REVIEW_MAX_PARALLEL_CHUNKS = int(os.getenv("REVIEW_MAX_PARALLEL_CHUNKS", "4"))
+# Rough characters-per-token ratio for code; good enough for budgeting without a tokenizer
+CHARS_PER_TOKEN = 4
+
+def estimate_tokens(text):
+    return len(text) // CHARS_PER_TOKEN + 1
+
+@dataclass
+class ReviewChunk:
+    """
+    A group of whole files or hunk slices of one file that fits the token budget.
+    """
+    files: list = field(default_factory=list)
+    tokens: int = 0
+    # Index of the first unit in the list the chunk was planned from
+    first: int = 0
+
+    @property
+    def paths(self):
+        return list(dict.fromkeys(f.path for f in self.files))
+
+    @property
+    def code_diff(self):
+        return "\n".join(f.to_patch() for f in self.files)
+
+def _file_slice(file_diff, hunks):
+    return FileDiff(
+        path=file_diff.path,
+        old_path=file_diff.old_path,
+        status=file_diff.status,
+        is_binary=file_diff.is_binary,
+        hunks=hunks,
+        added=sum(h.added for h in hunks),
+        removed=sum(h.removed for h in hunks),
+    )
+
+def _truncate_hunk(hunk, budget):
+    """
+    Cut a single hunk that alone exceeds the budget, keeping its header and leading lines.
+    """
+    kept = []
+    # The hunk header and the truncation note count against the budget too
+    used = estimate_tokens(hunk.header) + estimate_tokens(f" ... ({len(hunk.lines)} more lines truncated for review)")
+    for line in hunk.lines:
+        used += estimate_tokens(line)
+        if used > budget:
+            break
+        kept.append(line)
+    dropped = len(hunk.lines) - len(kept)
+    logger.warning(f"Hunk {hunk.header} exceeds the review budget; truncated {dropped} lines.")
+    truncated = type(hunk)(
+        old_start=hunk.old_start,
+        old_count=hunk.old_count,
+        new_start=hunk.new_start,
+        new_count=hunk.new_count,
+        section=hunk.section,
+        lines=kept + [f" ... ({dropped} more lines truncated for review)"],
+        added=sum(1 for line in kept if line.startswith("+")),
+        removed=sum(1 for line in kept if line.startswith("-")),
+    )
+    return truncated
+
+def _split_file(file_diff, budget):
+    """
+    Split one oversized file along hunk boundaries into slices that each fit the budget.
+    Every slice repeats the file header, so its cost is part of each slice's budget.
+    """
+    header_cost = estimate_tokens(_file_slice(file_diff, []).to_patch())
+    hunk_budget = max(1, budget - header_cost)
+    slices = []
+    current = []
+    used = 0
+    for hunk in file_diff.hunks:
+        cost = estimate_tokens(hunk.to_patch())
+        if cost > hunk_budget:
+            hunk = _truncate_hunk(hunk, hunk_budget)
+            cost = estimate_tokens(hunk.to_patch())
+        if current and used + cost > hunk_budget:
+            slices.append(_file_slice(file_diff, current))
+            current, used = [], 0
+        current.append(hunk)
+        used += cost
+    if current:
+        slices.append(_file_slice(file_diff, current))
+    return slices
+
+def review_units(files, budget=REVIEW_CHUNK_TOKEN_BUDGET):
+    """
+    The pieces files are reviewed and cached as: whole files that fit the budget, hunk slices of larger ones.
+    A file is cut the same way whatever else the PR changes.
+    """
+    units = []
+    for file_diff in files:
+        if estimate_tokens(file_diff.to_patch()) <= budget:
+            units.append(file_diff)
+        else:
+            units.extend(_split_file(file_diff, budget))
+    return units
+
+def plan_review_chunks(units, budget=REVIEW_CHUNK_TOKEN_BUDGET):
+    """
+    Pack review units into chunks of at most `budget` estimated tokens.
+    Units are packed as given and never split again, so each chunk's files are units from the input.
+    Args:
+        units (iterable): FileDiff records as returned by review_units().
+        budget (int): Token budget per chunk.
+    Returns:
+        list: ReviewChunk objects in diff order.
+    """
+    chunks = []
+    current = ReviewChunk()
+    for index, unit in enumerate(units):
+        cost = estimate_tokens(unit.to_patch())
+        if current.files and current.tokens + cost > budget:
+            chunks.append(current)
+            current = ReviewChunk(first=index)
+        current.files.append(unit)
+        current.tokens += cost
+    if current.files:
+        chunks.append(current)
+    return chunks
+
+def review_chunks(chunks, review_fn, max_parallel=REVIEW_MAX_PARALLEL_CHUNKS, cache=None, cache_key=None, on_result=None):
+    """
+    Review chunks concurrently with bounded parallelism.
+    Args:
+        chunks (list): ReviewChunk objects.
+        review_fn (callable): Takes a ReviewChunk and returns the review text for its code_diff.
+        max_parallel (int): Maximum concurrent review calls.
+        cache (ReviewCache): Optional cache that successful reviews are stored in, findable per unit
+            (see review_cache.lookup_parts(), which serves cached units before chunks are planned).
+        cache_key (callable): Maps a unit (a chunk's FileDiff) to its cache key (required with cache).
+        on_result (callable): Called with (index, (chunk, review, error)) as each chunk finishes,
+            from the worker thread.
+    Returns:
+        list: (chunk, review text or None, error or None) in chunk order.
+    """
+    def _review_one(chunk):
+        try:
+            review = review_fn(chunk)
+            if cache is not None:
+                store_part(cache, chunk.files, review, cache_key)
+            return chunk, review, None
+        except Exception as e:
+            logger.error(f"Review of chunk {', '.join(chunk.paths)} failed: {e}")
+            return chunk, None, e
+
+    def _review(indexed):
+        index, chunk = indexed
+        result = _review_one(chunk)
+        if on_result is not None:
+            on_result(index, result)
+        return result
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_parallel, len(chunks))), thread_name_prefix="review-chunk") as pool:
+        return list(pool.map(_review, enumerate(chunks)))
+
+def merge_reviews(results):
+    """
+    Merge per-chunk reviews into one structured comment. Chunks with neither a review nor an
+    error yet are left out, so partial results can be shown while a review is still running.
+    Raises:
+        Exception: If every chunk failed.
+    """
+    if results and all(error is not None for _, _, error in results):
+        raise Exception(f"All {len(results)} review chunks failed")
+    if len(results) == 1:
+        return results[0][1]
+    total = len(results)
+    sections = [f"## 🤖 Automated Review ({total} parts)"]
+    failed = []
+    for index, (chunk, review, error) in enumerate(results, start=1):
+        if error is not None:
+            failed.extend(chunk.paths)
+            continue
+        if review is None:
+            continue
+        sections.append(f"### Part {index}/{total}: {', '.join(f'`{p}`' for p in chunk.paths)}\n\n{review}")
+    if failed:
+        sections.append(
+            "> ⚠️ Review unavailable for: " + ", ".join(f"`{p}`" for p in dict.fromkeys(failed))
+        )
+    return "\n\n".join(sections)
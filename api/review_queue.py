@@ -0,0 +1,278 @@
+# review_queue.py
+# Pluggable job queue for the acknowledge-then-process webhook mode
+
+import os
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+REVIEW_QUEUE_BACKEND = os.getenv("REVIEW_QUEUE_BACKEND", "memory")
+REVIEW_QUEUE_PATH = os.getenv("REVIEW_QUEUE_PATH", "review_queue.sqlite3")
+REVIEW_QUEUE_NAME = os.getenv("REVIEW_QUEUE_NAME", "review-jobs")
+# A dequeued job becomes visible again if it is not acknowledged within this many seconds
+REVIEW_JOB_VISIBILITY_TIMEOUT = float(os.getenv("REVIEW_JOB_VISIBILITY_TIMEOUT_SECONDS", "600"))
+REVIEW_JOB_MAX_ATTEMPTS = int(os.getenv("REVIEW_JOB_MAX_ATTEMPTS", "3"))
+# A failed job is retried after this many seconds
+REVIEW_JOB_RETRY_DELAY = float(os.getenv("REVIEW_JOB_RETRY_DELAY_SECONDS", "30"))
+# Local worker threads; LLM concurrency itself is capped by the review scheduler
+REVIEW_WORKER_THREADS = int(os.getenv("REVIEW_WORKER_THREADS", "4"))
+
+def make_job(payload, delivery_id=None):
+    """
+    Build a review job from a validated webhook payload.
+    """
+    return {
+        "id": delivery_id or str(uuid.uuid4()),
+        "payload": payload,
+        "enqueued_at": time.time(),
+        "attempts": 0,
+    }
+
+class ReviewQueue:
+    """
+    Interface for review job queue backends.
+    """
+    def enqueue(self, job, delay=0):
+        """
+        Add a job, invisible to dequeue for the first `delay` seconds.
+        """
+        raise NotImplementedError
+
+    def dequeue(self):
+        """
+        Lease the next job, or return None if the queue is empty.
+        """
+        raise NotImplementedError
+
+    def ack(self, job):
+        """
+        Remove a successfully processed job.
+        """
+        raise NotImplementedError
+
+    def release(self, job, delay=None):
+        """
+        Return a failed job to the queue after `delay` seconds (default REVIEW_JOB_RETRY_DELAY),
+        dropping it after REVIEW_JOB_MAX_ATTEMPTS.
+        """
+        raise NotImplementedError
+
+    def __len__(self):
+        raise NotImplementedError
+
+class InMemoryReviewQueue(ReviewQueue):
+    """
+    Process-local queue for development and tests.
+    """
+    def __init__(self):
+        self._jobs = deque()
+        self._leased = {}
+        self._lock = threading.Lock()
+
+    def enqueue(self, job, delay=0):
+        with self._lock:
+            if delay > 0:
+                self._leased[job["id"]] = (job, time.time() + delay)
+            else:
+                self._jobs.append(job)
+
+    def dequeue(self):
+        with self._lock:
+            self._requeue_expired()
+            if not self._jobs:
+                return None
+            job = self._jobs.popleft()
+            job["attempts"] += 1
+            self._leased[job["id"]] = (job, time.time() + REVIEW_JOB_VISIBILITY_TIMEOUT)
+            return job
+
+    def ack(self, job):
+        with self._lock:
+            self._leased.pop(job["id"], None)
+
+    def release(self, job, delay=None):
+        delay = REVIEW_JOB_RETRY_DELAY if delay is None else delay
+        with self._lock:
+            self._leased.pop(job["id"], None)
+            if job["attempts"] < REVIEW_JOB_MAX_ATTEMPTS:
+                self._leased[job["id"]] = (job, time.time() + delay)
+            else:
+                logger.error(f"Dropping review job {job['id']} after {job['attempts']} attempts.")
+
+    def _requeue_expired(self):
+        now = time.time()
+        for job_id, (job, leased_until) in list(self._leased.items()):
+            if leased_until <= now:
+                del self._leased[job_id]
+                self._jobs.append(job)
+
+    def __len__(self):
+        with self._lock:
+            return len(self._jobs) + len(self._leased)
+
+class SQLiteReviewQueue(ReviewQueue):
+    """
+    Durable local queue backed by a SQLite file; survives function host restarts.
+    """
+    def __init__(self, path=REVIEW_QUEUE_PATH):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS review_jobs ("
+            " seq INTEGER PRIMARY KEY AUTOINCREMENT,"
+            " id TEXT UNIQUE NOT NULL,"
+            " body TEXT NOT NULL,"
+            " attempts INTEGER NOT NULL DEFAULT 0,"
+            " leased_until REAL NOT NULL DEFAULT 0)"
+        )
+
+    def enqueue(self, job, delay=0):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO review_jobs (id, body, attempts, leased_until) VALUES (?, ?, ?, ?)",
+                (job["id"], json.dumps(job), job.get("attempts", 0), time.time() + delay if delay > 0 else 0),
+            )
+
+    def dequeue(self):
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT seq, body, attempts FROM review_jobs WHERE leased_until <= ? ORDER BY seq LIMIT 1",
+                (now,),
+            ).fetchone()
+            if row is None:
+                return None
+            seq, body, attempts = row
+            self._conn.execute(
+                "UPDATE review_jobs SET attempts = ?, leased_until = ? WHERE seq = ?",
+                (attempts + 1, now + REVIEW_JOB_VISIBILITY_TIMEOUT, seq),
+            )
+        job = json.loads(body)
+        job["attempts"] = attempts + 1
+        return job
+
+    def ack(self, job):
+        with self._lock:
+            self._conn.execute("DELETE FROM review_jobs WHERE id = ?", (job["id"],))
+
+    def release(self, job, delay=None):
+        delay = REVIEW_JOB_RETRY_DELAY if delay is None else delay
+        with self._lock:
+            if job["attempts"] < REVIEW_JOB_MAX_ATTEMPTS:
+                self._conn.execute(
+                    "UPDATE review_jobs SET leased_until = ? WHERE id = ?",
+                    (time.time() + delay, job["id"]),
+                )
+            else:
+                logger.error(f"Dropping review job {job['id']} after {job['attempts']} attempts.")
+                self._conn.execute("DELETE FROM review_jobs WHERE id = ?", (job["id"],))
+
+    def __len__(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM review_jobs").fetchone()[0]
+
+class AzureStorageReviewQueue(ReviewQueue):
+    """
+    Azure Storage Queue producer. Jobs are consumed by the ReviewWorker queue-triggered function,
+    which handles leasing and retries itself, so only enqueue is supported here.
+    """
+    def __init__(self, queue_name=REVIEW_QUEUE_NAME, connection_string=None):
+        try:
+            from azure.storage.queue import QueueClient, TextBase64EncodePolicy
+        except ImportError as e:
+            raise Exception("REVIEW_QUEUE_BACKEND=azure requires the azure-storage-queue package.") from e
+        connection_string = connection_string or os.getenv("AzureWebJobsStorage")
+        if not connection_string:
+            raise Exception("AzureWebJobsStorage connection string is required for the azure review queue.")
+        # Queue triggers expect base64-encoded messages
+        self._client = QueueClient.from_connection_string(
+            connection_string, queue_name, message_encode_policy=TextBase64EncodePolicy()
+        )
+
+    def enqueue(self, job, delay=0):
+        self._client.send_message(json.dumps(job), visibility_timeout=int(delay) if delay > 0 else None)
+
+    def __len__(self):
+        return self._client.get_queue_properties().approximate_message_count
+
+def drain_queue(queue, handler, max_jobs=None):
+    """
+    Process queued jobs until the queue is empty or max_jobs have been handled.
+    Args:
+        queue (ReviewQueue): Queue to drain.
+        handler (callable): Called with each job's payload; an exception releases the job for retry.
+        max_jobs (int): Optional cap on jobs processed in this call.
+    Returns:
+        int: Number of jobs processed successfully.
+    """
+    processed = 0
+    handled = 0
+    while max_jobs is None or handled < max_jobs:
+        job = queue.dequeue()
+        if job is None:
+            break
+        handled += 1
+        try:
+            handler(job["payload"])
+        except Exception as e:
+            logger.error(f"Review job {job['id']} failed (attempt {job['attempts']}): {e}")
+            # Rate-limited jobs are deferred until the installation has budget again
+            retry_at = getattr(e, "retry_at", None)
+            queue.release(job, delay=max(0.0, retry_at - time.time()) if retry_at else None)
+            continue
+        queue.ack(job)
+        processed += 1
+    return processed
+
+_queue = None
+_queue_lock = threading.Lock()
+
+def get_review_queue():
+    """
+    Return the process-wide queue for the configured REVIEW_QUEUE_BACKEND (memory, sqlite or azure).
+    """
+    global _queue
+    with _queue_lock:
+        if _queue is None:
+            if REVIEW_QUEUE_BACKEND == "sqlite":
+                _queue = SQLiteReviewQueue()
+            elif REVIEW_QUEUE_BACKEND == "azure":
+                _queue = AzureStorageReviewQueue()
+            elif REVIEW_QUEUE_BACKEND == "memory":
+                _queue = InMemoryReviewQueue()
+            else:
+                raise ValueError(f"Unknown REVIEW_QUEUE_BACKEND: {REVIEW_QUEUE_BACKEND}")
+        return _queue
+
+_workers = []
+
+def start_local_worker(handler, poll_interval=1.0, threads=REVIEW_WORKER_THREADS):
+    """
+    Start background threads that drain the local (memory/sqlite) queue, so jobs from different
+    installations run concurrently and the review scheduler can share LLM slots between them.
+    The azure backend is drained by the ReviewWorker function instead.
+    Returns:
+        list: The running worker threads (empty for the azure backend).
+    """
+    queue = get_review_queue()
+    if isinstance(queue, AzureStorageReviewQueue):
+        return []
+    with _queue_lock:
+        _workers[:] = [worker for worker in _workers if worker.is_alive()]
+
+        def _run():
+            while True:
+                if not drain_queue(queue, handler, max_jobs=1):
+                    time.sleep(poll_interval)
+
+        while len(_workers) < threads:
+            worker = threading.Thread(target=_run, name=f"review-worker-{len(_workers)}", daemon=True)
+            worker.start()
+            _workers.append(worker)
+        return list(_workers)
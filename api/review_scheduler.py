@@ -0,0 +1,211 @@
+# review_scheduler.py
+# Fair, concurrency-limited admission of Prompt Flow (LLM) calls across installations and repos
+
+import os
+import time
+import logging
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+REVIEW_MAX_CONCURRENT_LLM_CALLS = int(os.getenv("REVIEW_MAX_CONCURRENT_LLM_CALLS", "8"))
+REVIEW_MAX_PER_INSTALLATION = int(os.getenv("REVIEW_MAX_PER_INSTALLATION", "4"))
+REVIEW_MAX_PER_REPO = int(os.getenv("REVIEW_MAX_PER_REPO", "2"))
+# Round-robin weights as "installation_id:weight,..."; unlisted installations weigh 1
+REVIEW_INSTALLATION_WEIGHTS = os.getenv("REVIEW_INSTALLATION_WEIGHTS", "")
+# A call waiting longer than this for a slot fails (and a queued job is retried later)
+REVIEW_SLOT_TIMEOUT = float(os.getenv("REVIEW_SLOT_TIMEOUT_SECONDS", "300"))
+# Waiters are promoted one lane per this many seconds so lower lanes are never starved
+REVIEW_LANE_AGING_SECONDS = float(os.getenv("REVIEW_LANE_AGING_SECONDS", "120"))
+
+# Highest priority first
+LANES = ("high", "normal", "low")
+# Recent waits kept for percentile metrics
+WAIT_SAMPLE_SIZE = 1000
+
+def parse_weights(spec):
+    weights = {}
+    for item in filter(None, (part.strip() for part in spec.split(","))):
+        installation, _, weight = item.partition(":")
+        weights[installation.strip()] = max(1, int(weight or 1))
+    return weights
+
+def lane_for(data):
+    """
+    Priority lane for a pull_request payload: draft PRs are reviewed after ready ones.
+    """
+    return "low" if (data.get("pull_request") or {}).get("draft") else "normal"
+
+class _Waiter:
+    __slots__ = ("installation", "repo", "lane", "enqueued_at", "granted")
+
+    def __init__(self, installation, repo, lane):
+        self.installation = installation
+        self.repo = repo
+        self.lane = lane
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+
+class ReviewScheduler:
+    """
+    Admits LLM calls under a global cap and per-installation / per-repo caps.
+    Waiting calls are served by priority lane, then by smooth weighted round-robin across
+    installations, then FIFO within a lane of an installation.
+    """
+    def __init__(self, max_concurrent=REVIEW_MAX_CONCURRENT_LLM_CALLS, max_per_installation=REVIEW_MAX_PER_INSTALLATION,
+                 max_per_repo=REVIEW_MAX_PER_REPO, weights=None, aging_seconds=REVIEW_LANE_AGING_SECONDS):
+        self.max_concurrent = max_concurrent
+        self.max_per_installation = max_per_installation
+        self.max_per_repo = max_per_repo
+        self.weights = parse_weights(REVIEW_INSTALLATION_WEIGHTS) if weights is None else weights
+        self.aging_seconds = aging_seconds
+        self._cond = threading.Condition()
+        self._waiting = {}  # installation -> deque of _Waiter
+        self._current = {}  # installation -> smooth WRR credit
+        self._in_flight = 0
+        self._by_installation = {}
+        self._by_repo = {}
+        self._waits = deque(maxlen=WAIT_SAMPLE_SIZE)
+        self._granted_total = 0
+        self._timeouts = 0
+
+    def _effective_lane(self, waiter, now):
+        lane = LANES.index(waiter.lane)
+        if self.aging_seconds > 0:
+            lane -= int((now - waiter.enqueued_at) // self.aging_seconds)
+        return max(0, lane)
+
+    def _eligible(self, waiter):
+        return (
+            self._by_installation.get(waiter.installation, 0) < self.max_per_installation
+            and self._by_repo.get(waiter.repo, 0) < self.max_per_repo
+        )
+
+    def _remove_waiter(self, waiter):
+        """
+        Dequeue a waiter. An installation with nothing left waiting drops its round-robin credit,
+        so stale credit does not skew later rounds. Caller holds the condition lock.
+        """
+        waiters = self._waiting[waiter.installation]
+        waiters.remove(waiter)
+        if not waiters:
+            del self._waiting[waiter.installation]
+            self._current.pop(waiter.installation, None)
+
+    def _dispatch(self):
+        """
+        Grant slots to waiters while capacity remains. Caller holds the condition lock.
+        """
+        granted = False
+        while self._in_flight < self.max_concurrent:
+            now = time.monotonic()
+            # Each installation's eligible waiter in its best (lowest) lane, the earliest within that lane
+            candidates = {}
+            for installation, waiters in self._waiting.items():
+                eligible = [w for w in waiters if self._eligible(w)]
+                if eligible:
+                    candidates[installation] = min(eligible, key=lambda w: self._effective_lane(w, now))
+            if not candidates:
+                break
+            best_lane = min(self._effective_lane(w, now) for w in candidates.values())
+            contenders = [i for i, w in candidates.items() if self._effective_lane(w, now) == best_lane]
+            # Smooth weighted round-robin among installations contending in that lane
+            total = 0
+            for installation in contenders:
+                weight = self.weights.get(str(installation), 1)
+                self._current[installation] = self._current.get(installation, 0) + weight
+                total += weight
+            chosen = max(contenders, key=lambda i: self._current[i])
+            self._current[chosen] -= total
+            waiter = candidates[chosen]
+            self._remove_waiter(waiter)
+            waiter.granted = True
+            self._in_flight += 1
+            self._by_installation[waiter.installation] = self._by_installation.get(waiter.installation, 0) + 1
+            self._by_repo[waiter.repo] = self._by_repo.get(waiter.repo, 0) + 1
+            self._waits.append(now - waiter.enqueued_at)
+            self._granted_total += 1
+            granted = True
+        if granted:
+            self._cond.notify_all()
+
+    def acquire(self, installation, repo, lane="normal", timeout=REVIEW_SLOT_TIMEOUT):
+        """
+        Block until a slot is granted. Raises an Exception after `timeout` seconds.
+        """
+        if lane not in LANES:
+            raise ValueError(f"Unknown lane: {lane}")
+        waiter = _Waiter(installation, repo, lane)
+        with self._cond:
+            self._waiting.setdefault(installation, deque()).append(waiter)
+            self._dispatch()
+            deadline = waiter.enqueued_at + timeout if timeout is not None else None
+            while not waiter.granted:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    self._remove_waiter(waiter)
+                    self._timeouts += 1
+                    raise Exception(f"Timed out after {timeout}s waiting for an LLM slot ({installation}, {repo})")
+                # Wake up at least once per aging period so promotions take effect without releases
+                waits = [t for t in (remaining, self.aging_seconds or None) if t is not None]
+                self._cond.wait(min(waits) if waits else None)
+                self._dispatch()
+
+    def release(self, installation, repo):
+        with self._cond:
+            self._in_flight -= 1
+            self._by_installation[installation] -= 1
+            if not self._by_installation[installation]:
+                del self._by_installation[installation]
+            self._by_repo[repo] -= 1
+            if not self._by_repo[repo]:
+                del self._by_repo[repo]
+            self._dispatch()
+
+    @contextmanager
+    def slot(self, installation, repo, lane="normal", timeout=REVIEW_SLOT_TIMEOUT):
+        self.acquire(installation, repo, lane, timeout)
+        try:
+            yield
+        finally:
+            self.release(installation, repo)
+
+    def stats(self):
+        """
+        Queue depth per lane and installation, in-flight counts and wait-time metrics (seconds).
+        """
+        with self._cond:
+            depth_by_lane = {lane: 0 for lane in LANES}
+            depth_by_installation = {}
+            for installation, waiters in self._waiting.items():
+                depth_by_installation[installation] = len(waiters)
+                for waiter in waiters:
+                    depth_by_lane[waiter.lane] += 1
+            waits = sorted(self._waits)
+            return {
+                "queue_depth": sum(depth_by_lane.values()),
+                "queue_depth_by_lane": depth_by_lane,
+                "queue_depth_by_installation": depth_by_installation,
+                "in_flight": self._in_flight,
+                "in_flight_by_installation": dict(self._by_installation),
+                "granted_total": self._granted_total,
+                "timeouts": self._timeouts,
+                "wait_p50": waits[len(waits) // 2] if waits else 0.0,
+                "wait_p95": waits[min(len(waits) - 1, int(len(waits) * 0.95))] if waits else 0.0,
+                "wait_max": waits[-1] if waits else 0.0,
+            }
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_review_scheduler():
+    """
+    Return the process-wide review scheduler.
+    """
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = ReviewScheduler()
+        return _scheduler
@@ -0,0 +1,103 @@
+# review_stream.py
+# Progressive PR comment: a placeholder posted when a review starts, edited in place as output arrives
+
+import os
+import time
+import logging
+import threading
+from api import github_api
+
+logger = logging.getLogger(__name__)
+
+# Stream Prompt Flow output into a placeholder comment instead of posting the review when it is done
+REVIEW_STREAMING = os.getenv("REVIEW_STREAMING", "false").lower() == "true"
+# Minimum time between two edits of the comment
+REVIEW_STREAM_UPDATE_SECONDS = float(os.getenv("REVIEW_STREAM_UPDATE_SECONDS", "3"))
+# Cap on intermediate edits per review, so a long review costs at most this many extra writes
+REVIEW_STREAM_MAX_UPDATES = int(os.getenv("REVIEW_STREAM_MAX_UPDATES", "10"))
+
+PLACEHOLDER = "## 🤖 Automated Review\n\n⏳ Review in progress…"
+IN_PROGRESS_FOOTER = "\n\n---\n*⏳ Review in progress…*"
+
+def complete_sections(text):
+    """
+    The prefix of streamed text that ends at a paragraph or section boundary, so readers never
+    see half a sentence or an unterminated list item.
+    """
+    boundary = text.rfind("\n\n")
+    return text[:boundary].rstrip() if boundary > 0 else ""
+
+class ProgressiveComment:
+    """
+    One bot comment that is created as a placeholder and then edited as the review grows.
+    Intermediate edits are throttled to one per `interval` seconds and at most `max_updates`;
+    finish() always writes the final body. Safe to update from several review threads.
+    With comment_id an existing comment (the PR's sticky comment) is reused instead of posting one,
+    and `render` maps the review text to the full comment body.
+    """
+    def __init__(self, owner, repo, pr_number, token, interval=None, max_updates=None, comment_id=None, render=None):
+        self.owner = owner
+        self.repo = repo
+        self.pr_number = pr_number
+        self.token = token
+        self.interval = REVIEW_STREAM_UPDATE_SECONDS if interval is None else interval
+        self.max_updates = REVIEW_STREAM_MAX_UPDATES if max_updates is None else max_updates
+        self.comment_id = comment_id
+        self.render = render or (lambda text: text)
+        self.updates = 0
+        self.started_at = None
+        self.first_update_seconds = None
+        self._body = None
+        self._last_write = 0.0
+        self._lock = threading.Lock()
+
+    def start(self, placeholder=PLACEHOLDER):
+        self.started_at = time.monotonic()
+        body = self.render(placeholder)
+        if self.comment_id is None:
+            self.comment_id = github_api.create_pr_comment(self.owner, self.repo, self.pr_number, body, self.token)
+        else:
+            github_api.update_pr_comment(self.owner, self.repo, self.comment_id, body, self.token)
+        self._body = body
+        self._last_write = time.monotonic()
+        return self
+
+    def update(self, text):
+        """
+        Show `text` (plus an in-progress footer) if the throttle allows; returns True if the comment was edited.
+        Failed edits are logged and skipped, the final edit will carry the full review.
+        """
+        if not text:
+            return False
+        body = self.render(text + IN_PROGRESS_FOOTER)
+        with self._lock:
+            now = time.monotonic()
+            if body == self._body or self.updates >= self.max_updates or now - self._last_write < self.interval:
+                return False
+            self._last_write = now
+            self.updates += 1
+            try:
+                github_api.update_pr_comment(self.owner, self.repo, self.comment_id, body, self.token)
+            except Exception as e:
+                logger.warning(f"Failed to update streaming review comment {self.comment_id}: {e}")
+                return False
+            self._body = body
+            if self.first_update_seconds is None:
+                self.first_update_seconds = now - self.started_at
+        return True
+
+    def partial(self, text):
+        """
+        update() with raw streamed output, cut back to its last complete section.
+        """
+        return self.update(complete_sections(text))
+
+    def finish(self, body):
+        """
+        Write the final body. Raises if the edit fails.
+        """
+        body = self.render(body)
+        with self._lock:
+            if body != self._body:
+                github_api.update_pr_comment(self.owner, self.repo, self.comment_id, body, self.token)
+                self._body = body
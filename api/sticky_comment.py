@@ -0,0 +1,224 @@
+# sticky_comment.py
+# One bot comment per PR, edited in place on every review; earlier reviews are collapsed inside it
+
+import os
+import re
+import logging
+import threading
+from collections import OrderedDict
+from api import github_api
+from api.incremental import REVIEW_MARKER_RE
+
+logger = logging.getLogger(__name__)
+
+# Keep a single review comment per PR instead of posting new comments on every push
+REVIEW_STICKY_COMMENT = os.getenv("REVIEW_STICKY_COMMENT", "true").lower() == "true"
+# Earlier reviews kept (collapsed) in the sticky comment
+REVIEW_STICKY_HISTORY = int(os.getenv("REVIEW_STICKY_HISTORY", "3"))
+# GitHub rejects comment bodies longer than 65536 characters
+COMMENT_MAX_CHARS = 65536
+# PR key -> sticky comment id, so the comment is found even when the comment scan failed
+STICKY_ID_CACHE_SIZE = 4096
+
+STICKY_MARKER = "<!-- ai-code-review:sticky -->"
+HISTORY_MARKER = "<!-- ai-code-review:history -->"
+STALE_MARKER = "<!-- ai-code-review:stale -->"
+# Id of the newest comment the last finished review's run had fetched; commands up to it were handled
+SEEN_RE = re.compile(r"<!-- ai-code-review:seen=(\d+) -->")
+TRUNCATED_NOTE = "\n\n> ✂️ Review truncated to fit GitHub's comment size limit."
+
+_comment_ids = OrderedDict()
+_comment_ids_lock = threading.Lock()
+
+def is_bot(comment):
+    return (comment.get("user") or {}).get("type") == "Bot"
+
+def is_sticky(comment):
+    """
+    True for the app's sticky comment. Markers in comments written by users are not trusted.
+    """
+    return is_bot(comment) and STICKY_MARKER in (comment.get("body") or "")
+
+def seen_marker(comment_id):
+    return f"<!-- ai-code-review:seen={comment_id} -->"
+
+def _last_seen(body):
+    match = SEEN_RE.search(body or "")
+    return int(match.group(1)) if match else None
+
+def find_sticky(comments):
+    """
+    The newest sticky bot comment in `comments`, or None.
+    """
+    for comment in reversed(comments or []):
+        if is_sticky(comment):
+            return comment
+    return None
+
+def _cached_id(key):
+    with _comment_ids_lock:
+        return _comment_ids.get(key)
+
+def remember(key, comment_id):
+    with _comment_ids_lock:
+        _comment_ids[key] = comment_id
+        _comment_ids.move_to_end(key)
+        while len(_comment_ids) > STICKY_ID_CACHE_SIZE:
+            _comment_ids.popitem(last=False)
+
+def forget(key):
+    with _comment_ids_lock:
+        _comment_ids.pop(key, None)
+
+def clear_sticky_cache():
+    with _comment_ids_lock:
+        _comment_ids.clear()
+
+def split_body(body, footer=""):
+    """
+    Split a sticky comment body into (current review, [collapsed earlier reviews]).
+    """
+    body = SEEN_RE.sub("", (body or "").replace(STICKY_MARKER, "", 1), count=1)
+    current, _, history = body.partition(HISTORY_MARKER)
+    current = current.strip()
+    if footer and current.endswith(footer.strip()):
+        current = current[:-len(footer.strip())].rstrip()
+    stale = [STALE_MARKER + block.rstrip() for block in history.split(STALE_MARKER)[1:]]
+    return current, stale
+
+def collapse(review):
+    """
+    A finished review as a collapsed <details> section, or None if `review` is not a finished review
+    (a placeholder or an error note). Head markers are removed so only the current review carries one.
+    """
+    match = REVIEW_MARKER_RE.search(review or "")
+    if match is None:
+        return None
+    content = REVIEW_MARKER_RE.sub("", review).strip()
+    return (
+        f"{STALE_MARKER}\n<details>\n<summary>🕓 Earlier review of <code>{match.group(1)[:7]}</code></summary>\n\n"
+        f"{content}\n\n</details>"
+    )
+
+def review_marker_of(review):
+    match = REVIEW_MARKER_RE.search(review or "")
+    return match.group(0) if match else ""
+
+def render(review, footer="", stale=(), seen=None):
+    """
+    Full sticky comment body: the current review, the footer, then the collapsed earlier reviews.
+    The oldest sections are dropped (and the review itself truncated if need be) to stay under COMMENT_MAX_CHARS.
+    seen is the comment-id watermark stored next to the sticky marker.
+    """
+    stale = list(stale)[:REVIEW_STICKY_HISTORY]
+    header = STICKY_MARKER if seen is None else f"{STICKY_MARKER}\n{seen_marker(seen)}"
+
+    def build(review, stale):
+        parts = [header, review]
+        if footer:
+            parts.append(footer.strip())
+        if stale:
+            parts.append(HISTORY_MARKER + "\n" + "\n\n".join(stale))
+        return "\n\n".join(parts)
+
+    body = build(review, stale)
+    while len(body) > COMMENT_MAX_CHARS and stale:
+        stale.pop()
+        body = build(review, stale)
+    if len(body) > COMMENT_MAX_CHARS:
+        marker = review_marker_of(review)
+        room = COMMENT_MAX_CHARS - len(build("", [])) - len(TRUNCATED_NOTE) - len(marker) - 2
+        body = build(review[:max(0, room)].rstrip() + TRUNCATED_NOTE + ("\n\n" + marker if marker else ""), [])
+    return body
+
+class StickyComment:
+    """
+    The PR's sticky review comment. It is located through the PR-context comments (by STICKY_MARKER)
+    or the cached comment id, and written with a single PATCH (or one POST the first time).
+    The review it held before becomes a collapsed section below the new one.
+    """
+    def __init__(self, owner, repo, pr_number, token, key, comments=None, footer=""):
+        self.owner = owner
+        self.repo = repo
+        self.pr_number = pr_number
+        self.token = token
+        self.key = key
+        self.footer = footer
+        existing = find_sticky(comments)
+        if existing is None and _cached_id(key) is not None:
+            # Not in the scanned comments (e.g. the comment fetch failed): read it by id
+            try:
+                existing = github_api.get_issue_comment(owner, repo, _cached_id(key), token)
+            except Exception as e:
+                logger.warning(f"Could not read sticky comment for {key}: {e}")
+            if existing is None:
+                forget(key)
+        if existing is not None and not is_bot(existing):
+            existing = None
+        self.comment_id = existing.get("id") if existing else None
+        # Comments up to this id were handled by the run that finished the last review
+        self.handled_id = _last_seen(existing.get("body")) if existing else None
+        # Comments written before the watermark existed: older than the last edit counts as handled
+        self.updated_at = existing.get("updated_at") if existing else None
+        # The newest comment this run fetched; its commands are handled once this run's review is finished
+        ids = [c.get("id") for c in comments or [] if isinstance(c.get("id"), int)]
+        self.seen_id = max(ids) if ids else None
+        previous, stale = split_body(existing.get("body") if existing else "", footer)
+        self._previous = previous
+        self._stale = stale
+        self._previous_head = REVIEW_MARKER_RE.search(previous)
+
+    def render(self, review):
+        """
+        Body for `review`, with the review this comment held before collapsed into the history
+        (unless it was for the same head, in which case it is replaced).
+        """
+        stale = list(self._stale)
+        head = REVIEW_MARKER_RE.search(review or "")
+        same_head = self._previous_head and head and self._previous_head.group(1) == head.group(1)
+        collapsed = None if same_head else collapse(self._previous)
+        if collapsed:
+            stale.insert(0, collapsed)
+        # Only a finished review (the run goes on to scan commands) moves the watermark;
+        # placeholders, error notes and superseded reviews keep the previous one
+        seen = self.handled_id
+        if head and self.seen_id is not None:
+            seen = max(seen or 0, self.seen_id)
+        return render(review, self.footer, stale, seen)
+
+    def new_comments(self, comments):
+        """
+        Comments newer than the last finished review's watermark, excluding the comment itself.
+        """
+        fresh = []
+        for comment in comments or []:
+            if is_sticky(comment):
+                continue
+            if self.handled_id is not None:
+                if isinstance(comment.get("id"), int) and comment["id"] <= self.handled_id:
+                    continue
+            elif self.updated_at and (comment.get("created_at") or "") <= self.updated_at:
+                continue
+            fresh.append(comment)
+        return fresh
+
+    def attach(self, comment_id):
+        self.comment_id = comment_id
+        remember(self.key, comment_id)
+
+    def publish(self, review):
+        """
+        Write `review` into the sticky comment with one request. A comment that can no longer be
+        edited (e.g. deleted by a user) is replaced by a new one.
+        """
+        body = self.render(review)
+        if self.comment_id is not None:
+            try:
+                github_api.update_pr_comment(self.owner, self.repo, self.comment_id, body, self.token)
+                remember(self.key, self.comment_id)
+                return self.comment_id
+            except Exception as e:
+                logger.warning(f"Failed to update sticky comment {self.comment_id}, posting a new one: {e}")
+                forget(self.key)
+        self.attach(github_api.create_pr_comment(self.owner, self.repo, self.pr_number, body, self.token))
+        return self.comment_id
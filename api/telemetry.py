@@ -0,0 +1,323 @@
+# telemetry.py
+# Per-stage timing spans for the webhook pipeline, aggregated into latency histograms
+
+import os
+import time
+import json
+import logging
+import secrets
+import inspect
+import functools
+import threading
+import contextvars
+from collections import deque
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+TELEMETRY_ENABLED = os.getenv("TELEMETRY_ENABLED", "true").lower() != "false"
+# Finished spans kept in memory for export
+TELEMETRY_SPAN_BUFFER = int(os.getenv("TELEMETRY_SPAN_BUFFER", "2048"))
+# Stages slower than this are logged as warnings (0 = off)
+TELEMETRY_SLOW_STAGE_SECONDS = float(os.getenv("TELEMETRY_SLOW_STAGE_SECONDS", "10"))
+TELEMETRY_SERVICE_NAME = os.getenv("TELEMETRY_SERVICE_NAME", "ai-code-review-bot")
+
+# Histogram bucket upper bounds in seconds, from a cache hit to a slow LLM call
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+STAGE_METRIC = "review_stage_duration_seconds"
+
+# Arguments of traced helpers that become span attributes
+ARGUMENT_ATTRIBUTES = {"installation_id": "installation", "pr_number": "pr"}
+
+class Span:
+    """
+    One timed stage. Children share the trace id of the span that was current when they started.
+    """
+    __slots__ = ("name", "trace_id", "span_id", "parent", "start_ns", "end_ns", "attributes", "status", "children")
+
+    def __init__(self, name, parent=None, attributes=None):
+        self.name = name
+        self.parent = parent
+        self.trace_id = parent.trace_id if parent is not None else secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.start_ns = time.time_ns()
+        self.end_ns = None
+        self.attributes = {key: value for key, value in (attributes or {}).items() if value is not None}
+        self.status = "ok"
+        self.children = []  # finished descendants, collected on the root for its summary
+
+    @property
+    def root(self):
+        span = self
+        while span.parent is not None:
+            span = span.parent
+        return span
+
+    @property
+    def duration(self):
+        end = self.end_ns if self.end_ns is not None else time.time_ns()
+        return (end - self.start_ns) / 1e9
+
+    def set_attribute(self, key, value):
+        if value is not None:
+            self.attributes[key] = value
+
+    def set_attributes(self, **attributes):
+        for key, value in attributes.items():
+            self.set_attribute(key, value)
+
+    def set_error(self, error=None):
+        self.status = "error"
+        if error is not None:
+            self.attributes["error.type"] = type(error).__name__
+
+    def to_otel(self):
+        """
+        The span in OTLP/JSON form (as sent to an OpenTelemetry collector's /v1/traces).
+        """
+        span = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": "SPAN_KIND_INTERNAL",
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns or time.time_ns()),
+            "attributes": [{"key": key, "value": _otel_value(value)} for key, value in self.attributes.items()],
+            "status": {"code": "STATUS_CODE_ERROR" if self.status == "error" else "STATUS_CODE_OK"},
+        }
+        if self.parent is not None:
+            span["parentSpanId"] = self.parent.span_id
+        return span
+
+def _otel_value(value):
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+class Histogram:
+    """
+    Cumulative-bucket latency histogram for one label set.
+    """
+    def __init__(self, buckets=STAGE_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, value):
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                break
+        else:
+            index = len(self.buckets)
+        self.counts[index] += 1
+        self.sum += value
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """
+        Upper bound of the bucket holding the q-th quantile, capped at the largest observed value.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank:
+                return min(self.buckets[index], self.max) if index < len(self.buckets) else self.max
+        return self.max
+
+_current_span = contextvars.ContextVar("telemetry_span", default=None)
+_histograms = {}  # (stage, outcome) -> Histogram
+_spans = deque(maxlen=TELEMETRY_SPAN_BUFFER)
+_lock = threading.Lock()
+
+def current_span():
+    return _current_span.get()
+
+def record(stage, seconds, outcome="ok"):
+    """
+    Add one stage duration to the histograms.
+    """
+    with _lock:
+        histogram = _histograms.get((stage, outcome))
+        if histogram is None:
+            histogram = _histograms[(stage, outcome)] = Histogram()
+        histogram.observe(seconds)
+
+def _finish(span):
+    span.end_ns = time.time_ns()
+    record(span.name, span.duration, span.status)
+    with _lock:
+        _spans.append(span)
+    if span.parent is None:
+        if span.children:
+            logger.info(f"Stage timings for {span.name} ({span.trace_id}): {format_stages(span)}")
+        return
+    span.root.children.append(span)
+    if TELEMETRY_SLOW_STAGE_SECONDS and span.duration > TELEMETRY_SLOW_STAGE_SECONDS:
+        logger.warning(f"Slow stage {span.name}: {span.duration:.2f}s {span.attributes}")
+
+@contextmanager
+def span(name, **attributes):
+    """
+    Time a stage as a child of the current span (or as a new trace). Exceptions mark the span
+    as an error and propagate. Yields the Span so callers can add attributes such as the outcome.
+    """
+    if not TELEMETRY_ENABLED:
+        yield Span(name, attributes=attributes)
+        return
+    current = Span(name, parent=_current_span.get(), attributes=attributes)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.set_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        _finish(current)
+
+def _argument_attributes(signature, args, kwargs):
+    try:
+        bound = signature.bind_partial(*args, **kwargs).arguments
+    except TypeError:
+        return {}
+    attributes = {}
+    if bound.get("owner") and bound.get("repo"):
+        attributes["repo"] = f"{bound['owner']}/{bound['repo']}"
+    for argument, key in ARGUMENT_ATTRIBUTES.items():
+        if bound.get(argument) is not None:
+            attributes[key] = bound[argument]
+    return attributes
+
+def traced(name):
+    """
+    Decorator running the function inside a span, tagged with its owner/repo, pr_number
+    and installation_id arguments.
+    """
+    def decorator(fn):
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with span(name, **_argument_attributes(signature, args, kwargs)):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def propagate(fn):
+    """
+    Wrap fn so it runs under the current span when called from a worker thread.
+    """
+    parent = _current_span.get()
+
+    @functools.wraps(fn)
+    def wrapper(*args, **kwargs):
+        token = _current_span.set(parent)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current_span.reset(token)
+    return wrapper
+
+def format_stages(root, limit=6):
+    """
+    "stage 1.23s, ..." for a root span's slowest descendants, so the bottleneck is the first entry.
+    """
+    stages = sorted(root.children, key=lambda child: -child.duration)[:limit]
+    return ", ".join(f"{child.name} {child.duration:.2f}s" for child in stages)
+
+def _label_value(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def prometheus_text():
+    """
+    All stage histograms in the Prometheus text exposition format.
+    """
+    lines = [
+        f"# HELP {STAGE_METRIC} Duration of webhook pipeline stages.",
+        f"# TYPE {STAGE_METRIC} histogram",
+    ]
+    with _lock:
+        items = sorted(_histograms.items())
+        for (stage, outcome), histogram in items:
+            labels = f'stage="{_label_value(stage)}",outcome="{_label_value(outcome)}"'
+            cumulative = 0
+            for bound, count in zip(list(histogram.buckets) + ["+Inf"], histogram.counts):
+                cumulative += count
+                lines.append(f'{STAGE_METRIC}_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"{STAGE_METRIC}_sum{{{labels}}} {histogram.sum:.6f}")
+            lines.append(f"{STAGE_METRIC}_count{{{labels}}} {histogram.count}")
+    return "\n".join(lines) + "\n"
+
+def metric_text(name, help_text, samples, metric_type="gauge"):
+    """
+    One metric family in the Prometheus text exposition format.
+    samples is a list of (labels dict, value); samples with a None value are skipped.
+    """
+    lines = [f"# HELP {name} {help_text}", f"# TYPE {name} {metric_type}"]
+    for labels, value in samples:
+        if value is None:
+            continue
+        label_text = ",".join(f'{key}="{_label_value(label)}"' for key, label in labels.items())
+        lines.append(f"{name}{{{label_text}}} {value}" if label_text else f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+def stage_summary():
+    """
+    Per-stage count, mean, p50/p95 (bucket upper bounds) and max in seconds, slowest p95 first.
+    """
+    with _lock:
+        merged = {}
+        for (stage, _), histogram in _histograms.items():
+            total = merged.setdefault(stage, Histogram())
+            total.counts = [a + b for a, b in zip(total.counts, histogram.counts)]
+            total.sum += histogram.sum
+            total.count += histogram.count
+            total.max = max(total.max, histogram.max)
+    summary = {
+        stage: {
+            "count": histogram.count,
+            "mean": histogram.sum / histogram.count if histogram.count else 0.0,
+            "p50": histogram.quantile(0.5),
+            "p95": histogram.quantile(0.95),
+            "max": histogram.max,
+        }
+        for stage, histogram in merged.items()
+    }
+    return dict(sorted(summary.items(), key=lambda item: -item[1]["p95"]))
+
+def recent_spans(limit=None):
+    with _lock:
+        spans = list(_spans)
+    return spans[-limit:] if limit else spans
+
+def otlp_json(limit=None):
+    """
+    Recent finished spans as an OTLP/JSON ExportTraceServiceRequest body.
+    """
+    return json.dumps({
+        "resourceSpans": [{
+            "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": TELEMETRY_SERVICE_NAME}}]},
+            "scopeSpans": [{
+                "scope": {"name": __name__},
+                "spans": [span.to_otel() for span in recent_spans(limit)],
+            }],
+        }],
+    })
+
+def reset():
+    """
+    Drop all histograms and buffered spans (used by tests).
+    """
+    with _lock:
+        _histograms.clear()
+        _spans.clear()
@@ -0,0 +1,47 @@
+import os
+import sys
+import json
+import unittest
+import subprocess
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Generous for slow CI hosts; a cold import currently takes well under half of this
+COLD_IMPORT_BUDGET_SECONDS = float(os.getenv("COLD_IMPORT_BUDGET_SECONDS", "1.0"))
+# Imported on first use only
+LAZY_MODULES = ("jwt", "yaml", "azure.identity", "azure.keyvault.secrets", "azure.core", "azure.storage.queue")
+
+# Runs in a fresh interpreter with sockets disabled, so any import-time network call fails the import
+COLD_IMPORT = r'''
+import json, socket, sys, time
+
+def no_network(*args, **kwargs):
+    raise AssertionError("network I/O at import time")
+
+socket.socket.connect = no_network
+socket.getaddrinfo = no_network
+started = time.perf_counter()
+import api.main, api.HttpTrigger1, api.ReviewWorker, api.Metrics
+elapsed = time.perf_counter() - started
+print(json.dumps({"elapsed": elapsed, "loaded": [name for name in sys.argv[1:] if name in sys.modules]}))
+'''
+
+class TestColdStart(unittest.TestCase):
+    def cold_import(self):
+        result = subprocess.run(
+            [sys.executable, "-c", COLD_IMPORT, *LAZY_MODULES],
+            cwd=REPO_ROOT, capture_output=True, text=True, timeout=60,
+        )
+        self.assertEqual(result.returncode, 0, result.stderr)
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def test_import_does_no_network_io_and_defers_heavy_modules(self):
+        report = self.cold_import()
+        self.assertEqual(report["loaded"], [])
+
+    def test_cold_import_within_budget(self):
+        # Best of three, so one noisy run on a busy host does not fail the build
+        elapsed = min(self.cold_import()["elapsed"] for _ in range(3))
+        self.assertLess(elapsed, COLD_IMPORT_BUDGET_SECONDS)
+
+if __name__ == "__main__":
+    unittest.main()
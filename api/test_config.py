@@ -10,6 +10,7 @@ class TestConfig(unittest.TestCase):
         self.mock_secret = MagicMock()
         self.mock_secret.value = 'secret_value'
         self.mock_client.get_secret.return_value = self.mock_secret
+        config.clear_secret_cache()
 
     def tearDown(self):
         patch.stopall()
@@ -34,5 +35,41 @@ class TestConfig(unittest.TestCase):
         value = config.get_secret('test-secret', max_retries=2, backoff_factor=0)
         self.assertEqual(value, 'secret_value')
 
+    def test_get_secret_served_from_cache(self):
+        config.get_secret('test-secret')
+        config.get_secret('test-secret')
+        self.assertEqual(self.mock_client.get_secret.call_count, 1)
+
+    def test_get_secret_ttl_zero_bypasses_cache(self):
+        config.get_secret('test-secret', ttl=0)
+        config.get_secret('test-secret', ttl=0)
+        self.assertEqual(self.mock_client.get_secret.call_count, 2)
+
+    def test_get_secret_stale_triggers_background_refresh(self):
+        config.get_secret('test-secret')
+        rotated = MagicMock()
+        rotated.value = 'rotated_value'
+        self.mock_client.get_secret.return_value = rotated
+        with patch('api.config.monotonic', return_value=config.monotonic() + config.SECRET_CACHE_TTL + 1), \
+                patch('api.config.threading.Thread') as mock_thread:
+            value = config.get_secret('test-secret')
+            # Stale value is served immediately while the refresh is scheduled
+            self.assertEqual(value, 'secret_value')
+            mock_thread.return_value.start.assert_called_once()
+            mock_thread.call_args.kwargs['target']()
+        self.assertEqual(config.get_secret('test-secret'), 'rotated_value')
+
+    def test_prefetch_secrets_loads_cache(self):
+        values = config.prefetch_secrets(['a', 'b', 'a'])
+        self.assertEqual(values, {'a': 'secret_value', 'b': 'secret_value'})
+        self.assertEqual(self.mock_client.get_secret.call_count, 2)
+        config.get_secret('a')
+        self.assertEqual(self.mock_client.get_secret.call_count, 2)
+
+    def test_prefetch_secrets_failure(self):
+        self.mock_client.get_secret.side_effect = ValueError('boom')
+        with self.assertRaises(Exception):
+            config.prefetch_secrets(['a'])
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
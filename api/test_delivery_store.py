@@ -0,0 +1,68 @@
+import unittest
+from unittest.mock import patch
+import api.delivery_store as delivery_store
+
+class DeliveryStoreBehaviour:
+    def make_store(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.store = self.make_store()
+
+    def test_claim_delivery_once(self):
+        self.assertTrue(self.store.claim_delivery('d1'))
+        self.assertFalse(self.store.claim_delivery('d1'))
+        self.assertTrue(self.store.claim_delivery('d2'))
+
+    def test_claim_expires_after_ttl(self):
+        self.store.claim_delivery('d1')
+        later = delivery_store.time.time() + self.store.ttl + 1
+        with patch('api.delivery_store.time.time', return_value=later):
+            self.assertTrue(self.store.claim_delivery('d1'))
+
+    def test_released_delivery_can_be_claimed_again(self):
+        self.store.claim_delivery('d1')
+        self.store.release_delivery('d1')
+        self.assertTrue(self.store.claim_delivery('d1'))
+        self.store.release_delivery('unknown')
+
+    def test_pending_pushes_keep_earliest_base(self):
+        self.assertEqual(self.store.record_push('o/r#1', 'b', 'a'), 'a')
+        self.assertEqual(self.store.record_push('o/r#1', 'c', 'b'), 'a')
+        self.assertTrue(self.store.is_superseded('o/r#1', 'b'))
+        self.assertFalse(self.store.is_superseded('o/r#1', 'c'))
+
+    def test_reviewed_head_advances_base(self):
+        self.store.record_push('o/r#1', 'b', 'a')
+        self.store.mark_reviewed('o/r#1', 'b')
+        self.assertEqual(self.store.record_push('o/r#1', 'c', 'b'), 'b')
+
+    def test_opened_then_push_stays_full_review(self):
+        self.assertIsNone(self.store.record_push('o/r#1', 'a', None))
+        self.assertIsNone(self.store.record_push('o/r#1', 'b', 'a'))
+
+    def test_same_head_redelivered_keeps_state(self):
+        self.store.record_push('o/r#1', 'b', 'a')
+        self.assertEqual(self.store.record_push('o/r#1', 'b', 'a'), 'a')
+        self.assertIsNone(self.store.latest_head('o/r#2'))
+
+class TestInMemoryDeliveryStore(DeliveryStoreBehaviour, unittest.TestCase):
+    def make_store(self):
+        return delivery_store.InMemoryDeliveryStore()
+
+class TestSQLiteDeliveryStore(DeliveryStoreBehaviour, unittest.TestCase):
+    def make_store(self):
+        return delivery_store.SQLiteDeliveryStore(':memory:')
+
+class TestPayloadHelpers(unittest.TestCase):
+    def test_pr_key_and_head(self):
+        data = {
+            'repository': {'name': 'repo', 'owner': {'login': 'owner'}},
+            'pull_request': {'number': 7, 'head': {'sha': 'abc'}},
+        }
+        self.assertEqual(delivery_store.pr_key(data), 'owner/repo#7')
+        self.assertEqual(delivery_store.payload_head_sha(data), 'abc')
+        self.assertEqual(delivery_store.payload_head_sha(dict(data, after='def')), 'def')
+
+if __name__ == '__main__':
+    unittest.main()
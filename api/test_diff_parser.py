@@ -0,0 +1,87 @@
+import unittest
+import api.diff_parser as diff_parser
+
+SAMPLE_DIFF = """diff --git a/app/main.py b/app/main.py
+index 83db48f..bf269f4 100644
+--- a/app/main.py
++++ b/app/main.py
+@@ -1,4 +1,5 @@ def main():
+ import os
+-import sys
++import logging
++import json
+ 
+ print("hi")
+@@ -10 +11 @@ class App:
+--- not a header, a removed line
++++ not a header, an added line
+diff --git a/docs/new.md b/docs/new.md
+new file mode 100644
+index 0000000..e69de29
+--- /dev/null
++++ b/docs/new.md
+@@ -0,0 +1,2 @@
++# Title
++text
+\\ No newline at end of file
+diff --git a/old.txt b/old.txt
+deleted file mode 100644
+--- a/old.txt
++++ /dev/null
+@@ -1 +0,0 @@
+-gone
+diff --git a/src/a.js b/src/b.js
+similarity index 100%
+rename from src/a.js
+rename to src/b.js
+diff --git a/logo.png b/logo.png
+index 1111111..2222222 100644
+Binary files a/logo.png and b/logo.png differ
+"""
+
+class TestDiffParser(unittest.TestCase):
+    def setUp(self):
+        self.files = diff_parser.parse_diff_text(SAMPLE_DIFF)
+
+    def test_file_records(self):
+        self.assertEqual(
+            [(f.path, f.status) for f in self.files],
+            [('app/main.py', 'modified'), ('docs/new.md', 'added'), ('old.txt', 'removed'),
+             ('src/b.js', 'renamed'), ('logo.png', 'modified')],
+        )
+        self.assertEqual(self.files[3].old_path, 'src/a.js')
+        self.assertTrue(self.files[4].is_binary)
+
+    def test_hunk_ranges_and_counts(self):
+        main = self.files[0]
+        self.assertEqual(len(main.hunks), 2)
+        first = main.hunks[0]
+        self.assertEqual((first.old_start, first.old_count, first.new_start, first.new_count), (1, 4, 1, 5))
+        self.assertEqual(first.section, 'def main():')
+        # Lines that look like ---/+++ headers inside a hunk are content
+        self.assertEqual((main.hunks[1].added, main.hunks[1].removed), (1, 1))
+        self.assertEqual((main.added, main.removed), (3, 2))
+        self.assertEqual(self.files[1].added, 2)
+        self.assertEqual(self.files[1].hunks[0].lines[-1], '\\ No newline at end of file')
+
+    def test_streaming_input(self):
+        lines = (line.encode() for line in SAMPLE_DIFF.splitlines())
+        stream = diff_parser.parse_diff(lines)
+        first = next(stream)
+        self.assertEqual(first.path, 'app/main.py')
+        self.assertEqual(len(list(stream)), 4)
+
+    def test_round_trip(self):
+        rendered = diff_parser.render_diff(self.files)
+        reparsed = diff_parser.parse_diff_text(rendered)
+        self.assertEqual(
+            [(f.path, f.status, f.added, f.removed) for f in reparsed],
+            [(f.path, f.status, f.added, f.removed) for f in self.files],
+        )
+
+    def test_plain_diff_without_git_header(self):
+        files = diff_parser.parse_diff_text("--- a/x.py\n+++ b/x.py\n@@ -1 +1 @@\n-a\n+b\n--- a/y.py\n+++ b/y.py\n@@ -1 +1 @@\n-c\n+d\n")
+        self.assertEqual([f.path for f in files], ['x.py', 'y.py'])
+
+if __name__ == '__main__':
+    unittest.main()
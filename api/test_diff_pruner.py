@@ -0,0 +1,90 @@
+import unittest
+from api.diff_parser import parse_diff_text
+from api.diff_pruner import prune_diff, glob_to_regex, is_whitespace_only
+from api.repo_config import RepoConfig
+
+def file_diff(path, removed='old', added='new'):
+    return f"diff --git a/{path} b/{path}\n--- a/{path}\n+++ b/{path}\n@@ -1 +1 @@\n-{removed}\n+{added}\n"
+
+class TestDiffPruner(unittest.TestCase):
+    def test_glob_to_regex(self):
+        self.assertTrue(glob_to_regex('*.lock').match('deep/dir/yarn.lock'))
+        self.assertTrue(glob_to_regex('vendor/**').match('vendor/a/b.go'))
+        self.assertFalse(glob_to_regex('vendor/**').match('src/vendor.go'))
+        self.assertTrue(glob_to_regex('**/generated/**').match('api/generated/models.py'))
+        self.assertFalse(glob_to_regex('src/*.py').match('src/pkg/a.py'))
+
+    def test_builtin_rules_skip_noise(self):
+        diff = ''.join(file_diff(p) for p in (
+            'src/app.py', 'package-lock.json', 'static/app.min.js', 'api/proto/svc_pb2.py',
+            'vendor/lib/x.go', 'tests/__snapshots__/a.snap',
+        )) + 'diff --git a/logo.png b/logo.png\nBinary files a/logo.png and b/logo.png differ\n'
+        report = prune_diff(parse_diff_text(diff))
+        self.assertEqual([f.path for f in report.files], ['src/app.py'])
+        self.assertEqual(dict(report.skipped), {
+            'package-lock.json': 'lockfile',
+            'static/app.min.js': 'minified',
+            'api/proto/svc_pb2.py': 'generated',
+            'vendor/lib/x.go': 'vendored',
+            'tests/__snapshots__/a.snap': 'snapshot',
+            'logo.png': 'binary',
+        })
+        self.assertGreater(report.lines_saved, 0)
+        self.assertGreater(report.tokens_saved, 0)
+        self.assertIn('`package-lock.json` (lockfile)', report.summary())
+
+    def test_repo_include_exclude_and_size_cap(self):
+        diff = file_diff('src/a.py') + file_diff('docs/guide.py') + file_diff('scripts/b.py') + file_diff('src/dist/x.lock')
+        config = RepoConfig(repo='r', data={'pruning': {
+            'include': ['src/**', 'docs/**'], 'exclude': ['docs/**'], 'max_file_lines': 0,
+        }})
+        report = prune_diff(parse_diff_text(diff), config)
+        # include overrides the built-in lockfile rule for src/dist/x.lock
+        self.assertEqual([f.path for f in report.files], ['src/a.py', 'src/dist/x.lock'])
+        self.assertEqual(dict(report.skipped), {'docs/guide.py': 'excluded', 'scripts/b.py': 'not included'})
+        capped = prune_diff(parse_diff_text(file_diff('src/a.py')), RepoConfig(repo='r', data={'pruning': {'max_file_lines': 1}}))
+        self.assertEqual(capped.skipped, [('src/a.py', '2 changed lines')])
+
+    def test_whitespace_only_hunks_dropped(self):
+        diff = (
+            "diff --git a/a.py b/a.py\n--- a/a.py\n+++ b/a.py\n"
+            "@@ -1,2 +1,3 @@\n-x = 1\n-def f(a, b):\n+x  =  1 \n+\n+def f(a,\tb):\n"
+            "@@ -10 +11 @@\n-return 1\n+return 2\n"
+        )
+        files = parse_diff_text(diff)
+        self.assertTrue(is_whitespace_only(files[0].hunks[0]))
+        report = prune_diff(files)
+        self.assertEqual(report.whitespace_hunks, 1)
+        self.assertEqual(len(report.files[0].hunks), 1)
+        self.assertEqual(report.files[0].added, 1)
+        self.assertEqual(report.skipped, [])
+
+    def test_token_joins_and_python_indentation_are_reviewed(self):
+        def hunk(path, removed, added):
+            return parse_diff_text(file_diff(path, removed, added))[0].hunks[0]
+        self.assertFalse(is_whitespace_only(hunk('a.py', 'return x', 'returnx')))
+        self.assertFalse(is_whitespace_only(hunk('a.py', '    return x', 'return x')))
+        diff = file_diff('a.py', '    return x', 'return x') + file_diff('a.yml', 'key: 1', '  key: 1') + file_diff('a.js', '    f();', '  f();')
+        report = prune_diff(parse_diff_text(diff))
+        self.assertEqual([f.path for f in report.files], ['a.py', 'a.yml'])
+        self.assertEqual(report.skipped, [('a.js', 'whitespace-only')])
+
+    def test_malformed_pruning_config_falls_back_to_defaults(self):
+        diff = file_diff('src/a.py') + file_diff('yarn.lock')
+        for pruning in ('docs/**', ['docs/**'], {'include': 5, 'exclude': {'a': 1}, 'builtin_rules': 'no', 'max_file_lines': 'many'}):
+            with self.assertLogs('api.diff_pruner', level='WARNING'):
+                report = prune_diff(parse_diff_text(diff), RepoConfig(repo='r', data={'pruning': pruning}))
+            self.assertEqual([f.path for f in report.files], ['src/a.py'])
+            self.assertEqual(report.skipped, [('yarn.lock', 'lockfile')])
+        # A single glob string is accepted as a one-item list
+        report = prune_diff(parse_diff_text(diff), RepoConfig(repo='r', data={'pruning': {'exclude': 'src/**'}}))
+        self.assertEqual(dict(report.skipped), {'src/a.py': 'excluded', 'yarn.lock': 'lockfile'})
+
+    def test_rename_only_summarized(self):
+        diff = "diff --git a/old.py b/new.py\nsimilarity index 100%\nrename from old.py\nrename to new.py\n"
+        report = prune_diff(parse_diff_text(diff))
+        self.assertEqual(report.files, [])
+        self.assertEqual(report.skipped, [('new.py', 'rename-only')])
+
+if __name__ == '__main__':
+    unittest.main()
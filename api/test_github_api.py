@@ -1,15 +1,21 @@
 import unittest
+import json
+import threading
+import time
 from unittest.mock import patch, MagicMock
 import api.github_api as github_api
+import api.repo_config as repo_config
 
 class TestGithubApi(unittest.TestCase):
     def setUp(self):
         self.patcher_get_secret = patch('api.config.get_secret', return_value='dummy')
         self.patcher_get_secret.start()
-        self.patcher_requests_post = patch('requests.post')
-        self.mock_post = self.patcher_requests_post.start()
-        self.patcher_requests_get = patch('requests.get')
-        self.mock_get = self.patcher_requests_get.start()
+        self.patcher_http_post = patch('api.http_client.post')
+        self.mock_post = self.patcher_http_post.start()
+        self.patcher_http_get = patch('api.http_client.get')
+        self.mock_get = self.patcher_http_get.start()
+        github_api.clear_token_cache()
+        repo_config.clear_repo_config_cache()
 
     def tearDown(self):
         patch.stopall()
@@ -34,6 +40,53 @@ class TestGithubApi(unittest.TestCase):
         with self.assertRaises(Exception):
             github_api.get_installation_token('appid', 'privatekey', 123)
 
+    def test_get_installation_token_cached_until_expiry(self):
+        mock_response = MagicMock()
+        mock_response.status_code = 201
+        mock_response.json.return_value = {'token': 'abc', 'expires_at': '2099-01-01T00:00:00Z'}
+        self.mock_post.return_value = mock_response
+        with patch('api.github_api.generate_jwt', return_value='jwt') as mock_jwt:
+            self.assertEqual(github_api.get_installation_token('appid', 'privatekey', 123), 'abc')
+            self.assertEqual(github_api.get_installation_token('appid', 'privatekey', 123), 'abc')
+        self.assertEqual(self.mock_post.call_count, 1)
+        self.assertEqual(mock_jwt.call_count, 1)
+
+    def test_get_installation_token_refreshes_near_expiry(self):
+        mock_response = MagicMock()
+        mock_response.status_code = 201
+        soon = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(time.time() + 60))
+        mock_response.json.return_value = {'token': 'abc', 'expires_at': soon}
+        self.mock_post.return_value = mock_response
+        with patch('api.github_api.generate_jwt', return_value='jwt') as mock_jwt:
+            github_api.get_installation_token('appid', 'privatekey', 123)
+            github_api.get_installation_token('appid', 'privatekey', 123)
+        # Token inside the refresh margin is exchanged again, but the JWT is reused
+        self.assertEqual(self.mock_post.call_count, 2)
+        self.assertEqual(mock_jwt.call_count, 1)
+
+    def test_get_installation_token_single_flight(self):
+        mock_response = MagicMock()
+        mock_response.status_code = 201
+        mock_response.json.return_value = {'token': 'abc', 'expires_at': '2099-01-01T00:00:00Z'}
+
+        def slow_post(*args, **kwargs):
+            time.sleep(0.05)
+            return mock_response
+        self.mock_post.side_effect = slow_post
+        results = []
+        with patch('api.github_api.generate_jwt', return_value='jwt'):
+            threads = [
+                threading.Thread(target=lambda: results.append(
+                    github_api.get_installation_token('appid', 'privatekey', 123)))
+                for _ in range(5)
+            ]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        self.assertEqual(results, ['abc'] * 5)
+        self.assertEqual(self.mock_post.call_count, 1)
+
     def test_fetch_pr_data_success(self):
         pr_json = {'diff_url': 'url', 'title': 'msg'}
         mock_pr = MagicMock()
@@ -70,6 +123,43 @@ class TestGithubApi(unittest.TestCase):
         with self.assertRaises(Exception):
             github_api.post_pr_comment('owner', 'repo', 1, 'comment', 'token')
 
+    def test_create_pr_comment_returns_id(self):
+        mock_response = MagicMock()
+        mock_response.status_code = 201
+        mock_response.json.return_value = {'id': 77}
+        self.mock_post.return_value = mock_response
+        self.assertEqual(github_api.create_pr_comment('owner', 'repo', 1, 'comment', 'token'), 77)
+
+    def test_create_pr_review_posts_batch(self):
+        self.mock_post.return_value.status_code = 200
+        self.mock_post.return_value.json.return_value = {'id': 5}
+        comments = [{'path': 'a.py', 'line': 3, 'side': 'RIGHT', 'body': 'x'}]
+        self.assertEqual(github_api.create_pr_review('owner', 'repo', 1, comments, 'summary', 'token', commit_id='abc'), 5)
+        self.assertTrue(self.mock_post.call_args[0][0].endswith('/repos/owner/repo/pulls/1/reviews'))
+        data = json.loads(self.mock_post.call_args[1]['data'])
+        self.assertEqual((data['event'], data['comments'], data['commit_id']), ('COMMENT', comments, 'abc'))
+        self.mock_post.return_value.status_code = 422
+        with self.assertRaises(Exception):
+            github_api.create_pr_review('owner', 'repo', 1, comments, 'summary', 'token')
+
+    def test_get_issue_comment(self):
+        self.mock_get.return_value.status_code = 200
+        self.mock_get.return_value.json.return_value = {'id': 77, 'body': 'b'}
+        self.assertEqual(github_api.get_issue_comment('owner', 'repo', 77, 'token')['body'], 'b')
+        self.mock_get.return_value.status_code = 404
+        self.assertIsNone(github_api.get_issue_comment('owner', 'repo', 77, 'token'))
+
+    def test_update_pr_comment_patches_in_place(self):
+        with patch('api.http_client.patch') as mock_patch:
+            mock_patch.return_value.status_code = 200
+            github_api.update_pr_comment('owner', 'repo', 77, 'new body', 'token')
+            url = mock_patch.call_args[0][0]
+            self.assertTrue(url.endswith('/repos/owner/repo/issues/comments/77'))
+            self.assertEqual(json.loads(mock_patch.call_args[1]['data']), {'body': 'new body'})
+            mock_patch.return_value.status_code = 404
+            with self.assertRaises(Exception):
+                github_api.update_pr_comment('owner', 'repo', 77, 'new body', 'token')
+
     def test_get_pr_comments_success(self):
         mock_response = MagicMock()
         mock_response.status_code = 200
@@ -86,5 +176,134 @@ class TestGithubApi(unittest.TestCase):
         with self.assertRaises(Exception):
             github_api.get_pr_comments('owner', 'repo', 1, 'token')
 
+    def make_page(self, items, link=None):
+        response = MagicMock()
+        response.status_code = 200
+        response.json.return_value = items
+        response.headers = {'Link': link} if link else {}
+        return response
+
+    def test_get_pr_comments_follows_link_pages(self):
+        base = 'https://api.github.com/repositories/1/issues/1/comments'
+        self.mock_get.side_effect = [
+            self.make_page([{'body': 'a'}], f'<{base}?per_page=100&page=2>; rel="next", <{base}?per_page=100&page=2>; rel="last"'),
+            self.make_page([{'body': 'b'}], f'<{base}?per_page=100&page=1>; rel="prev"'),
+        ]
+        comments = github_api.get_pr_comments('owner', 'repo', 1, 'token')
+        self.assertEqual(comments, [{'body': 'a'}, {'body': 'b'}])
+        self.assertEqual(self.mock_get.call_args_list[0].kwargs['params'], {'per_page': 100})
+        self.assertEqual(self.mock_get.call_args_list[1].args[0], f'{base}?per_page=100&page=2')
+
+    def test_get_pr_comments_stop_at_reads_newest_pages_only(self):
+        base = 'https://api.github.com/repositories/1/issues/1/comments'
+        self.mock_get.side_effect = [
+            self.make_page([{'body': 'c1'}, {'body': 'c2'}], f'<{base}?per_page=100&page=3>; rel="last"'),
+            self.make_page([{'body': 'review'}, {'body': '/apply-fix'}]),
+        ]
+        comments = github_api.get_pr_comments('owner', 'repo', 1, 'token', stop_at=lambda c: c['body'] == 'review')
+        self.assertEqual(comments, [{'body': 'review'}, {'body': '/apply-fix'}])
+        # First page (for the Link header) and last page; page 2 is never requested
+        self.assertEqual(self.mock_get.call_count, 2)
+        self.assertEqual(self.mock_get.call_args_list[1].kwargs['params'], {'per_page': 100, 'page': 3})
+
+    def test_detect_language_reads_all_file_pages(self):
+        base = 'https://api.github.com/repositories/1/pulls/1/files'
+        self.mock_get.side_effect = [
+            self.make_page([{'filename': 'README.md'}], f'<{base}?page=2>; rel="next"'),
+            self.make_page([{'filename': 'main.go'}]),
+        ]
+        self.assertEqual(github_api.detect_language_from_files('owner', 'repo', 1, 'token'), 'go')
+
+    def test_git_blob_sha_matches_git(self):
+        self.assertEqual(github_api.git_blob_sha('hello\n'), 'ce013625030ba8dba906f756967f9e9ca394464a')
+
+    def make_json(self, status_code, body):
+        response = MagicMock()
+        response.status_code = status_code
+        response.json.return_value = body
+        return response
+
+    def test_commit_code_changes_skips_unchanged_and_inlines_small_files(self):
+        big = 'x' * (github_api.COMMIT_INLINE_MAX_BYTES + 1)
+        self.mock_get.side_effect = [
+            self.make_json(200, {'object': {'sha': 'head'}}),
+            self.make_json(200, {'sha': 'tree0', 'tree': [
+                {'path': 'same.py', 'type': 'blob', 'mode': '100644', 'sha': github_api.git_blob_sha('same\n')},
+                {'path': 'run.sh', 'type': 'blob', 'mode': '100755', 'sha': 'old'},
+            ]}),
+        ]
+        self.mock_post.side_effect = [
+            self.make_json(201, {'sha': 'bigblob'}),
+            self.make_json(201, {'sha': 'tree1'}),
+            self.make_json(201, {'sha': 'commit1'}),
+        ]
+        with patch('api.http_client.patch', return_value=self.make_json(200, {})) as mock_patch:
+            sha = github_api.commit_code_changes('owner', 'repo', 'feature', {
+                'same.py': 'same\n', 'run.sh': 'echo hi\n', 'big.txt': big,
+            }, 'msg', 'token')
+        self.assertEqual(sha, 'commit1')
+        mock_patch.assert_called_once()
+        # One blob upload (big file), then tree and commit
+        self.assertEqual(self.mock_post.call_count, 3)
+        tree = json.loads(self.mock_post.call_args_list[1].kwargs['data'])
+        self.assertEqual(tree['base_tree'], 'tree0')
+        self.assertEqual(tree['tree'], [
+            {'path': 'run.sh', 'mode': '100755', 'type': 'blob', 'content': 'echo hi\n'},
+            {'path': 'big.txt', 'mode': '100644', 'type': 'blob', 'sha': 'bigblob'},
+        ])
+
+    def test_commit_code_changes_nothing_changed(self):
+        self.mock_get.side_effect = [
+            self.make_json(200, {'object': {'sha': 'head'}}),
+            self.make_json(200, {'sha': 'tree0', 'tree': [
+                {'path': 'same.py', 'type': 'blob', 'mode': '100644', 'sha': github_api.git_blob_sha('same\n')},
+            ]}),
+        ]
+        self.assertEqual(github_api.commit_code_changes('owner', 'repo', 'b', {'same.py': 'same\n'}, 'msg', 'token'), 'head')
+        self.mock_post.assert_not_called()
+
+    def test_detect_language_from_files_fallback(self):
+        mock_response = MagicMock()
+        mock_response.status_code = 404
+        self.mock_get.return_value = mock_response
+        self.assertEqual(github_api.detect_language_from_files('owner', 'repo', 1, 'token'), 'python')
+
+    def test_get_project_name_from_guidelines(self):
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.text = 'project_name: billing-service\n'
+        self.mock_get.return_value = mock_response
+        self.assertEqual(github_api.get_project_name_from_guidelines('owner', 'repo', 'token'), 'billing-service')
+
+    def test_stream_pr_diff_yields_files(self):
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.iter_lines.return_value = iter([
+            'diff --git a/a.py b/a.py', '--- a/a.py', '+++ b/a.py', '@@ -1 +1 @@', '-x', '+y',
+        ])
+        self.mock_get.return_value = mock_response
+        files = list(github_api.stream_pr_diff('owner', 'repo', 1, 'token'))
+        self.assertEqual([(f.path, f.added, f.removed) for f in files], [('a.py', 1, 1)])
+        self.assertTrue(self.mock_get.call_args.kwargs['stream'])
+        mock_response.close.assert_called_once()
+
+    def test_fetch_compare_diff_fast_forward(self):
+        compare = MagicMock()
+        compare.status_code = 200
+        compare.json.return_value = {'status': 'ahead'}
+        diff = MagicMock()
+        diff.status_code = 200
+        diff.text = 'delta'
+        self.mock_get.side_effect = [compare, diff]
+        self.assertEqual(github_api.fetch_compare_diff('owner', 'repo', 'a', 'b', 'token'), 'delta')
+
+    def test_fetch_compare_diff_diverged_returns_none(self):
+        compare = MagicMock()
+        compare.status_code = 200
+        compare.json.return_value = {'status': 'diverged'}
+        self.mock_get.return_value = compare
+        self.assertIsNone(github_api.fetch_compare_diff('owner', 'repo', 'a', 'b', 'token'))
+        self.assertEqual(self.mock_get.call_count, 1)
+
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
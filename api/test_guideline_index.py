@@ -0,0 +1,102 @@
+import os
+import tempfile
+import unittest
+from unittest.mock import patch
+import api.guideline_index as guideline_index
+
+PYTHON_GUIDE = """# Python Guidelines
+
+## Error Handling
+Always use specific exceptions and log handled exceptions with context.
+
+## Naming
+Use snake_case for functions and PascalCase for classes.
+"""
+
+GO_GUIDE = """# Go Guidelines
+
+## Error Handling
+Wrap errors with fmt.Errorf and %w; never ignore returned errors.
+"""
+
+class TestGuidelineIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.source_dir = os.path.join(self.tmp.name, 'guidelines_index')
+        os.mkdir(self.source_dir)
+        for name, text in (('python-guidelines.txt', PYTHON_GUIDE), ('go-guidelines.md', GO_GUIDE)):
+            with open(os.path.join(self.source_dir, name), 'w', encoding='utf-8') as f:
+                f.write(text)
+        self.index_file = os.path.join(self.tmp.name, 'guidelines.bm25')
+        patch.object(guideline_index, 'GUIDELINES_INDEX_DIR', self.source_dir).start()
+        patch.object(guideline_index, 'GUIDELINES_INDEX_FILE', self.index_file).start()
+        guideline_index.reset_guideline_index()
+
+    def tearDown(self):
+        guideline_index.reset_guideline_index()
+        patch.stopall()
+        self.tmp.cleanup()
+
+    def test_chunk_text_splits_on_headings(self):
+        chunks = guideline_index.chunk_text(PYTHON_GUIDE)
+        self.assertEqual(len(chunks), 3)
+        self.assertTrue(chunks[1].startswith('## Error Handling'))
+
+    def test_bm25_ranks_matching_passage_first(self):
+        index = guideline_index.GuidelineIndex(guideline_index.build_index(self.source_dir, self.index_file))
+        try:
+            results = index.search('snake_case naming classes', top_k=2)
+            self.assertEqual(results[0].source, 'python-guidelines.txt')
+            self.assertIn('snake_case', results[0].text)
+            self.assertGreater(results[0].score, 0)
+            self.assertEqual(index.search('nonexistentterm'), [])
+        finally:
+            index.close()
+
+    def test_tags_restrict_to_review_language(self):
+        index = guideline_index.GuidelineIndex(guideline_index.build_index(self.source_dir, self.index_file))
+        try:
+            results = index.search('error handling exceptions', top_k=5, tags=['go', 'billing'])
+            self.assertTrue(results)
+            self.assertTrue(all(p.tag == 'go' for p in results))
+        finally:
+            index.close()
+
+    def test_other_languages_guidelines_never_fill_in(self):
+        index = guideline_index.GuidelineIndex(guideline_index.build_index(self.source_dir, self.index_file))
+        try:
+            self.assertEqual(index.search('error handling exceptions', top_k=5, tags=['rust', 'billing']), [])
+        finally:
+            index.close()
+        self.assertEqual(guideline_index.retrieve_guidelines('rust', 'billing', 'error handling'), '')
+
+    def test_untagged_guidelines_apply_to_every_language(self):
+        with open(os.path.join(self.source_dir, 'review-checklist.md'), 'w', encoding='utf-8') as f:
+            f.write('## Errors\nNever swallow error handling failures silently.\n')
+        index = guideline_index.GuidelineIndex(guideline_index.build_index(self.source_dir, self.index_file))
+        try:
+            results = index.search('error handling', top_k=5, tags=['rust'])
+            self.assertEqual([p.source for p in results], ['review-checklist.md'])
+        finally:
+            index.close()
+
+    def test_index_built_on_first_use_and_rebuilt_when_sources_change(self):
+        first = guideline_index.get_guideline_index()
+        self.assertTrue(os.path.exists(self.index_file))
+        digest = first.digest
+        guideline_index.reset_guideline_index()
+        with open(os.path.join(self.source_dir, 'general-guidelines.txt'), 'w', encoding='utf-8') as f:
+            f.write('# General\n\nKeep pull requests small.\n')
+        second = guideline_index.get_guideline_index()
+        self.assertNotEqual(second.digest, digest)
+        self.assertIn('general-guidelines.txt', {doc['source'] for doc in second.docs})
+
+    def test_retrieve_guidelines_formats_passages(self):
+        docs = guideline_index.retrieve_guidelines('python', 'billing', 'fix: handle errors')
+        self.assertIn('[python-guidelines.txt]', docs)
+        self.assertNotIn('go-guidelines', docs)
+        with patch.object(guideline_index, 'GUIDELINE_RETRIEVAL', 'remote'):
+            self.assertEqual(guideline_index.retrieve_guidelines('python', 'billing'), '')
+
+if __name__ == '__main__':
+    unittest.main()
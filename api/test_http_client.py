@@ -0,0 +1,67 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import requests
+import api.http_client as http_client
+
+class TestHttpClient(unittest.TestCase):
+    def setUp(self):
+        http_client.close_sessions()
+        self.patcher_sleep = patch('api.http_client.time.sleep')
+        self.mock_sleep = self.patcher_sleep.start()
+
+    def tearDown(self):
+        patch.stopall()
+        http_client.close_sessions()
+
+    def make_response(self, status_code):
+        response = MagicMock()
+        response.status_code = status_code
+        return response
+
+    def test_session_reused_per_host(self):
+        a = http_client.get_session('https://api.github.com/repos/a')
+        b = http_client.get_session('https://api.github.com/repos/b')
+        c = http_client.get_session('https://example.inference.ml.azure.com/score')
+        self.assertIs(a, b)
+        self.assertIsNot(a, c)
+
+    def test_default_timeout_per_endpoint(self):
+        with patch.object(requests.Session, 'request', return_value=self.make_response(200)) as mock_request:
+            http_client.get('https://api.github.com/x', endpoint='github')
+        self.assertEqual(mock_request.call_args.kwargs['timeout'], http_client.TIMEOUTS['github'])
+
+    def test_get_retries_on_transient_status(self):
+        responses = [self.make_response(503), self.make_response(200)]
+        with patch.object(requests.Session, 'request', side_effect=responses) as mock_request:
+            response = http_client.get('https://api.github.com/x')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_request.call_count, 2)
+        self.mock_sleep.assert_called_once()
+
+    def test_retried_response_is_closed(self):
+        responses = [self.make_response(503), self.make_response(200)]
+        with patch.object(requests.Session, 'request', side_effect=responses):
+            response = http_client.get('https://api.github.com/x', stream=True)
+        responses[0].close.assert_called_once()
+        response.close.assert_not_called()
+
+    def test_get_retries_on_connection_error_then_raises(self):
+        with patch.object(requests.Session, 'request', side_effect=requests.ConnectionError('down')) as mock_request:
+            with self.assertRaises(requests.ConnectionError):
+                http_client.get('https://api.github.com/x', retries=2)
+        self.assertEqual(mock_request.call_count, 3)
+
+    def test_post_not_retried_by_default(self):
+        with patch.object(requests.Session, 'request', return_value=self.make_response(503)) as mock_request:
+            response = http_client.post('https://api.github.com/x')
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(mock_request.call_count, 1)
+
+    def test_post_retried_when_marked_idempotent(self):
+        responses = [self.make_response(502), self.make_response(200)]
+        with patch.object(requests.Session, 'request', side_effect=responses) as mock_request:
+            http_client.post('https://api.github.com/x', idempotent=True)
+        self.assertEqual(mock_request.call_count, 2)
+
+if __name__ == '__main__':
+    unittest.main()
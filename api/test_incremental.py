@@ -0,0 +1,30 @@
+import unittest
+from unittest.mock import patch
+import api.incremental as incremental
+
+class TestIncremental(unittest.TestCase):
+    def test_payload_shas_only_for_synchronize(self):
+        data = {"action": "synchronize", "before": "a" * 40, "after": "b" * 40}
+        self.assertEqual(incremental.incremental_payload_shas(data), ("a" * 40, "b" * 40))
+        self.assertEqual(incremental.incremental_payload_shas(dict(data, action="opened")), (None, None))
+        self.assertEqual(incremental.incremental_payload_shas(dict(data, before="0" * 40)), (None, None))
+        with patch('api.incremental.INCREMENTAL_REVIEW_ENABLED', False):
+            self.assertEqual(incremental.incremental_payload_shas(data), (None, None))
+
+    def test_find_prior_review_uses_latest_marker(self):
+        comments = [
+            {"body": "review 1\n" + incremental.review_marker("1111111"), "html_url": "u1"},
+            {"body": "/apply-fix", "html_url": "u2"},
+            {"body": "review 2\n" + incremental.review_marker("2222222"), "html_url": "u3"},
+            {"body": None, "html_url": "u4"},
+        ]
+        self.assertEqual(incremental.find_prior_review(comments), {"url": "u3", "head_sha": "2222222"})
+        self.assertIsNone(incremental.find_prior_review([{"body": "hi"}]))
+
+    def test_incremental_header_links_prior_review(self):
+        header = incremental.incremental_header("a" * 40, "b" * 40, {"url": "https://x/1"})
+        self.assertIn("`aaaaaaa..bbbbbbb`", header)
+        self.assertIn("(https://x/1)", header)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+from unittest.mock import patch
+from api.diff_parser import parse_diff_text
+from api.inline_review import Finding, InlineComment, extract_findings, map_findings, batches, findings_section, post_inline_comments
+
+DIFF = (
+    "--- a/app.py\n+++ b/app.py\n"
+    "@@ -1,3 +1,4 @@\n import os\n+import sys\n x = 1\n y = 2\n"
+    "@@ -20,2 +21,3 @@\n def f():\n+    return sys.argv\n     pass\n"
+)
+
+REVIEW = """## 🤖 Automated Review
+
+❗ Problems with fixes
+
+### 📍 Inline findings
+- `app.py:2` `sys` is imported but only used once.
+- `./app.py:22` Unreachable `pass`.
+- `other.py:5` Not in this diff.
+
+### ✅ Checklist
+- [ ] Tests"""
+
+class TestInlineReview(unittest.TestCase):
+    def setUp(self):
+        self.files = parse_diff_text(DIFF)
+
+    def test_extract_findings_removes_section(self):
+        text, findings = extract_findings(REVIEW)
+        self.assertNotIn("Inline findings", text)
+        self.assertIn("### ✅ Checklist", text)
+        self.assertEqual([(f.path, f.line) for f in findings], [("app.py", 2), ("app.py", 22), ("other.py", 5)])
+        self.assertEqual(findings[0].body, "`sys` is imported but only used once.")
+
+    def test_review_without_findings_is_unchanged(self):
+        self.assertEqual(extract_findings("## Review\n\nLGTM"), ("## Review\n\nLGTM", []))
+
+    def test_map_findings_to_diff_lines(self):
+        _, findings = extract_findings(REVIEW)
+        comments, unmapped = map_findings(findings, self.files)
+        self.assertEqual([(c.path, c.line) for c in comments], [("app.py", 2), ("app.py", 22)])
+        self.assertEqual([f.path for f in unmapped], ["other.py"])
+        # Lines outside every hunk cannot carry a review comment
+        comments, unmapped = map_findings([Finding("app.py", 10, "x")], self.files)
+        self.assertEqual((comments, len(unmapped)), ([], 1))
+
+    def test_range_across_hunks_anchors_to_last_line(self):
+        comments, _ = map_findings([Finding("app.py", 22, "x", start_line=3), Finding("app.py", 3, "y", start_line=1)], self.files)
+        self.assertIsNone(comments[0].start_line)
+        self.assertEqual(comments[1].to_api(), {"path": "app.py", "line": 3, "side": "RIGHT", "body": "y", "start_line": 1, "start_side": "RIGHT"})
+
+    def test_max_comments_leaves_rest_unmapped(self):
+        comments, unmapped = map_findings([Finding("app.py", 2, "a"), Finding("app.py", 3, "b")], self.files, max_comments=1)
+        self.assertEqual((len(comments), len(unmapped)), (1, 1))
+
+    def test_batches_split_by_count_and_size(self):
+        comments = [InlineComment("app.py", i, "x" * 100) for i in range(1, 6)]
+        self.assertEqual([len(b) for b in batches(comments, max_comments=2, max_bytes=10 ** 6)], [2, 2, 1])
+        self.assertEqual([len(b) for b in batches(comments, max_comments=50, max_bytes=350)], [2, 2, 1])
+
+    def test_findings_section(self):
+        self.assertEqual(findings_section([]), "")
+        self.assertEqual(findings_section([Finding("a.py", 4, "m", start_line=2)]), "### 📍 Other findings\n- `a.py:2-4` m")
+
+    @patch('api.github_api.create_pr_review')
+    def test_post_inline_comments_batches_and_keeps_rejected(self, mock_review):
+        mock_review.side_effect = [1, Exception("422")]
+        comments = [InlineComment("app.py", i, "m") for i in range(1, 4)]
+        with patch('api.inline_review.REVIEW_INLINE_BATCH_SIZE', 2):
+            posted, failed = post_inline_comments('o', 'r', 1, comments, 't', commit_id='abc')
+        self.assertEqual(mock_review.call_count, 2)
+        self.assertEqual(mock_review.call_args.kwargs['commit_id'], 'abc')
+        self.assertEqual(posted, 2)
+        self.assertEqual([f.line for f in failed], [3])
+
+if __name__ == '__main__':
+    unittest.main()
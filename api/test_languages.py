@@ -0,0 +1,42 @@
+import unittest
+from api.languages import detect_languages, language_for_path, DEFAULT_LANGUAGE
+
+class TestLanguages(unittest.TestCase):
+    def test_language_for_path(self):
+        self.assertEqual(language_for_path('src/app/main.TS'), 'typescript')
+        self.assertEqual(language_for_path('docker/Dockerfile'), 'dockerfile')
+        self.assertEqual(language_for_path('include/util.h'), 'cpp')
+        self.assertIsNone(language_for_path('README.md'))
+
+    def test_weighted_by_changed_lines(self):
+        files = [{'filename': 'helper.py', 'changes': 4}] + [
+            {'filename': f'src/c{i}.ts', 'changes': 10} for i in range(400)
+        ]
+        report = detect_languages(files)
+        self.assertEqual(report.dominant, 'typescript')
+        self.assertEqual(report.ranking, ['typescript', 'python'])
+        self.assertEqual(report.files['helper.py'], 'python')
+        self.assertEqual(report.weights['typescript'], 4000)
+
+    def test_additions_and_deletions_and_minimum_weight(self):
+        report = detect_languages([
+            {'filename': 'a.go', 'additions': 2, 'deletions': 1},
+            {'filename': 'b.rb', 'changes': 0},
+        ])
+        self.assertEqual(report.weights, {'go': 3, 'ruby': 1})
+
+    def test_unknown_files_fall_back_to_default(self):
+        report = detect_languages([{'filename': 'README.md', 'changes': 50}])
+        self.assertEqual(report.files, {})
+        self.assertEqual(report.dominant, DEFAULT_LANGUAGE)
+
+    def test_dominant_for_subset(self):
+        report = detect_languages([
+            {'filename': 'a.py', 'changes': 100},
+            {'filename': 'b.go', 'changes': 5},
+        ])
+        self.assertEqual(report.dominant_for(['b.go', 'notes.txt']), 'go')
+        self.assertEqual(report.dominant_for(['notes.txt'], default='java'), 'java')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -6,12 +6,22 @@ import types
 
 # Import the main function from main.py
 import api.main as main_module
+from api.review_queue import InMemoryReviewQueue
+from api.review_cache import LRUReviewCache
+from api.repo_config import clear_repo_config_cache
+from api.delivery_store import InMemoryDeliveryStore
+from api.prompt_flow_client import reset_breakers
+from api.sticky_comment import clear_sticky_cache, STICKY_MARKER
 
 class TestMainFunction(unittest.TestCase):
     def setUp(self):
         # Patch get_secret to return dummy values
         self.get_secret_patcher = patch('api.config.get_secret', side_effect=lambda k: 'dummy_secret')
         self.get_secret = self.get_secret_patcher.start()
+        patch.object(main_module, 'get_secret', side_effect=lambda k: 'dummy_secret').start()
+        # Secrets are warmed on the first request of a process
+        self.prefetch_secrets = patch.object(main_module, 'prefetch_secrets', return_value={}).start()
+        patch.object(main_module, '_secrets_warm', False).start()
         # Patch external functions
         self.token_patcher = patch('api.github_api.get_installation_token', return_value='dummy_token')
         self.fetch_pr_data_patcher = patch('api.github_api.fetch_pr_data', return_value=('diff', 'commit msg'))
@@ -23,24 +33,50 @@ class TestMainFunction(unittest.TestCase):
         self.post_pr_comment_patcher.start()
         self.get_pr_comments_patcher.start()
         self.generate_code_fixes_patcher.start()
-        # Patch requests.post for Prompt Flow
-        self.requests_post_patcher = patch('requests.post')
+        # The review goes into one sticky comment per PR
+        self.create_pr_comment = patch('api.github_api.create_pr_comment', return_value=99).start()
+        self.update_pr_comment = patch('api.github_api.update_pr_comment', return_value=200).start()
+        patch('api.github_api.get_issue_comment', return_value=None).start()
+        clear_sticky_cache()
+        # Patch the pooled HTTP client for Prompt Flow
+        self.requests_post_patcher = patch('api.http_client.post')
         self.mock_requests_post = self.requests_post_patcher.start()
         mock_response = MagicMock()
         mock_response.raise_for_status.return_value = None
         mock_response.json.return_value = {"output": "Review comment"}
         self.mock_requests_post.return_value = mock_response
-        # Patch requests.get for language detection
-        self.requests_get_patcher = patch('requests.get')
+        # Patch the pooled HTTP client for language detection
+        self.requests_get_patcher = patch('api.http_client.get')
         self.mock_requests_get = self.requests_get_patcher.start()
         mock_get_response = MagicMock()
         mock_get_response.status_code = 200
         mock_get_response.json.return_value = [{"filename": "test.py"}]
+        mock_get_response.text = ""
         self.mock_requests_get.return_value = mock_get_response
+        clear_repo_config_cache()
+        # Circuit breakers are per process; a failing test must not open them for the next one
+        reset_breakers()
+        # Fresh review cache per test so cached reviews do not leak between tests
+        self.review_cache = LRUReviewCache()
+        patch.object(main_module, 'get_review_cache', return_value=self.review_cache).start()
+        self.delivery_store = InMemoryDeliveryStore()
+        patch.object(main_module, 'get_delivery_store', return_value=self.delivery_store).start()
+        # Local guideline retrieval is covered in test_guideline_index
+        self.retrieve_guidelines = patch.object(main_module, 'retrieve_guidelines', return_value='').start()
+        patch.object(main_module, 'index_version', return_value='').start()
 
     def tearDown(self):
         patch.stopall()
 
+    def written_review(self):
+        """
+        Body of the last write to the sticky comment.
+        """
+        # Edits always follow the creating POST
+        call = self.update_pr_comment.call_args or self.create_pr_comment.call_args
+        self.assertIsNotNone(call, "no review comment written")
+        return call.args[3]
+
     def make_req(self, body, headers=None):
         # Simulate Azure Functions HttpRequest
         req = MagicMock()
@@ -96,5 +132,370 @@ class TestMainFunction(unittest.TestCase):
             self.assertEqual(result["status"], 500)
             self.assertIn("Prompt Flow call failed", result["body"])
 
+    def test_large_pr_reviewed_in_chunks(self):
+        diff = "".join(
+            f"diff --git a/f{i}.py b/f{i}.py\n--- a/f{i}.py\n+++ b/f{i}.py\n@@ -1 +1 @@\n-old\n+new\n"
+            for i in range(3)
+        )
+        plan = main_module.plan_review_chunks
+        with patch.object(main_module, 'validate_signature', return_value=True), \
+                patch('api.github_api.fetch_pr_data', return_value=(diff, 'commit msg')), \
+                patch.object(main_module, 'plan_review_chunks', side_effect=lambda files: plan(files, budget=30)):
+            payload = json.dumps({
+                "action": "opened",
+                "repository": {"name": "repo", "owner": {"login": "owner"}},
+                "pull_request": {"number": 1},
+                "installation": {"id": 123}
+            }).encode()
+            result = main_module.main(self.make_req(payload, {"X-Hub-Signature-256": "sig"}))
+        self.assertEqual(result["status"], 200)
+        self.assertEqual(self.mock_requests_post.call_count, 3)
+        self.assertIn("Part 3/3", self.written_review())
+
+    def test_large_single_file_split_into_slices(self):
+        lines = ["diff --git a/big.py b/big.py", "--- a/big.py", "+++ b/big.py"]
+        for h in range(30):
+            lines.append(f"@@ -{h * 100 + 1},0 +{h * 100 + 1},66 @@")
+            lines += [f"+line {n} of hunk {h} " + "x" * 40 for n in range(66)]
+        diff = "\n".join(lines) + "\n"
+        with patch.object(main_module, 'validate_signature', return_value=True), \
+                patch('api.github_api.fetch_pr_data', return_value=(diff, 'commit msg')):
+            payload = json.dumps({
+                "action": "opened",
+                "repository": {"name": "repo", "owner": {"login": "owner"}},
+                "pull_request": {"number": 1},
+                "installation": {"id": 123}
+            }).encode()
+            result = main_module.main(self.make_req(payload, {"X-Hub-Signature-256": "sig"}))
+        self.assertEqual(result["status"], 200)
+        parts = self.mock_requests_post.call_count
+        self.assertGreater(parts, 1)
+        self.assertIn(f"Part {parts}/{parts}", self.written_review())
+
+    def test_repeated_review_served_from_cache(self):
+        diff = "diff --git a/f.py b/f.py\n--- a/f.py\n+++ b/f.py\n@@ -1 +1 @@\n-old\n+new\n"
+        payload = json.dumps({
+            "action": "opened",
+            "repository": {"name": "repo", "owner": {"login": "owner"}},
+            "pull_request": {"number": 1},
+            "installation": {"id": 123}
+        }).encode()
+        with patch.object(main_module, 'validate_signature', return_value=True), \
+                patch('api.github_api.fetch_pr_data', return_value=(diff, 'commit msg')):
+            main_module.main(self.make_req(payload, {"X-Hub-Signature-256": "sig"}))
+            main_module.main(self.make_req(payload, {"X-Hub-Signature-256": "sig"}))
+        self.assertEqual(self.mock_requests_post.call_count, 1)
+        self.assertEqual(self.review_cache.stats()["hits"], 1)
+
+    def test_cached_files_reused_when_unrelated_file_added(self):
+        def file_diff(path):
+            return f"diff --git a/{path} b/{path}\n--- a/{path}\n+++ b/{path}\n@@ -1 +1 @@\n-old\n+new\n"
+        payload = json.dumps({
+            "action": "opened",
+            "repository": {"name": "repo", "owner": {"login": "owner"}},
+            "pull_request": {"number": 1},
+            "installation": {"id": 123}
+        }).encode()
+        plan = main_module.plan_review_chunks
+        with patch.object(main_module, 'validate_signature', return_value=True), \
+                patch.object(main_module, 'plan_review_chunks', side_effect=lambda files: plan(files, budget=30)), \
+                patch('api.github_api.fetch_pr_data', return_value=(file_diff('a.py') + file_diff('b.py'), 'msg')):
+            main_module.main(self.make_req(payload, {"X-Hub-Signature-256": "sig"}))
+            self.assertEqual(self.mock_requests_post.call_count, 2)
+            with patch('api.github_api.fetch_pr_data', return_value=(file_diff('0.py') + file_diff('a.py') + file_diff('b.py'), 'msg')):
+                main_module.main(self.make_req(payload, {"X-Hub-Signature-256": "sig", "X-GitHub-Delivery": "d2"}))
+        # Only the new file is sent to Prompt Flow; a.py and b.py come from the cache
+        self.assertEqual(self.mock_requests_post.call_count, 3)
+        self.assertIn("0.py", self.mock_requests_post.call_args.kwargs["json"]["code_diff"])
+        self.assertIn("Part 3/3", self.written_review())
+
+    def test_synchronize_reviews_only_pushed_delta(self):
+        prior = {"body": "old review\n<!-- ai-code-review:head=aaaaaaa -->", "html_url": "https://prior"}
+        # Separate review comments (sticky mode off) link the previous review
+        with patch.object(main_module, 'validate_signature', return_value=True), \
+                patch.object(main_module, 'REVIEW_STICKY_COMMENT', False), \
+                patch('api.github_api.get_pr_comments', return_value=[prior]), \
+                patch('api.github_api.fetch_compare_diff', return_value='delta diff') as mock_compare:
+            payload = json.dumps({
+                "action": "synchronize",
+                "before": "a" * 40,
+                "after": "b" * 40,
+                "repository": {"name": "repo", "owner": {"login": "owner"}},
+                "pull_request": {"number": 1, "title": "feat: x"},
+                "installation": {"id": 123}
+            }).encode()
+            result = main_module.main(self.make_req(payload, {"X-Hub-Signature-256": "sig"}))
+        self.assertEqual(result["status"], 200)
+        mock_compare.assert_called_once()
+        self.assertEqual(self.mock_requests_post.call_args.kwargs["json"]["code_diff"], "delta diff")
+        posted = main_module.github_api.post_pr_comment.call_args_list[0].args[3]
+        self.assertIn("[previous review](https://prior)", posted)
+        self.assertIn("<!-- ai-code-review:head=" + "b" * 40 + " -->", posted)
+
+    def test_bot_fix_options_do_not_trigger_fixes(self):
+        prior = {"body": "old review\n<!-- ai-code-review:head=aaaaaaa -->", "user": {"type": "Bot"}}
+        options = {"body": "\n" + main_module.FIX_OPTIONS, "user": {"login": "ai-review[bot]", "type": "Bot"}}
+        with patch.object(main_module, 'validate_signature', return_value=True), \
+                patch.object(main_module, 'REVIEW_STICKY_COMMENT', False), \
+                patch('api.github_api.get_pr_comments', return_value=[prior, options]), \
+                patch('api.github_api.fetch_compare_diff', return_value='delta diff'):
+            main_module.main(self.sync_payload("a" * 40, "b" * 40, "d1"))
+            main_module.github_api.generate_code_fixes_with_copilot.assert_not_called()
+            # A user's command after the options still runs
+            command = {"body": "/apply-fix", "user": {"login": "dev", "type": "User"}}
+            with patch('api.github_api.get_pr_comments', return_value=[prior, options, command]):
+                main_module.main(self.sync_payload("b" * 40, "c" * 40, "d2"))
+        main_module.github_api.generate_code_fixes_with_copilot.assert_called_once()
+
+    def test_sticky_comment_updated_with_single_patch(self):
+        sticky = {
+            "id": 5,
+            "body": f"{STICKY_MARKER}\n\nold review\n<!-- ai-code-review:head={'a' * 40} -->\n\n{main_module.FIX_OPTIONS}",
+            "updated_at": "2026-01-02T00:00:00Z",
+            "user": {"type": "Bot"},
+        }
+        handled = {"id": 6, "body": "/apply-fix", "created_at": "2026-01-01T00:00:00Z"}
+        with patch.object(main_module, 'validate_signature', return_value=True), \
+                patch('api.github_api.get_pr_comments', return_value=[sticky, handled]), \
+                patch('api.github_api.fetch_compare_diff', return_value='delta diff'):
+            result = main_module.main(self.sync_payload("a" * 40, "b" * 40, "d1"))
+        self.assertEqual(result["status"], 200)
+        self.update_pr_comment.assert_called_once()
+        self.create_pr_comment.assert_not_called()
+        main_module.github_api.post_pr_comment.assert_not_called()
+        # The command was handled before the sticky comment's last edit
+        main_module.github_api.generate_code_fixes_with_copilot.assert_not_called()
+        comment_id, body = self.update_pr_comment.call_args.args[2:4]
+        self.assertEqual(comment_id, 5)
+        self.assertEqual(body.count("Want to fix issues automatically?"), 1)
+        self.assertIn("Earlier review of <code>aaaaaaa</code>", body)
+        self.assertLess(body.index("Review comment"), body.index("old review"))
+
+    def test_inline_findings_posted_as_one_review(self):
+        diff = "diff --git a/f.py b/f.py\n--- a/f.py\n+++ b/f.py\n@@ -1 +1 @@\n-old\n+new\n"
+        output = "Review comment\n\n### 📍 Inline findings\n- `f.py:1` Rename `new`.\n- `g.py:3` Not in the diff."
+        self.mock_requests_post.return_value.json.return_value = {"output": output}
+        payload = json.dumps({
+            "action": "opened",
+            "repository": {"name": "repo", "owner": {"login": "owner"}},
+            "pull_request": {"number": 1},
+            "installation": {"id": 123}
+        }).encode()
+        with patch.object(main_module, 'validate_signature', return_value=True), \
+                patch('api.github_api.fetch_pr_data', return_value=(diff, 'commit msg')), \
+                patch('api.github_api.create_pr_review', return_value=1) as mock_review:
+            result = main_module.main(self.make_req(payload, {"X-Hub-Signature-256": "sig"}))
+        self.assertEqual(result["status"], 200)
+        mock_review.assert_called_once()
+        comments = mock_review.call_args.args[3]
+        self.assertEqual([(c["path"], c["line"], c["side"]) for c in comments], [("f.py", 1, "RIGHT")])
+        body = self.written_review()
+        self.assertIn("1 finding posted as inline comments", body)
+        self.assertNotIn("Rename `new`", body)
+        # Findings outside the diff stay in the summary
+        self.assertIn("- `g.py:3` Not in the diff.", body)
+
+    def test_async_mode_enqueues_and_acknowledges(self):
+        queue = InMemoryReviewQueue()
+        with patch.object(main_module, 'validate_signature', return_value=True), \
+                patch.object(main_module, 'WEBHOOK_MODE', 'async'), \
+                patch.object(main_module, 'get_review_queue', return_value=queue), \
+                patch.object(main_module, 'start_local_worker') as mock_worker, \
+                patch.object(main_module, 'process_review') as mock_process:
+            payload = json.dumps({
+                "action": "opened",
+                "repository": {"name": "repo", "owner": {"login": "owner"}},
+                "pull_request": {"number": 1},
+                "installation": {"id": 123}
+            }).encode()
+            req = self.make_req(payload, {"X-Hub-Signature-256": "sig", "X-GitHub-Delivery": "abc"})
+            result = main_module.main(req)
+            self.assertEqual(result["status"], 202)
+            mock_process.assert_not_called()
+            mock_worker.assert_called_once_with(main_module.run_review_job)
+        job = queue.dequeue()
+        self.assertEqual(job["id"], "abc")
+        self.assertEqual(job["payload"]["pull_request"]["number"], 1)
+
+    def sync_payload(self, before, after, delivery):
+        payload = json.dumps({
+            "action": "synchronize",
+            "before": before,
+            "after": after,
+            "repository": {"name": "repo", "owner": {"login": "owner"}},
+            "pull_request": {"number": 1, "title": "feat: x"},
+            "installation": {"id": 123}
+        }).encode()
+        return self.make_req(payload, {"X-Hub-Signature-256": "sig", "X-GitHub-Delivery": delivery})
+
+    def test_duplicate_delivery_ignored(self):
+        with patch.object(main_module, 'validate_signature', return_value=True), \
+                patch('api.github_api.fetch_compare_diff', return_value='delta diff'):
+            first = main_module.main(self.sync_payload("a" * 40, "b" * 40, "d1"))
+            second = main_module.main(self.sync_payload("a" * 40, "b" * 40, "d1"))
+        self.assertEqual(first["status"], 200)
+        self.assertEqual(second["body"], "Duplicate delivery ignored.")
+        self.assertEqual(self.mock_requests_post.call_count, 1)
+
+    def test_failed_delivery_is_processed_when_redelivered(self):
+        self.mock_requests_post.return_value.raise_for_status.side_effect = Exception("fail")
+        with patch.object(main_module, 'validate_signature', return_value=True), \
+                patch('api.github_api.fetch_compare_diff', return_value='delta diff'):
+            first = main_module.main(self.sync_payload("a" * 40, "b" * 40, "d1"))
+            self.mock_requests_post.return_value.raise_for_status.side_effect = None
+            second = main_module.main(self.sync_payload("a" * 40, "b" * 40, "d1"))
+        self.assertEqual(first["status"], 500)
+        self.assertEqual(second["status"], 200)
+        self.assertIn("Review comment", self.written_review())
+
+    def test_superseded_review_cancelled_before_posting(self):
+        def newer_push_arrives(*args, **kwargs):
+            # A second push lands while the first review is waiting on Prompt Flow
+            self.delivery_store.record_push("owner/repo#1", "c" * 40, "b" * 40)
+            response = MagicMock()
+            response.json.return_value = {"output": "Review comment"}
+            return response
+        self.mock_requests_post.side_effect = newer_push_arrives
+        with patch.object(main_module, 'validate_signature', return_value=True), \
+                patch('api.github_api.fetch_compare_diff', return_value='delta diff'):
+            result = main_module.main(self.sync_payload("a" * 40, "b" * 40, "d1"))
+        self.assertEqual(result["body"], "Superseded by a newer push.")
+        main_module.github_api.post_pr_comment.assert_not_called()
+        self.create_pr_comment.assert_not_called()
+        self.update_pr_comment.assert_not_called()
+
+    def test_coalesced_push_reviews_from_earliest_unreviewed_base(self):
+        # The review of a..b never posted, so the next push is reviewed from a, not b
+        self.delivery_store.record_push("owner/repo#1", "b" * 40, "a" * 40)
+        with patch.object(main_module, 'validate_signature', return_value=True), \
+                patch('api.github_api.fetch_compare_diff', return_value='delta diff') as mock_compare:
+            result = main_module.main(self.sync_payload("b" * 40, "c" * 40, "d2"))
+        self.assertEqual(result["status"], 200)
+        self.assertEqual(mock_compare.call_args.args[2:4], ("a" * 40, "c" * 40))
+        self.assertFalse(self.delivery_store.is_superseded("owner/repo#1", "c" * 40))
+
+    def test_async_synchronize_is_debounced(self):
+        queue = InMemoryReviewQueue()
+        with patch.object(main_module, 'validate_signature', return_value=True), \
+                patch.object(main_module, 'WEBHOOK_MODE', 'async'), \
+                patch.object(main_module, 'get_review_queue', return_value=queue), \
+                patch.object(main_module, 'start_local_worker'), \
+                patch.object(main_module, 'REVIEW_DEBOUNCE_SECONDS', 60):
+            result = main_module.main(self.sync_payload("a" * 40, "b" * 40, "d1"))
+        self.assertEqual(result["status"], 202)
+        self.assertIsNone(queue.dequeue())
+        self.assertEqual(len(queue), 1)
+
+    def test_locally_retrieved_guidelines_passed_to_prompt_flow(self):
+        self.retrieve_guidelines.return_value = '[python-guidelines.txt]\nUse snake_case.'
+        with patch.object(main_module, 'validate_signature', return_value=True):
+            payload = json.dumps({
+                "action": "opened",
+                "repository": {"name": "repo", "owner": {"login": "owner"}},
+                "pull_request": {"number": 1},
+                "installation": {"id": 123}
+            }).encode()
+            result = main_module.main(self.make_req(payload, {"X-Hub-Signature-256": "sig"}))
+        self.assertEqual(result["status"], 200)
+        flow_input = self.mock_requests_post.call_args.kwargs["json"]
+        self.assertEqual(flow_input["retrieved_docs"], '[python-guidelines.txt]\nUse snake_case.')
+
+    def test_pruned_files_not_sent_to_prompt_flow(self):
+        diff = "".join(
+            f"diff --git a/{p} b/{p}\n--- a/{p}\n+++ b/{p}\n@@ -1 +1 @@\n-old\n+new\n"
+            for p in ("app.py", "package-lock.json")
+        )
+        with patch.object(main_module, 'validate_signature', return_value=True), \
+                patch('api.github_api.fetch_pr_data', return_value=(diff, 'commit msg')):
+            payload = json.dumps({
+                "action": "opened",
+                "repository": {"name": "repo", "owner": {"login": "owner"}},
+                "pull_request": {"number": 1},
+                "installation": {"id": 123}
+            }).encode()
+            result = main_module.main(self.make_req(payload, {"X-Hub-Signature-256": "sig"}))
+        self.assertEqual(result["status"], 200)
+        sent = self.mock_requests_post.call_args.kwargs["json"]["code_diff"]
+        self.assertIn("app.py", sent)
+        self.assertNotIn("package-lock.json", sent)
+        self.assertIn("Not reviewed: `package-lock.json` (lockfile)", self.written_review())
+
+    def test_streaming_mode_edits_placeholder_in_place(self):
+        create, update = self.create_pr_comment, self.update_pr_comment
+        patch.object(main_module, 'REVIEW_STREAMING', True).start()
+        stream_response = self.mock_requests_post.return_value
+        stream_response.headers = {"Content-Type": "text/event-stream"}
+        stream_response.iter_lines.return_value = [
+            'data: {"output": "## Review\\n\\n"}', '', 'data: {"output": "- Looks good."}', 'data: [DONE]',
+        ]
+        with patch.object(main_module, 'validate_signature', return_value=True):
+            payload = json.dumps({
+                "action": "opened",
+                "repository": {"name": "repo", "owner": {"login": "owner"}},
+                "pull_request": {"number": 1, "head": {"sha": "abc1234"}},
+                "installation": {"id": 123}
+            }).encode()
+            result = main_module.main(self.make_req(payload, {"X-Hub-Signature-256": "sig"}))
+        self.assertEqual(result["status"], 200)
+        self.assertTrue(self.mock_requests_post.call_args.kwargs["stream"])
+        create.assert_called_once()
+        final = update.call_args.args[3]
+        self.assertEqual(update.call_args.args[2], 99)
+        self.assertIn("## Review\n\n- Looks good.", final)
+        self.assertIn("ai-code-review:head=abc1234", final)
+        # The review and the fix options went into the placeholder; nothing else was posted
+        self.assertIn("/apply-fix", final)
+        main_module.github_api.post_pr_comment.assert_not_called()
+
+    def test_streaming_placeholder_closed_when_review_fails(self):
+        update = self.update_pr_comment
+        patch.object(main_module, 'REVIEW_STREAMING', True).start()
+        self.mock_requests_post.return_value.raise_for_status.side_effect = Exception("fail")
+        with patch.object(main_module, 'validate_signature', return_value=True):
+            payload = json.dumps({
+                "action": "opened",
+                "repository": {"name": "repo", "owner": {"login": "owner"}},
+                "pull_request": {"number": 1},
+                "installation": {"id": 123}
+            }).encode()
+            result = main_module.main(self.make_req(payload, {"X-Hub-Signature-256": "sig"}))
+        self.assertEqual(result["status"], 500)
+        self.assertIn("could not be completed", update.call_args.args[3])
+
+    def test_stages_are_timed_under_one_trace(self):
+        from api import telemetry
+        telemetry.reset()
+        with patch.object(main_module, 'validate_signature', return_value=True):
+            payload = json.dumps({
+                "action": "opened",
+                "repository": {"name": "repo", "owner": {"login": "owner"}},
+                "pull_request": {"number": 5},
+                "installation": {"id": 123}
+            }).encode()
+            result = main_module.main(self.make_req(payload, {"X-Hub-Signature-256": "sig"}))
+        self.assertEqual(result["status"], 200)
+        spans = {span.name: span for span in telemetry.recent_spans()}
+        for stage in ("webhook", "review", "secrets", "gather_pr_context", "diff_pruning", "scheduler_wait", "prompt_flow"):
+            self.assertIn(stage, spans)
+        self.assertEqual(len({span.trace_id for span in spans.values()}), 1)
+        self.assertEqual(spans["review"].attributes["repo"], "owner/repo")
+        self.assertEqual(spans["review"].attributes["pr"], 5)
+        self.assertEqual(spans["review"].attributes["installation"], 123)
+        self.assertEqual(spans["review"].attributes["outcome"], 200)
+        self.assertIn("diff_bytes", spans["review"].attributes)
+        self.assertIn('stage="prompt_flow"', telemetry.prometheus_text())
+        telemetry.reset()
+
+    def test_secrets_warmed_once_per_process(self):
+        with patch.object(main_module, 'validate_signature', return_value=True):
+            for _ in range(2):
+                main_module.main(self.make_req(b'{"action": "closed"}', {"X-Hub-Signature-256": "sig"}))
+        self.prefetch_secrets.assert_called_once_with(main_module.WEBHOOK_SECRET_NAMES)
+
+    def test_run_review_job_raises_on_failure(self):
+        with patch.object(main_module, 'process_review', return_value={"status": 500, "body": "x"}):
+            with self.assertRaises(Exception):
+                main_module.run_review_job({})
+
 if __name__ == "__main__":
     unittest.main() 
\ No newline at end of file
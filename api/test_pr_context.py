@@ -0,0 +1,84 @@
+import time
+import unittest
+from unittest.mock import patch
+import api.pr_context as pr_context
+from api.diff_parser import parse_diff_text
+from api.repo_config import RepoConfig
+from api.languages import detect_languages
+
+class TestPRContext(unittest.TestCase):
+    def setUp(self):
+        def slow(value):
+            def _call(*args, **kwargs):
+                time.sleep(0.1)
+                return value
+            return _call
+        patch('api.github_api.fetch_pr_data', side_effect=slow(('diff', 'msg'))).start()
+        patch('api.github_api.detect_pr_languages', side_effect=slow(detect_languages([{'filename': 'main.go', 'changes': 3}]))).start()
+        patch('api.pr_context.get_repo_config', side_effect=slow(RepoConfig(repo='repo', data={'project_name': 'billing'}))).start()
+        self.mock_comments = patch('api.github_api.get_pr_comments', side_effect=slow([{'body': 'hi'}])).start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_gather_pr_context_joins_reads_concurrently(self):
+        start = time.monotonic()
+        context = pr_context.gather_pr_context('owner', 'repo', 1, 'token')
+        elapsed = time.monotonic() - start
+        self.assertEqual(context.code_diff, 'diff')
+        self.assertEqual(context.commit_msg, 'msg')
+        self.assertEqual(context.language, 'go')
+        self.assertEqual(context.project_name, 'billing')
+        self.assertEqual(context.repo_config.get('project_name'), 'billing')
+        self.assertEqual(context.comments, [{'body': 'hi'}])
+        # Four 100ms reads in parallel take roughly one read, not the sum
+        self.assertLess(elapsed, 0.3)
+
+    def test_comments_read_back_to_previous_review_only(self):
+        pr_context.gather_pr_context('owner', 'repo', 1, 'token')
+        stop_at = self.mock_comments.call_args.kwargs['stop_at']
+        bot = {'type': 'Bot'}
+        self.assertTrue(stop_at({'body': 'review\n<!-- ai-code-review:head=abcdef1 -->', 'user': bot}))
+        self.assertFalse(stop_at({'body': '/apply-fix', 'user': bot}))
+        # A user quoting the marker does not hide the comments before it
+        self.assertFalse(stop_at({'body': '<!-- ai-code-review:sticky -->', 'user': {'type': 'User'}}))
+
+    def test_comment_failure_does_not_block_review(self):
+        self.mock_comments.side_effect = Exception('boom')
+        context = pr_context.gather_pr_context('owner', 'repo', 1, 'token')
+        self.assertEqual(context.comments, [])
+
+    def test_pr_data_failure_raises(self):
+        with patch('api.github_api.fetch_pr_data', side_effect=Exception('boom')):
+            with self.assertRaises(Exception):
+                pr_context.gather_pr_context('owner', 'repo', 1, 'token')
+
+    def test_incremental_diff_uses_compare(self):
+        with patch('api.github_api.fetch_compare_diff', return_value='delta') as mock_compare:
+            context = pr_context.gather_pr_context('owner', 'repo', 1, 'token', before='a', after='b', title='t')
+        mock_compare.assert_called_once_with('owner', 'repo', 'a', 'b', 'token')
+        self.assertEqual((context.code_diff, context.commit_msg, context.incremental_base), ('delta', 't', 'a'))
+
+    def test_incremental_falls_back_after_force_push(self):
+        with patch('api.github_api.fetch_compare_diff', return_value=None), \
+                patch('api.github_api.stream_pr_diff', return_value=iter([])) as mock_stream:
+            context = pr_context.gather_pr_context('owner', 'repo', 1, 'token', before='a', after='b', title='t')
+        mock_stream.assert_called_once_with('owner', 'repo', 1, 'token')
+        self.assertIsNone(context.incremental_base)
+
+    def test_full_diff_parsed_while_streaming(self):
+        diff = "diff --git a/a.py b/a.py\n--- a/a.py\n+++ b/a.py\n@@ -1 +1 @@\n-x\n+y\n"
+        files = parse_diff_text(diff)
+        with patch('api.github_api.stream_pr_diff', return_value=iter(files)), \
+                patch('api.github_api.fetch_pr_data') as mock_fetch:
+            context = pr_context.gather_pr_context('owner', 'repo', 1, 'token', title='feat: x')
+        # The payload's title replaces the PR JSON read, and the raw diff text is never kept
+        mock_fetch.assert_not_called()
+        self.assertIsNone(context.code_diff)
+        self.assertIs(context.diff_files, context.files)
+        self.assertEqual(context.commit_msg, 'feat: x')
+        self.assertEqual(context.diff_bytes, 6)
+        self.assertIn("@@ -1,1 +1,1 @@\n-x\n+y", context.diff_text())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,214 @@
+import json
+import time
+import threading
+import unittest
+from unittest.mock import patch
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from api import http_client
+from api import prompt_flow_client
+from api.prompt_flow_client import FlowEndpoint, CircuitBreaker, CircuitOpenError
+
+class FakeScoringServer:
+    """
+    Local /score endpoint. `responses` is a list of (status, delay) consumed per request;
+    once it is empty every request gets `default`.
+    """
+    def __init__(self, default=(200, 0.0)):
+        self.default = default
+        self.responses = []
+        self.stream_chunks = ["## Review\n\n", "- First point.\n\n", "- Second point."]
+        self.requests = []  # (deployment header, payload)
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                with server._lock:
+                    server.requests.append((self.headers.get("azureml-model-deployment"), json.loads(body)))
+                    status, delay = server.responses.pop(0) if server.responses else server.default
+                time.sleep(delay)
+                if status == 200 and "text/event-stream" in (self.headers.get("Accept") or ""):
+                    # Server-sent events, one chunk per event, as a streaming Prompt Flow deployment sends them
+                    self.send_response(200)
+                    self.send_header("Content-Type", "text/event-stream")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    for chunk in server.stream_chunks + [None]:
+                        event = f"data: {json.dumps({'output': chunk})}\n\n" if chunk is not None else "data: [DONE]\n\n"
+                        data = event.encode()
+                        self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                    self.wfile.write(b"0\r\n\r\n")
+                    return
+                payload = json.dumps({"output": f"review from {self.headers.get('azureml-model-deployment') or 'primary'}"}).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        host, port = self._server.server_address[:2]
+        self.url = f"http://{host}:{port}/score"
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+class TestPromptFlowClient(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeScoringServer()
+        self.primary = FlowEndpoint(self.server.url, "key")
+        prompt_flow_client.reset_breakers()
+        # Each attempt is a single request, so breaker counts match server counts
+        patch.object(http_client, "MAX_RETRIES", 0).start()
+        patch.object(prompt_flow_client, "PROMPT_FLOW_BREAKER_MIN_CALLS", 4).start()
+        patch.object(prompt_flow_client, "PROMPT_FLOW_BREAKER_OPEN_SECONDS", 0.2).start()
+
+    def tearDown(self):
+        patch.stopall()
+        prompt_flow_client.reset_breakers()
+        self.server.stop()
+
+    def test_success_is_recorded_on_closed_breaker(self):
+        result = prompt_flow_client.score(self.primary, {"code_diff": "d"})
+        self.assertEqual(result["output"], "review from primary")
+        state = prompt_flow_client.breaker_states()[self.server.url]
+        self.assertEqual((state["state"], state["calls"], state["failures"]), ("closed", 1, 0))
+
+    def test_failures_open_breaker_and_calls_are_rejected(self):
+        self.server.default = (500, 0.0)
+        for _ in range(4):
+            with self.assertRaises(Exception):
+                prompt_flow_client.score(self.primary, {})
+        self.assertEqual(prompt_flow_client.breaker_states()[self.server.url]["state"], "open")
+        with self.assertRaises(CircuitOpenError):
+            prompt_flow_client.score(self.primary, {})
+        # The open breaker short-circuits without touching the endpoint
+        self.assertEqual(len(self.server.requests), 4)
+
+    def test_client_errors_do_not_open_breaker(self):
+        self.server.default = (400, 0.0)
+        for _ in range(6):
+            with self.assertRaises(Exception):
+                prompt_flow_client.score(self.primary, {})
+        state = prompt_flow_client.breaker_states()[self.server.url]
+        self.assertEqual((state["state"], state["failures"]), ("closed", 0))
+
+    def test_slow_calls_count_as_failures(self):
+        patch.object(prompt_flow_client, "PROMPT_FLOW_BREAKER_SLOW_SECONDS", 0.01).start()
+        self.server.default = (200, 0.03)
+        for _ in range(4):
+            prompt_flow_client.score(self.primary, {})
+        self.assertEqual(prompt_flow_client.breaker_states()[self.server.url]["state"], "open")
+
+    def test_fallback_deployment_used_while_primary_is_failing(self):
+        fallback = prompt_flow_client.fallback_endpoint(self.primary, deployment="blue")
+        self.server.responses = [(503, 0.0)]
+        result = prompt_flow_client.score(self.primary, {"language": "python"}, fallback=fallback)
+        self.assertEqual(result["output"], "review from blue")
+        self.assertEqual([deployment for deployment, _ in self.server.requests], [None, "blue"])
+        self.assertEqual(self.server.requests[1][1], {"language": "python"})
+
+    def test_half_open_probe_closes_breaker(self):
+        breaker = prompt_flow_client.get_breaker(self.server.url)
+        for _ in range(4):
+            breaker.record_failure()
+        self.assertFalse(breaker.allow())
+        time.sleep(0.25)
+        self.assertTrue(breaker.allow())
+        self.assertEqual(breaker.state, "half_open")
+        # Only one probe at a time
+        self.assertFalse(breaker.allow())
+        breaker.record_success(0.01)
+        self.assertEqual(breaker.state, "closed")
+        self.assertEqual(breaker.snapshot()["trips"], 1)
+
+    def test_failed_probe_reopens_breaker(self):
+        breaker = CircuitBreaker("b", min_calls=1, open_seconds=0)
+        breaker.record_failure()
+        self.assertTrue(breaker.allow())
+        breaker.record_failure()
+        self.assertEqual((breaker.state, breaker.trips), ("open", 2))
+
+    def test_client_error_on_probe_closes_breaker(self):
+        breaker = prompt_flow_client.get_breaker(self.server.url)
+        for _ in range(4):
+            breaker.record_failure()
+        time.sleep(0.25)
+        self.server.responses = [(422, 0.0)]
+        with self.assertRaises(Exception) as raised:
+            prompt_flow_client.score(self.primary, {})
+        self.assertNotIsInstance(raised.exception, CircuitOpenError)
+        # The endpoint answered, so the circuit closes and later calls go through
+        self.assertEqual(breaker.state, "closed")
+        self.assertEqual(prompt_flow_client.score(self.primary, {})["output"], "review from primary")
+
+    def test_hedged_request_after_p95_delay(self):
+        patch.object(prompt_flow_client, "PROMPT_FLOW_HEDGE_MIN_DELAY", 0.05).start()
+        breaker = prompt_flow_client.get_breaker(self.server.url)
+        for _ in range(prompt_flow_client.PROMPT_FLOW_HEDGE_MIN_SAMPLES):
+            breaker.record_success(0.01)
+        # The first request stalls; the hedge sent after ~50ms answers immediately
+        self.server.responses = [(200, 2.0)]
+        started = time.monotonic()
+        result = prompt_flow_client.score(self.primary, {}, hedge=True)
+        self.assertLess(time.monotonic() - started, 1.0)
+        self.assertEqual(result["output"], "review from primary")
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(breaker.snapshot()["hedges"], 1)
+
+    def test_stream_score_yields_events_in_order(self):
+        deltas = list(prompt_flow_client.stream_score(self.primary, {"code_diff": "d"}))
+        self.assertEqual(deltas, self.server.stream_chunks)
+        state = prompt_flow_client.breaker_states()[self.server.url]
+        self.assertEqual((state["calls"], state["failures"]), (1, 0))
+
+    def test_stream_time_to_first_token_kept_out_of_hedge_delay(self):
+        breaker = prompt_flow_client.get_breaker(self.server.url)
+        for _ in range(prompt_flow_client.PROMPT_FLOW_HEDGE_MIN_SAMPLES):
+            list(prompt_flow_client.stream_score(self.primary, {}))
+        self.assertIsNone(breaker.latency_quantile(0.95))
+        self.assertGreater(breaker.snapshot()["ttft_p95"], 0)
+        for _ in range(prompt_flow_client.PROMPT_FLOW_HEDGE_MIN_SAMPLES):
+            breaker.record_success(1.5)
+        list(prompt_flow_client.stream_score(self.primary, {}))
+        self.assertEqual(breaker.latency_quantile(0.95), 1.5)
+
+    def test_stream_score_accepts_a_non_streaming_answer(self):
+        with patch.object(prompt_flow_client, "_headers", return_value={"Authorization": "Bearer key"}):
+            deltas = list(prompt_flow_client.stream_score(self.primary, {}))
+        self.assertEqual(deltas, ["review from primary"])
+
+    def test_stream_score_falls_back_before_first_chunk(self):
+        fallback = prompt_flow_client.fallback_endpoint(self.primary, deployment="blue")
+        self.server.responses = [(502, 0.0)]
+        deltas = list(prompt_flow_client.stream_score(self.primary, {}, fallback=fallback))
+        self.assertEqual("".join(deltas), "".join(self.server.stream_chunks))
+        self.assertEqual([deployment for deployment, _ in self.server.requests], [None, "blue"])
+
+    def test_non_idempotent_call_is_not_hedged(self):
+        patch.object(prompt_flow_client, "PROMPT_FLOW_HEDGE_MIN_DELAY", 0.05).start()
+        breaker = prompt_flow_client.get_breaker(self.server.url)
+        for _ in range(prompt_flow_client.PROMPT_FLOW_HEDGE_MIN_SAMPLES):
+            breaker.record_success(0.01)
+        self.server.responses = [(200, 0.2)]
+        prompt_flow_client.score(self.primary, {}, idempotent=False, hedge=True)
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertEqual(breaker.snapshot()["hedges"], 0)
+
+    def test_no_hedge_without_enough_samples(self):
+        self.server.responses = [(200, 0.1)]
+        prompt_flow_client.score(self.primary, {}, hedge=True)
+        self.assertEqual(len(self.server.requests), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,139 @@
+import time
+import unittest
+from unittest.mock import patch, MagicMock
+import requests
+import api.http_client as http_client
+import api.Metrics
+from api.rate_limit import RateLimitGovernor, RateLimitExceeded, governor
+
+TOKEN_HEADERS = {'Authorization': 'token ghs_abc'}
+
+def make_response(status_code, headers=None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.headers = headers or {}
+    return response
+
+class TestRateLimitGovernor(unittest.TestCase):
+    def setUp(self):
+        self.governor = RateLimitGovernor(reserve=10, max_wait=30)
+        self.governor.register_token('ghs_abc', 42)
+
+    def test_budget_tracked_per_installation(self):
+        reset = int(time.time()) + 3600
+        self.governor.after_response(TOKEN_HEADERS, make_response(200, {
+            'X-RateLimit-Remaining': '4999', 'X-RateLimit-Limit': '5000', 'X-RateLimit-Reset': str(reset),
+        }))
+        snapshot = self.governor.snapshot()
+        self.assertEqual(snapshot['installation:42']['remaining'], 4999)
+        self.assertEqual(snapshot['installation:42']['limit'], 5000)
+        self.assertEqual(self.governor.delay_for('installation:42'), 0)
+
+    def test_unregistered_token_key_does_not_leak_token(self):
+        key = self.governor.key_for({'Authorization': 'token secret-value'})
+        self.assertTrue(key.startswith('token:'))
+        self.assertNotIn('secret-value', key)
+        self.assertEqual(self.governor.key_for({'Authorization': 'Bearer jwt'}), 'app')
+
+    def test_expired_tokens_are_evicted(self):
+        self.governor.register_token('ghs_old', 7, expires_at=time.time() - 1)
+        self.governor.register_token('ghs_new', 7, expires_at=time.time() + 3600)
+        self.assertNotIn('ghs_old', self.governor._token_keys)
+        self.assertEqual(self.governor.key_for({'Authorization': 'token ghs_new'}), 'installation:7')
+
+    def test_expired_token_no_longer_maps_to_installation(self):
+        self.governor.register_token('ghs_short', 7, expires_at=time.time() + 60)
+        with patch('api.rate_limit.time.time', return_value=time.time() + 120):
+            key = self.governor.key_for({'Authorization': 'token ghs_short'})
+        self.assertTrue(key.startswith('token:'))
+        self.assertNotIn('ghs_short', self.governor._token_keys)
+
+    def test_paces_when_budget_below_reserve(self):
+        now = time.time()
+        self.governor.after_response(TOKEN_HEADERS, make_response(200, {
+            'X-RateLimit-Remaining': '5', 'X-RateLimit-Reset': str(int(now) + 100),
+        }))
+        delay = self.governor.delay_for('installation:42', now=now)
+        self.assertGreater(delay, 0)
+        self.assertLessEqual(delay, 20.5)
+
+    def test_pacing_capped_at_max_wait_while_budget_remains(self):
+        governor = RateLimitGovernor(reserve=100, max_wait=30)
+        governor.register_token('ghs_abc', 42)
+        now = time.time()
+        governor.after_response(TOKEN_HEADERS, make_response(200, {
+            'X-RateLimit-Remaining': '99', 'X-RateLimit-Reset': str(int(now) + 3000),
+        }))
+        self.assertEqual(governor.delay_for('installation:42', now=now), 30)
+        with patch('api.rate_limit.time.sleep') as mock_sleep:
+            governor.before_request(TOKEN_HEADERS)
+        self.assertEqual(mock_sleep.call_args.args[0], 30)
+
+    def test_defers_when_wait_exceeds_max(self):
+        self.governor.after_response(TOKEN_HEADERS, make_response(403, {
+            'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(int(time.time()) + 900),
+        }))
+        with self.assertRaises(RateLimitExceeded) as ctx:
+            self.governor.before_request(TOKEN_HEADERS)
+        self.assertEqual(ctx.exception.key, 'installation:42')
+        self.assertGreater(ctx.exception.retry_at, time.time() + 800)
+
+    def test_retry_after_honored(self):
+        limited = self.governor.after_response(TOKEN_HEADERS, make_response(429, {'Retry-After': '5'}))
+        self.assertTrue(limited)
+        with patch('api.rate_limit.time.sleep') as mock_sleep:
+            self.governor.before_request(TOKEN_HEADERS)
+        self.assertAlmostEqual(mock_sleep.call_args.args[0], 5, delta=1)
+
+    def test_plain_403_is_not_rate_limit(self):
+        self.assertFalse(self.governor.after_response(TOKEN_HEADERS, make_response(403)))
+        self.assertEqual(self.governor.delay_for('installation:42'), 0)
+
+class TestHttpClientRateLimit(unittest.TestCase):
+    def setUp(self):
+        governor.reset()
+        http_client.close_sessions()
+        patch('api.http_client.time.sleep').start()
+        self.mock_sleep = patch('api.rate_limit.time.sleep').start()
+
+    def tearDown(self):
+        patch.stopall()
+        governor.reset()
+        http_client.close_sessions()
+
+    def test_secondary_limit_retried_after_retry_after(self):
+        responses = [make_response(403, {'Retry-After': '2'}), make_response(200)]
+        with patch.object(requests.Session, 'request', side_effect=responses) as mock_request:
+            response = http_client.get('https://api.github.com/x', headers=TOKEN_HEADERS)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(mock_request.call_count, 2)
+        self.assertAlmostEqual(self.mock_sleep.call_args.args[0], 2, delta=1)
+        responses[0].close.assert_called_once()
+
+    def test_non_github_hosts_not_governed(self):
+        responses = [make_response(429, {'Retry-After': '2'})]
+        with patch.object(requests.Session, 'request', side_effect=responses) as mock_request:
+            response = http_client.post('https://example.inference.ml.azure.com/score')
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(mock_request.call_count, 1)
+        self.assertEqual(governor.snapshot(), {})
+
+class TestRateLimitMetrics(unittest.TestCase):
+    def tearDown(self):
+        governor.reset()
+
+    def test_remaining_budget_exported_as_gauge(self):
+        governor.register_token('ghs_metrics', 42)
+        governor.after_response({'Authorization': 'token ghs_metrics'}, make_response(200, {
+            'X-RateLimit-Remaining': '4321', 'X-RateLimit-Limit': '5000', 'X-RateLimit-Reset': '1700000000',
+        }))
+        req = MagicMock()
+        req.params = {}
+        body = api.Metrics.main(req)["body"]
+        self.assertIn('# TYPE github_rate_limit_remaining gauge', body)
+        self.assertIn('github_rate_limit_remaining{key="installation:42"} 4321', body)
+        self.assertIn('github_rate_limit_limit{key="installation:42"} 5000', body)
+        self.assertIn('github_rate_limit_reset_timestamp_seconds{key="installation:42"} 1700000000', body)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,49 @@
+import unittest
+from unittest.mock import patch, MagicMock
+import api.repo_config as repo_config
+
+def make_response(status_code, text='', etag=None):
+    response = MagicMock()
+    response.status_code = status_code
+    response.text = text
+    response.headers = {'ETag': etag} if etag else {}
+    return response
+
+class TestRepoConfig(unittest.TestCase):
+    def setUp(self):
+        repo_config.clear_repo_config_cache()
+        self.mock_get = patch('api.http_client.get').start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def test_config_parsed_and_revalidated_with_etag(self):
+        self.mock_get.return_value = make_response(200, 'project_name: billing\nreview_rules:\n  - no eval\n', etag='"abc"')
+        config = repo_config.get_repo_config('owner', 'repo', 'token')
+        self.assertEqual(config.project_name, 'billing')
+        self.assertEqual(config.get('review_rules'), ['no eval'])
+        self.mock_get.return_value = make_response(304)
+        with patch('yaml.safe_load') as mock_load:
+            again = repo_config.get_repo_config('owner', 'repo', 'token')
+        mock_load.assert_not_called()
+        self.assertIs(again, config)
+        self.assertEqual(self.mock_get.call_args.kwargs['headers']['If-None-Match'], '"abc"')
+
+    def test_missing_file_falls_back_to_repo_name_and_is_remembered(self):
+        self.mock_get.return_value = make_response(404)
+        self.assertEqual(repo_config.get_repo_config('owner', 'repo', 'token').project_name, 'repo')
+        repo_config.get_repo_config('owner', 'repo', 'token')
+        self.assertEqual(self.mock_get.call_count, 1)
+
+    def test_invalid_yaml_gives_empty_config(self):
+        self.mock_get.return_value = make_response(200, '- just\n- a list\n')
+        self.assertEqual(repo_config.get_repo_config('owner', 'repo', 'token').data, {})
+
+    def test_error_serves_last_known_config(self):
+        self.mock_get.return_value = make_response(200, 'project_name: billing\n', etag='"abc"')
+        repo_config.get_repo_config('owner', 'repo', 'token')
+        self.mock_get.return_value = make_response(502)
+        self.assertEqual(repo_config.get_repo_config('owner', 'repo', 'token').project_name, 'billing')
+
+if __name__ == '__main__':
+    unittest.main()
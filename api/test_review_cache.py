@@ -0,0 +1,109 @@
+import unittest
+import api.review_cache as review_cache
+from api.diff_parser import parse_diff_text
+from api.review_planner import review_units
+
+def unit_for(diff):
+    return review_units(parse_diff_text(diff))[0]
+
+def key(unit):
+    return review_cache.file_cache_key(unit, 'python', 'proj')
+
+def file_diff(path, start, line):
+    return f"diff --git a/{path} b/{path}\n--- a/{path}\n+++ b/{path}\n@@ -{start},2 +{start},2 @@\n x = 1\n-y = 2\n+{line}\n"
+
+DIFF = "diff --git a/a.py b/a.py\n--- a/a.py\n+++ b/a.py\n@@ -1,2 +1,2 @@\n x = 1\n-y = 2\n+y = 3\n"
+# Same change after a rebase moved it down the file, with trailing whitespace added
+MOVED = "diff --git a/a.py b/a.py\n--- a/a.py\n+++ b/a.py\n@@ -40,2 +41,2 @@ def f():\n x = 1   \n-y = 2\n+y = 3\n"
+
+class TestFileCacheKey(unittest.TestCase):
+    def test_key_ignores_line_numbers_and_trailing_whitespace(self):
+        self.assertEqual(key(unit_for(DIFF)), key(unit_for(MOVED)))
+
+    def test_key_depends_on_context(self):
+        base = key(unit_for(DIFF))
+        self.assertNotEqual(base, review_cache.file_cache_key(unit_for(DIFF), 'go', 'proj'))
+        self.assertNotEqual(base, review_cache.file_cache_key(unit_for(DIFF), 'python', 'other'))
+        self.assertNotEqual(base, review_cache.file_cache_key(unit_for(DIFF), 'python', 'proj', guidelines_version='2'))
+        self.assertNotEqual(base, review_cache.file_cache_key(unit_for(DIFF), 'python', 'proj', prompt_version='2'))
+        self.assertNotEqual(base, key(unit_for(DIFF.replace('y = 3', 'y = 4'))))
+        self.assertNotEqual(base, key(unit_for(DIFF.replace('a.py', 'b.py'))))
+
+class TestCachedParts(unittest.TestCase):
+    def setUp(self):
+        self.cache = review_cache.LRUReviewCache()
+        units = review_units(parse_diff_text(file_diff('a.py', 10, 'y = 3') + file_diff('b.py', 10, 'y = 3')))
+        review_cache.store_part(self.cache, units, "Check `b.py:11` and `a.py:10-11`.", key)
+
+    def test_part_reused_when_unrelated_files_are_added(self):
+        units = review_units(parse_diff_text(
+            file_diff('new.py', 1, 'z = 0') + file_diff('a.py', 10, 'y = 3') + file_diff('b.py', 10, 'y = 3')
+        ))
+        parts, remaining = review_cache.lookup_parts(self.cache, units, key)
+        self.assertEqual([units[i].path for i in remaining], ['new.py'])
+        self.assertEqual([[units[i].path for i in indices] for indices, _ in parts], [['a.py', 'b.py']])
+
+    def test_line_references_follow_moved_hunks(self):
+        units = review_units(parse_diff_text(file_diff('a.py', 10, 'y = 3') + file_diff('b.py', 30, 'y = 3')))
+        parts, remaining = review_cache.lookup_parts(self.cache, units, key)
+        self.assertEqual(remaining, [])
+        self.assertEqual(parts[0][1], "Check `b.py:31` and `a.py:10-11`.")
+
+    def test_changed_file_invalidates_its_part_only(self):
+        units = review_units(parse_diff_text(file_diff('a.py', 10, 'y = 3') + file_diff('b.py', 10, 'y = 4')))
+        parts, remaining = review_cache.lookup_parts(self.cache, units, key)
+        self.assertEqual(parts, [])
+        self.assertEqual([units[i].path for i in remaining], ['a.py', 'b.py'])
+
+    def test_placeholder_output_not_cached(self):
+        cache = review_cache.LRUReviewCache()
+        units = review_units(parse_diff_text(DIFF))
+        review_cache.store_part(cache, units, review_cache.NO_REVIEW_OUTPUT, key)
+        self.assertEqual(len(cache), 0)
+
+class CacheBehaviour:
+    def make_cache(self, max_bytes):
+        raise NotImplementedError
+
+    def test_hit_miss_counters(self):
+        cache = self.make_cache(1000)
+        self.assertIsNone(cache.get('k'))
+        cache.set('k', 'review')
+        self.assertEqual(cache.get('k'), 'review')
+        self.assertEqual(cache.stats()['hits'], 1)
+        self.assertEqual(cache.stats()['misses'], 1)
+        self.assertEqual(cache.stats()['hit_ratio'], 0.5)
+
+    def test_uncounted_get(self):
+        cache = self.make_cache(1000)
+        cache.set('k', 'review')
+        self.assertEqual(cache.get('k', record_stats=False), 'review')
+        self.assertIsNone(cache.get('missing', record_stats=False))
+        self.assertEqual((cache.stats()['hits'], cache.stats()['misses']), (0, 0))
+
+    def test_size_based_eviction_drops_least_recently_used(self):
+        cache = self.make_cache(25)
+        cache.set('a', 'x' * 10)
+        cache.set('b', 'y' * 10)
+        cache.get('a')
+        cache.set('c', 'z' * 10)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 'x' * 10)
+        self.assertEqual(cache.get('c'), 'z' * 10)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_oversized_value_not_stored(self):
+        cache = self.make_cache(5)
+        cache.set('a', 'x' * 10)
+        self.assertIsNone(cache.get('a'))
+
+class TestLRUReviewCache(CacheBehaviour, unittest.TestCase):
+    def make_cache(self, max_bytes):
+        return review_cache.LRUReviewCache(max_bytes=max_bytes)
+
+class TestSQLiteReviewCache(CacheBehaviour, unittest.TestCase):
+    def make_cache(self, max_bytes):
+        return review_cache.SQLiteReviewCache(':memory:', max_bytes=max_bytes)
+
+if __name__ == '__main__':
+    unittest.main()
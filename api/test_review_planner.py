@@ -0,0 +1,102 @@
+import unittest
+import api.review_planner as review_planner
+from api.diff_parser import parse_diff_text
+
+def make_diff(files, hunks_per_file=1, lines_per_hunk=10):
+    out = []
+    for i in range(files):
+        out += [f"diff --git a/f{i}.py b/f{i}.py", f"--- a/f{i}.py", f"+++ b/f{i}.py"]
+        for h in range(hunks_per_file):
+            start = h * 100 + 1
+            out.append(f"@@ -{start},0 +{start},{lines_per_hunk} @@")
+            out += [f"+line {n} of hunk {h} in file {i} " + "x" * 40 for n in range(lines_per_hunk)]
+    return "\n".join(out) + "\n"
+
+class TestReviewPlanner(unittest.TestCase):
+    def test_small_pr_is_one_chunk(self):
+        chunks = review_planner.plan_review_chunks(parse_diff_text(make_diff(3)), budget=10000)
+        self.assertEqual(len(chunks), 1)
+        self.assertEqual(chunks[0].paths, ['f0.py', 'f1.py', 'f2.py'])
+
+    def test_files_packed_within_budget(self):
+        files = parse_diff_text(make_diff(10))
+        budget = review_planner.estimate_tokens(files[0].to_patch()) * 3
+        chunks = review_planner.plan_review_chunks(files, budget=budget)
+        self.assertGreater(len(chunks), 1)
+        for chunk in chunks:
+            self.assertLessEqual(chunk.tokens, budget)
+        self.assertEqual(sum(len(c.files) for c in chunks), 10)
+
+    def test_large_file_split_on_hunk_boundaries(self):
+        files = parse_diff_text(make_diff(1, hunks_per_file=6))
+        hunk_cost = review_planner.estimate_tokens(files[0].hunks[0].to_patch())
+        budget = hunk_cost * 2 + 50
+        chunks = review_planner.plan_review_chunks(review_planner.review_units(files, budget), budget=budget)
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(sum(len(f.hunks) for c in chunks for f in c.files), 6)
+        self.assertTrue(all(c.paths == ['f0.py'] for c in chunks))
+
+    def test_oversized_hunk_is_truncated(self):
+        files = parse_diff_text(make_diff(1, lines_per_hunk=500))
+        chunks = review_planner.plan_review_chunks(review_planner.review_units(files, 500), budget=500)
+        self.assertEqual(len(chunks), 1)
+        self.assertLessEqual(chunks[0].tokens, 500)
+        self.assertIn('truncated for review', chunks[0].code_diff)
+
+    def test_split_file_slices_fit_budget_with_header(self):
+        files = parse_diff_text(make_diff(1, hunks_per_file=30, lines_per_hunk=66))
+        units = review_planner.review_units(files, budget=6000)
+        self.assertGreater(len(units), 1)
+        for unit in units:
+            self.assertLessEqual(review_planner.estimate_tokens(unit.to_patch()), 6000)
+        chunks = review_planner.plan_review_chunks(units, budget=6000)
+        self.assertEqual([f for c in chunks for f in c.files], units)
+        self.assertTrue(all(a is b for a, b in zip([f for c in chunks for f in c.files], units)))
+        self.assertEqual([c.first for c in chunks], list(range(len(units))))
+
+    def test_planned_units_are_not_split_again(self):
+        files = parse_diff_text(make_diff(1, hunks_per_file=6))
+        chunks = review_planner.plan_review_chunks(files, budget=10)
+        self.assertEqual(len(chunks), 1)
+        self.assertIs(chunks[0].files[0], files[0])
+
+    def test_review_and_merge(self):
+        files = parse_diff_text(make_diff(4))
+        chunks = review_planner.plan_review_chunks(files, budget=review_planner.estimate_tokens(files[0].to_patch()) + 1)
+
+        def review(chunk):
+            if 'f2.py' in chunk.code_diff:
+                raise Exception('boom')
+            return 'LGTM'
+        results = review_planner.review_chunks(chunks, review, max_parallel=2)
+        merged = review_planner.merge_reviews(results)
+        self.assertIn('Part 1/4', merged)
+        self.assertEqual(merged.count('LGTM'), 3)
+        self.assertIn('Review unavailable for: `f2.py`', merged)
+
+    def test_on_result_reports_each_chunk_and_pending_parts_are_skipped(self):
+        files = parse_diff_text(make_diff(3))
+        chunks = review_planner.plan_review_chunks(files, budget=review_planner.estimate_tokens(files[0].to_patch()) + 1)
+        partial = [(chunk, None, None) for chunk in chunks]
+        seen = []
+
+        def on_result(index, result):
+            seen.append(index)
+            partial[index] = result
+
+        review_planner.review_chunks(chunks, lambda chunk: 'LGTM', on_result=on_result)
+        self.assertEqual(sorted(seen), [0, 1, 2])
+        partial[1] = (chunks[1], None, None)
+        merged = review_planner.merge_reviews(partial)
+        self.assertIn('(3 parts)', merged)
+        self.assertNotIn('Part 2/3', merged)
+        self.assertEqual(merged.count('LGTM'), 2)
+
+    def test_merge_raises_when_all_chunks_fail(self):
+        chunks = review_planner.plan_review_chunks(parse_diff_text(make_diff(1)))
+        results = review_planner.review_chunks(chunks, lambda chunk: 1 / 0)
+        with self.assertRaises(Exception):
+            review_planner.merge_reviews(results)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import unittest
+from unittest.mock import patch
+import api.review_queue as review_queue
+from api.rate_limit import RateLimitExceeded
+
+class QueueBehaviour:
+    def make_queue(self):
+        raise NotImplementedError
+
+    def setUp(self):
+        self.queue = self.make_queue()
+
+    def test_fifo_and_ack(self):
+        self.queue.enqueue(review_queue.make_job({'n': 1}, 'd1'))
+        self.queue.enqueue(review_queue.make_job({'n': 2}, 'd2'))
+        self.assertEqual(len(self.queue), 2)
+        job = self.queue.dequeue()
+        self.assertEqual(job['payload'], {'n': 1})
+        self.assertEqual(job['attempts'], 1)
+        self.queue.ack(job)
+        self.assertEqual(self.queue.dequeue()['payload'], {'n': 2})
+        self.assertIsNone(self.queue.dequeue())
+
+    def test_unacked_job_redelivered_after_visibility_timeout(self):
+        self.queue.enqueue(review_queue.make_job({'n': 1}, 'd1'))
+        self.queue.dequeue()
+        self.assertIsNone(self.queue.dequeue())
+        with patch('api.review_queue.time.time', return_value=review_queue.time.time() + review_queue.REVIEW_JOB_VISIBILITY_TIMEOUT + 1):
+            job = self.queue.dequeue()
+        self.assertEqual(job['attempts'], 2)
+
+    def test_delayed_enqueue_hidden_until_due(self):
+        self.queue.enqueue(review_queue.make_job({'n': 1}, 'd1'), delay=30)
+        self.assertIsNone(self.queue.dequeue())
+        with patch('api.review_queue.time.time', return_value=review_queue.time.time() + 31):
+            self.assertEqual(self.queue.dequeue()['payload'], {'n': 1})
+
+    def test_drain_queue_retries_then_drops(self):
+        self.queue.enqueue(review_queue.make_job({'n': 1}, 'd1'))
+        calls = []
+
+        def failing(payload):
+            calls.append(payload)
+            raise Exception('boom')
+        with patch('api.review_queue.REVIEW_JOB_RETRY_DELAY', 0):
+            processed = review_queue.drain_queue(self.queue, failing)
+        self.assertEqual(processed, 0)
+        self.assertEqual(len(calls), review_queue.REVIEW_JOB_MAX_ATTEMPTS)
+        self.assertEqual(len(self.queue), 0)
+
+    def test_rate_limited_job_deferred_until_retry_at(self):
+        self.queue.enqueue(review_queue.make_job({'n': 1}, 'd1'))
+        now = review_queue.time.time()
+
+        def limited(payload):
+            raise RateLimitExceeded('installation:1', now + 600)
+        processed = review_queue.drain_queue(self.queue, limited, max_jobs=1)
+        self.assertEqual(processed, 0)
+        self.assertIsNone(self.queue.dequeue())
+        with patch('api.review_queue.time.time', return_value=now + 601):
+            self.assertEqual(self.queue.dequeue()['payload'], {'n': 1})
+
+    def test_drain_queue_max_jobs(self):
+        for i in range(3):
+            self.queue.enqueue(review_queue.make_job({'n': i}))
+        seen = []
+        processed = review_queue.drain_queue(self.queue, seen.append, max_jobs=2)
+        self.assertEqual(processed, 2)
+        self.assertEqual(seen, [{'n': 0}, {'n': 1}])
+        self.assertEqual(len(self.queue), 1)
+
+class TestInMemoryReviewQueue(QueueBehaviour, unittest.TestCase):
+    def make_queue(self):
+        return review_queue.InMemoryReviewQueue()
+
+class TestSQLiteReviewQueue(QueueBehaviour, unittest.TestCase):
+    def make_queue(self):
+        return review_queue.SQLiteReviewQueue(':memory:')
+
+    def test_duplicate_delivery_ignored(self):
+        self.queue.enqueue(review_queue.make_job({'n': 1}, 'd1'))
+        self.queue.enqueue(review_queue.make_job({'n': 1}, 'd1'))
+        self.assertEqual(len(self.queue), 1)
+
+if __name__ == '__main__':
+    unittest.main()
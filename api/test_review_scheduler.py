@@ -0,0 +1,159 @@
+import time
+import threading
+import json
+import unittest
+from unittest.mock import patch, MagicMock
+import api.Metrics
+from api.review_cache import LRUReviewCache
+from api.review_scheduler import ReviewScheduler, lane_for, parse_weights
+
+class TestReviewScheduler(unittest.TestCase):
+    def run_waiters(self, scheduler, waiters):
+        """
+        Queue (installation, repo, lane) waiters behind a held slot, then release it and
+        return the order in which they were granted.
+        """
+        order = []
+        scheduler.acquire('holder', 'holder/repo')
+        threads = []
+        for installation, repo, lane in waiters:
+            def _run(installation=installation, repo=repo, lane=lane):
+                with scheduler.slot(installation, repo, lane, timeout=5):
+                    order.append((installation, repo, lane))
+            thread = threading.Thread(target=_run)
+            thread.start()
+            threads.append(thread)
+            # Enqueue in a known order
+            while scheduler.stats()['queue_depth'] < len(threads):
+                time.sleep(0.001)
+        scheduler.release('holder', 'holder/repo')
+        for thread in threads:
+            thread.join(5)
+        return order
+
+    def test_global_and_per_repo_caps(self):
+        scheduler = ReviewScheduler(max_concurrent=3, max_per_installation=10, max_per_repo=2, weights={})
+        peak = {'global': 0, 'repo': 0}
+        active = {'global': 0, 'repo': 0}
+        lock = threading.Lock()
+
+        def _run(repo):
+            with scheduler.slot(1, repo, timeout=5):
+                with lock:
+                    active['global'] += 1
+                    active['repo'] += repo == 'o/a'
+                    peak['global'] = max(peak['global'], active['global'])
+                    peak['repo'] = max(peak['repo'], active['repo'])
+                time.sleep(0.02)
+                with lock:
+                    active['global'] -= 1
+                    active['repo'] -= repo == 'o/a'
+        threads = [threading.Thread(target=_run, args=('o/a' if i % 2 else f'o/b{i}',)) for i in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        self.assertEqual(peak['global'], 3)
+        self.assertLessEqual(peak['repo'], 2)
+        self.assertEqual(scheduler.stats()['in_flight'], 0)
+        self.assertEqual(scheduler.stats()['granted_total'], 10)
+
+    def test_weighted_round_robin_across_installations(self):
+        scheduler = ReviewScheduler(max_concurrent=1, max_per_installation=10, max_per_repo=10, weights={'big': 2})
+        waiters = [('big', f'big/r{i}', 'normal') for i in range(4)] + [('small', f'small/r{i}', 'normal') for i in range(2)]
+        order = [installation for installation, _, _ in self.run_waiters(scheduler, waiters)]
+        # A mass refactor in "big" does not starve "small": it gets every third slot
+        self.assertEqual(order, ['big', 'small', 'big', 'big', 'small', 'big'])
+
+    def test_priority_lanes(self):
+        scheduler = ReviewScheduler(max_concurrent=1, weights={})
+        order = self.run_waiters(scheduler, [
+            (1, 'o/draft', 'low'), (2, 'o/ready', 'normal'), (3, 'o/fix', 'high'),
+        ])
+        self.assertEqual([lane for _, _, lane in order], ['high', 'normal', 'low'])
+
+    def test_priority_lanes_within_one_installation(self):
+        scheduler = ReviewScheduler(max_concurrent=1, weights={}, aging_seconds=0)
+        order = self.run_waiters(scheduler, [
+            (1, 'o/draft', 'low'), (1, 'o/draft2', 'low'), (1, 'o/ready', 'normal'), (1, 'o/fix', 'high'),
+        ])
+        self.assertEqual([repo for _, repo, _ in order], ['o/fix', 'o/ready', 'o/draft', 'o/draft2'])
+
+    def test_round_robin_credit_dropped_when_installation_drains(self):
+        scheduler = ReviewScheduler(max_concurrent=1, max_per_installation=10, max_per_repo=10, weights={})
+        self.run_waiters(scheduler, [('a', 'a/r0', 'normal'), ('b', 'b/r0', 'normal'), ('a', 'a/r1', 'normal')])
+        self.assertEqual(scheduler._current, {})
+
+    def test_lane_aging_promotes_waiters(self):
+        scheduler = ReviewScheduler(max_concurrent=1, weights={}, aging_seconds=0.05)
+        scheduler.acquire('holder', 'holder/repo')
+        order = []
+
+        def _run(installation, repo, lane):
+            scheduler.acquire(installation, repo, lane, timeout=5)
+            order.append(lane)
+        low = threading.Thread(target=_run, args=(1, 'o/draft', 'low'))
+        low.start()
+        # Two aging periods lift the draft from "low" to "high"
+        time.sleep(0.12)
+        normal = threading.Thread(target=_run, args=(2, 'o/ready', 'normal'))
+        normal.start()
+        while scheduler.stats()['queue_depth'] < 2:
+            time.sleep(0.001)
+        scheduler.release('holder', 'holder/repo')
+        low.join(5)
+        self.assertEqual(order, ['low'])
+        scheduler.release(1, 'o/draft')
+        normal.join(5)
+        self.assertEqual(order, ['low', 'normal'])
+
+    def test_timeout_and_metrics(self):
+        scheduler = ReviewScheduler(max_concurrent=1, weights={})
+        scheduler.acquire(1, 'o/a')
+        with self.assertRaises(Exception):
+            scheduler.acquire(2, 'o/b', timeout=0.05)
+        stats = scheduler.stats()
+        self.assertEqual(stats['timeouts'], 1)
+        self.assertEqual(stats['queue_depth'], 0)
+        self.assertEqual(stats['in_flight_by_installation'], {1: 1})
+        scheduler.release(1, 'o/a')
+        self.assertEqual(scheduler.stats()['in_flight'], 0)
+
+    def test_lane_for_and_weights(self):
+        self.assertEqual(lane_for({'pull_request': {'draft': True}}), 'low')
+        self.assertEqual(lane_for({'pull_request': {}}), 'normal')
+        self.assertEqual(parse_weights('123:3, 456'), {'123': 3, '456': 1})
+
+class TestReviewMetrics(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = ReviewScheduler(max_concurrent=1)
+        self.cache = LRUReviewCache()
+        self.cache.get('missing')
+        self.cache.set('key', 'review')
+        self.cache.get('key')
+        patch('api.Metrics.get_review_scheduler', return_value=self.scheduler).start()
+        patch('api.Metrics.get_review_cache', return_value=self.cache).start()
+        self.addCleanup(patch.stopall)
+
+    def request(self, params):
+        req = MagicMock()
+        req.params = params
+        return api.Metrics.main(req)["body"]
+
+    def test_scheduler_and_cache_in_prometheus_output(self):
+        with self.scheduler.slot(1, 'org/repo', 'high', timeout=5):
+            body = self.request({})
+        self.assertIn('review_scheduler_queue_depth{lane="high"} 0', body)
+        self.assertIn('review_scheduler_in_flight 1', body)
+        self.assertIn('review_scheduler_wait_seconds{quantile="0.95"}', body)
+        self.assertIn('review_scheduler_granted_total 1', body)
+        self.assertIn('review_cache_hits_total 1', body)
+        self.assertIn('review_cache_misses_total 1', body)
+
+    def test_reviews_format_returns_json_stats(self):
+        stats = json.loads(self.request({'format': 'reviews'}))
+        self.assertEqual(stats['scheduler']['queue_depth_by_lane'], {'high': 0, 'normal': 0, 'low': 0})
+        self.assertEqual(stats['cache']['hits'], 1)
+
+if __name__ == '__main__':
+    unittest.main()
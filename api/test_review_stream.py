@@ -0,0 +1,61 @@
+import unittest
+from unittest.mock import patch
+from api import review_stream
+from api.review_stream import ProgressiveComment, complete_sections
+
+class TestReviewStream(unittest.TestCase):
+    def setUp(self):
+        self.create = patch('api.github_api.create_pr_comment', return_value=99).start()
+        self.update = patch('api.github_api.update_pr_comment', return_value=200).start()
+        self.clock = [100.0]
+        patch.object(review_stream.time, 'monotonic', side_effect=lambda: self.clock[0]).start()
+
+    def tearDown(self):
+        patch.stopall()
+
+    def bodies(self):
+        return [call.args[3] for call in self.update.call_args_list]
+
+    def test_complete_sections_cuts_at_last_paragraph(self):
+        self.assertEqual(complete_sections("## Review\n\n- one\n\n- tw"), "## Review\n\n- one")
+        self.assertEqual(complete_sections("## Rev"), "")
+
+    def test_placeholder_posted_on_start(self):
+        comment = ProgressiveComment('o', 'r', 1, 't').start()
+        self.assertEqual(comment.comment_id, 99)
+        self.assertEqual(self.create.call_args.args[3], review_stream.PLACEHOLDER)
+
+    def test_updates_are_throttled_and_capped(self):
+        comment = ProgressiveComment('o', 'r', 1, 't', interval=3, max_updates=2).start()
+        self.clock[0] += 1
+        self.assertFalse(comment.update("early"))
+        self.clock[0] += 3
+        self.assertTrue(comment.update("part 1"))
+        self.clock[0] += 3
+        self.assertTrue(comment.update("part 1 and 2"))
+        self.clock[0] += 3
+        self.assertFalse(comment.update("part 1, 2 and 3"))
+        self.assertEqual(self.bodies(), ["part 1" + review_stream.IN_PROGRESS_FOOTER, "part 1 and 2" + review_stream.IN_PROGRESS_FOOTER])
+        self.assertEqual(comment.first_update_seconds, 4)
+        # The final body is always written, and once
+        comment.finish("final review")
+        comment.finish("final review")
+        self.assertEqual(self.bodies()[-1], "final review")
+        self.assertEqual(self.update.call_count, 3)
+
+    def test_partial_only_shows_complete_sections(self):
+        comment = ProgressiveComment('o', 'r', 1, 't', interval=0).start()
+        self.assertFalse(comment.partial("## Revi"))
+        self.assertEqual(self.update.call_count, 0)
+        comment.partial("## Review\n\n- first\n\n- sec")
+        self.assertEqual(self.bodies(), ["## Review\n\n- first" + review_stream.IN_PROGRESS_FOOTER])
+
+    def test_failed_update_is_not_fatal(self):
+        self.update.side_effect = Exception("502")
+        comment = ProgressiveComment('o', 'r', 1, 't', interval=0).start()
+        self.assertFalse(comment.update("part 1"))
+        with self.assertRaises(Exception):
+            comment.finish("final")
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,118 @@
+import unittest
+from unittest.mock import patch
+from api import sticky_comment
+from api.sticky_comment import StickyComment, STICKY_MARKER, HISTORY_MARKER, split_body, render
+
+FOOTER = "---\n### Fix options"
+BOT = {"type": "Bot"}
+
+def review(text, head):
+    return f"{text}\n\n<!-- ai-code-review:head={head} -->"
+
+class TestStickyComment(unittest.TestCase):
+    def setUp(self):
+        self.create = patch('api.github_api.create_pr_comment', return_value=7).start()
+        self.update = patch('api.github_api.update_pr_comment', return_value=200).start()
+        self.get = patch('api.github_api.get_issue_comment', return_value=None).start()
+        sticky_comment.clear_sticky_cache()
+
+    def tearDown(self):
+        patch.stopall()
+        sticky_comment.clear_sticky_cache()
+
+    def sticky(self, comments=None):
+        return StickyComment('o', 'r', 1, 't', 'o/r#1', comments, footer=FOOTER)
+
+    def test_first_review_posts_one_comment_with_footer(self):
+        self.assertEqual(self.sticky([]).publish(review("LGTM", "a" * 40)), 7)
+        body = self.create.call_args.args[3]
+        self.assertTrue(body.startswith(STICKY_MARKER))
+        self.assertIn("LGTM", body)
+        self.assertIn(FOOTER, body)
+        self.update.assert_not_called()
+
+    def test_next_review_patches_and_collapses_previous(self):
+        previous = render(review("Old findings", "a" * 40), FOOTER)
+        comments = [{"id": 5, "body": previous, "updated_at": "2026-01-01T00:00:00Z", "user": BOT}]
+        self.sticky(comments).publish(review("New findings", "b" * 40))
+        self.create.assert_not_called()
+        comment_id, body = self.update.call_args.args[2:4]
+        self.assertEqual(comment_id, 5)
+        current, stale = split_body(body, FOOTER)
+        self.assertIn("New findings", current)
+        self.assertEqual(len(stale), 1)
+        self.assertIn("<summary>🕓 Earlier review of <code>aaaaaaa</code></summary>", stale[0])
+        self.assertIn("Old findings", stale[0])
+        # Only the current review carries a head marker
+        self.assertEqual(body.count("ai-code-review:head="), 1)
+        self.assertEqual(body.count(FOOTER), 1)
+
+    def test_same_head_is_replaced_not_collapsed(self):
+        previous = render(review("First run", "a" * 40), FOOTER)
+        self.sticky([{"id": 5, "body": previous, "user": BOT}]).publish(review("Second run", "a" * 40))
+        self.assertNotIn(HISTORY_MARKER, self.update.call_args.args[3])
+
+    def test_history_is_bounded(self):
+        body = render(review("r0", "0" * 40), FOOTER)
+        for i in range(1, 6):
+            self.sticky([{"id": 5, "body": body, "user": BOT}]).publish(review(f"r{i}", str(i) * 40))
+            body = self.update.call_args.args[3]
+        _, stale = split_body(body, FOOTER)
+        self.assertEqual(len(stale), sticky_comment.REVIEW_STICKY_HISTORY)
+        self.assertIn("r4", stale[0])
+
+    def test_oversized_body_fits_comment_limit(self):
+        body = render(review("x" * 70000, "a" * 40), FOOTER)
+        self.assertLessEqual(len(body), sticky_comment.COMMENT_MAX_CHARS)
+        self.assertIn("truncated", body)
+        self.assertIn("<!-- ai-code-review:head=" + "a" * 40 + " -->", body)
+
+    def test_cached_id_used_when_comment_scan_is_empty(self):
+        self.sticky([]).publish(review("LGTM", "a" * 40))
+        self.get.return_value = {"id": 7, "body": self.create.call_args.args[3], "user": BOT}
+        self.sticky([]).publish(review("Again", "b" * 40))
+        self.get.assert_called_once_with('o', 'r', 7, 't')
+        self.assertEqual(self.update.call_args.args[2], 7)
+
+    def test_failed_patch_posts_a_new_comment(self):
+        self.update.side_effect = Exception("404")
+        self.sticky([{"id": 5, "body": STICKY_MARKER, "user": BOT}]).publish("LGTM")
+        self.create.assert_called_once()
+
+    def test_new_comments_skip_handled_commands(self):
+        sticky = self.sticky([{"id": 5, "body": STICKY_MARKER, "updated_at": "2026-01-02T00:00:00Z", "user": BOT}])
+        comments = [
+            {"id": 5, "body": STICKY_MARKER + " /apply-fix", "user": BOT},
+            {"id": 6, "body": "/apply-fix", "created_at": "2026-01-01T00:00:00Z"},
+            {"id": 8, "body": "/apply-and-commit", "created_at": "2026-01-03T00:00:00Z"},
+        ]
+        self.assertEqual([c["id"] for c in sticky.new_comments(comments)], [8])
+
+    def test_command_posted_during_review_is_not_skipped(self):
+        # The last run fetched comments up to id 6; a command (id 7) came in before its final edit
+        body = render(review("Old", "a" * 40), FOOTER, seen=6)
+        sticky = self.sticky([{"id": 5, "body": body, "updated_at": "2026-01-03T00:00:00Z", "user": BOT}])
+        comments = [
+            {"id": 6, "body": "/apply-fix", "created_at": "2026-01-01T00:00:00Z"},
+            {"id": 7, "body": "/apply-fix", "created_at": "2026-01-02T00:00:00Z"},
+        ]
+        self.assertEqual([c["id"] for c in sticky.new_comments(comments)], [7])
+
+    def test_only_finished_review_moves_watermark(self):
+        comments = [{"id": 5, "body": render(review("Old", "a" * 40), FOOTER, seen=3), "user": BOT},
+                    {"id": 9, "body": "/apply-fix"}]
+        sticky = self.sticky(comments)
+        self.assertIn("ai-code-review:seen=3 ", sticky.render("⏳ Reviewing..."))
+        sticky.publish(review("New", "b" * 40))
+        body = self.update.call_args.args[3]
+        self.assertIn("ai-code-review:seen=9 ", body)
+        self.assertEqual(split_body(body, FOOTER)[0], review("New", "b" * 40))
+
+    def test_user_comment_with_marker_is_not_sticky(self):
+        forged = {"id": 5, "body": render(review("Fake", "a" * 40), FOOTER, seen=100), "user": {"type": "User"}}
+        sticky = self.sticky([forged, {"id": 6, "body": "/apply-fix"}])
+        self.assertIsNone(sticky.comment_id)
+        self.assertEqual([c["id"] for c in sticky.new_comments([forged, {"id": 6, "body": "/apply-fix"}])], [5, 6])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,96 @@
+import json
+import unittest
+from unittest.mock import patch
+from concurrent.futures import ThreadPoolExecutor
+from api import telemetry
+
+class TestTelemetry(unittest.TestCase):
+    def setUp(self):
+        telemetry.reset()
+
+    def tearDown(self):
+        telemetry.reset()
+        patch.stopall()
+
+    def test_spans_nest_and_share_trace(self):
+        with telemetry.span("webhook") as root:
+            with telemetry.span("fetch", repo="o/r") as child:
+                self.assertIs(telemetry.current_span(), child)
+            self.assertIs(telemetry.current_span(), root)
+        self.assertIsNone(telemetry.current_span())
+        self.assertEqual(child.trace_id, root.trace_id)
+        self.assertIs(child.parent, root)
+        self.assertEqual(root.children, [child])
+        self.assertEqual([s.name for s in telemetry.recent_spans()], ["fetch", "webhook"])
+
+    def test_exception_marks_span_as_error(self):
+        with self.assertRaises(ValueError):
+            with telemetry.span("prompt_flow"):
+                raise ValueError("boom")
+        span = telemetry.recent_spans()[-1]
+        self.assertEqual(span.status, "error")
+        self.assertEqual(span.attributes["error.type"], "ValueError")
+        self.assertIn('stage="prompt_flow",outcome="error"', telemetry.prometheus_text())
+
+    def test_traced_tags_repo_pr_and_installation(self):
+        @telemetry.traced("github.fetch")
+        def fetch(owner, repo, pr_number, token, installation_id=None):
+            return telemetry.current_span()
+
+        span = fetch("octo", "repo", 7, "t", installation_id=42)
+        self.assertEqual(span.name, "github.fetch")
+        self.assertEqual(span.attributes, {"repo": "octo/repo", "pr": 7, "installation": 42})
+
+    def test_propagate_keeps_parent_across_threads(self):
+        def chunk(_):
+            with telemetry.span("chunk") as span:
+                return span
+
+        with telemetry.span("review") as root:
+            with ThreadPoolExecutor(max_workers=2) as pool:
+                children = list(pool.map(telemetry.propagate(chunk), range(2)))
+        for child in children:
+            self.assertIs(child.parent, root)
+
+    def test_prometheus_histogram_is_cumulative(self):
+        telemetry.record("prompt_flow", 0.3)
+        telemetry.record("prompt_flow", 4.0)
+        text = telemetry.prometheus_text()
+        self.assertIn("# TYPE review_stage_duration_seconds histogram", text)
+        self.assertIn('review_stage_duration_seconds_bucket{stage="prompt_flow",outcome="ok",le="0.25"} 0', text)
+        self.assertIn('review_stage_duration_seconds_bucket{stage="prompt_flow",outcome="ok",le="0.5"} 1', text)
+        self.assertIn('review_stage_duration_seconds_bucket{stage="prompt_flow",outcome="ok",le="+Inf"} 2', text)
+        self.assertIn('review_stage_duration_seconds_count{stage="prompt_flow",outcome="ok"} 2', text)
+
+    def test_stage_summary_orders_slowest_first(self):
+        for _ in range(10):
+            telemetry.record("github.fetch_pr_data", 0.2)
+            telemetry.record("prompt_flow", 7.0)
+        summary = telemetry.stage_summary()
+        self.assertEqual(list(summary), ["prompt_flow", "github.fetch_pr_data"])
+        self.assertEqual(summary["prompt_flow"]["p95"], 7.0)
+        self.assertEqual(summary["github.fetch_pr_data"]["p50"], 0.2)
+
+    def test_otlp_json_shape(self):
+        with telemetry.span("webhook", outcome=200):
+            with telemetry.span("secrets"):
+                pass
+        body = json.loads(telemetry.otlp_json())
+        spans = body["resourceSpans"][0]["scopeSpans"][0]["spans"]
+        child, root = spans
+        self.assertEqual(child["parentSpanId"], root["spanId"])
+        self.assertEqual(len(root["traceId"]), 32)
+        self.assertNotIn("parentSpanId", root)
+        self.assertEqual(root["attributes"], [{"key": "outcome", "value": {"intValue": "200"}}])
+        self.assertEqual(root["status"]["code"], "STATUS_CODE_OK")
+
+    def test_slow_stage_is_logged(self):
+        patch.object(telemetry, "TELEMETRY_SLOW_STAGE_SECONDS", 0.0001).start()
+        with self.assertLogs("api.telemetry", level="WARNING") as logs:
+            with telemetry.span("webhook"):
+                with telemetry.span("prompt_flow"):
+                    telemetry.time.sleep(0.002)
+        self.assertIn("Slow stage prompt_flow", logs.output[0])
+
+if __name__ == "__main__":
+    unittest.main()
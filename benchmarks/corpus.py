@@ -0,0 +1,76 @@
+# corpus.py
+# Synthetic pull requests of configurable size for the offline benchmarks
+
+import hashlib
+from benchmarks.mock_servers import MockPullRequest
+
+# Cycled per file so language detection and per-chunk languages see a realistic mix
+EXTENSIONS = (".py", ".ts", ".go", ".java", ".py", ".js")
+# Every Nth file is a vendored path, which diff pruning drops before review
+VENDORED_EVERY = 25
+
+def _sha(*parts):
+    return hashlib.sha1("\0".join(str(part) for part in parts).encode()).hexdigest()
+
+def _file_path(index):
+    if VENDORED_EVERY and index % VENDORED_EVERY == VENDORED_EVERY - 1:
+        return f"vendor/lib{index}/module_{index}.js"
+    return f"src/pkg{index % 17}/module_{index}{EXTENSIONS[index % len(EXTENSIONS)]}"
+
+def _hunk(salt, index, hunk_index, lines_per_hunk):
+    """
+    One hunk of context, removed and added lines, roughly 60 characters each.
+    Returns (header_and_lines, added, removed).
+    """
+    lines = []
+    added = removed = context = 0
+    for line_no in range(lines_per_hunk):
+        text = f"value_{salt}_{index}_{hunk_index}_{line_no} = compute(item, retries={line_no % 7}, timeout=30)"
+        kind = line_no % 4
+        if kind == 0:
+            lines.append(f" {text}")
+            context += 1
+        elif kind == 1:
+            lines.append(f"-{text}  # old")
+            removed += 1
+        else:
+            lines.append(f"+{text}")
+            added += 1
+    start = 10 + hunk_index * (lines_per_hunk + 20)
+    header = f"@@ -{start},{context + removed} +{start},{context + added} @@ def handler_{hunk_index}():"
+    return [header] + lines, added, removed
+
+def make_pull_request(salt, files=1, hunks_per_file=3, lines_per_hunk=12, title=None):
+    """
+    Build a MockPullRequest with `files` changed files. `salt` makes the content unique,
+    so review cache hits only happen where a benchmark deliberately repeats a PR.
+    """
+    diff_lines = []
+    entries = []
+    for index in range(files):
+        path = _file_path(index)
+        file_added = file_removed = 0
+        diff_lines += [
+            f"diff --git a/{path} b/{path}",
+            f"index {_sha(salt, index)[:7]}..{_sha(salt, index, 'new')[:7]} 100644",
+            f"--- a/{path}",
+            f"+++ b/{path}",
+        ]
+        for hunk_index in range(hunks_per_file):
+            lines, added, removed = _hunk(salt, index, hunk_index, lines_per_hunk)
+            diff_lines += lines
+            file_added += added
+            file_removed += removed
+        entries.append({
+            "filename": path,
+            "status": "modified",
+            "additions": file_added,
+            "deletions": file_removed,
+            "changes": file_added + file_removed,
+        })
+    return MockPullRequest(
+        title=title or f"Benchmark change {salt}",
+        head_sha=_sha(salt, "head"),
+        diff="\n".join(diff_lines) + "\n",
+        files=entries,
+    )
@@ -0,0 +1,274 @@
+# mock_servers.py
+# Local stand-ins for the GitHub REST API and the Prompt Flow /score endpoint, for offline benchmarks
+
+import re
+import sys
+import json
+import time
+import random
+import threading
+from collections import Counter
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit, parse_qs
+
+@dataclass
+class ServerProfile:
+    """
+    How a mock server behaves: fixed latency per request, extra latency per KiB of request body,
+    the share of requests answered with a transient 503, and the size of generated responses.
+    """
+    latency: float = 0.0
+    latency_per_kb: float = 0.0
+    error_rate: float = 0.0
+    response_bytes: int = 2048
+    seed: int = 0
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _handle(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        status, headers, payload = self.server.mock.dispatch(self.command, self.path, self.headers, body)
+        if isinstance(payload, (dict, list)):
+            payload = json.dumps(payload).encode("utf-8")
+            headers = {"Content-Type": "application/json", **headers}
+        elif isinstance(payload, str):
+            payload = payload.encode("utf-8")
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    do_GET = do_POST = do_PATCH = do_PUT = do_DELETE = _handle
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients drop keep-alive connections with an unread streamed body (e.g. an error response); not a failure
+        if not isinstance(sys.exc_info()[1], ConnectionResetError):
+            super().handle_error(request, client_address)
+
+class MockServer:
+    """
+    Threaded HTTP server on an ephemeral localhost port that counts requests per route.
+    Subclasses implement route(method, path) -> (route_name, retryable, handler), where
+    handler(query, headers, body) returns (status, headers, payload).
+    """
+    def __init__(self, profile=None):
+        self.profile = profile or ServerProfile()
+        self.counts = Counter()
+        self._lock = threading.Lock()
+        self._random = random.Random(self.profile.seed)
+        self._server = _Server(("127.0.0.1", 0), _Handler)
+        self._server.mock = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._server.shutdown()
+            self._thread = None
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def total_requests(self):
+        with self._lock:
+            return sum(self.counts.values())
+
+    def reset_counts(self):
+        with self._lock:
+            self.counts.clear()
+
+    def _inject_error(self, retryable):
+        if not retryable or self.profile.error_rate <= 0:
+            return False
+        with self._lock:
+            return self._random.random() < self.profile.error_rate
+
+    def dispatch(self, method, raw_path, headers, body):
+        parts = urlsplit(raw_path)
+        query = {key: values[-1] for key, values in parse_qs(parts.query).items()}
+        name, retryable, handler = self.route(method, parts.path)
+        with self._lock:
+            self.counts[f"{method} {name}"] += 1
+        delay = self.profile.latency + self.profile.latency_per_kb * len(body) / 1024
+        if delay > 0:
+            time.sleep(delay)
+        if handler is None:
+            return 404, {}, {"message": "Not Found"}
+        # Only calls the client may safely retry fail, so an injected error never loses a write
+        if self._inject_error(retryable):
+            return 503, {}, {"message": "Service Unavailable (injected)"}
+        return handler(query, headers, body)
+
+    def route(self, method, path):
+        raise NotImplementedError
+
+@dataclass
+class MockPullRequest:
+    title: str
+    head_sha: str
+    diff: str
+    files: list  # files API entries
+
+class MockGitHub(MockServer):
+    """
+    The subset of the GitHub REST API the review pipeline uses. Pull requests are registered with
+    add_pull_request(); posted comments are kept so later webhooks see them.
+    """
+    ROUTES = (
+        ("POST", re.compile(r"/app/installations/(?P<installation>\d+)/access_tokens"), "access_tokens", False),
+        ("GET", re.compile(r"/repos/(?P<owner>[^/]+)/(?P<repo>[^/]+)/pulls/(?P<number>\d+)"), "pull_request", True),
+        ("GET", re.compile(r"/diffs/(?P<owner>[^/]+)/(?P<repo>[^/]+)/(?P<number>\d+)\.diff"), "diff", True),
+        ("GET", re.compile(r"/repos/(?P<owner>[^/]+)/(?P<repo>[^/]+)/pulls/(?P<number>\d+)/files"), "pull_files", True),
+        ("GET", re.compile(r"/repos/(?P<owner>[^/]+)/(?P<repo>[^/]+)/issues/(?P<number>\d+)/comments"), "comments", True),
+        ("POST", re.compile(r"/repos/(?P<owner>[^/]+)/(?P<repo>[^/]+)/issues/(?P<number>\d+)/comments"), "post_comment", False),
+        ("PATCH", re.compile(r"/repos/(?P<owner>[^/]+)/(?P<repo>[^/]+)/issues/comments/(?P<comment>\d+)"), "update_comment", True),
+        ("GET", re.compile(r"/repos/(?P<owner>[^/]+)/(?P<repo>[^/]+)/issues/comments/(?P<comment>\d+)"), "comment", True),
+        ("GET", re.compile(r"/repos/(?P<owner>[^/]+)/(?P<repo>[^/]+)/contents/\.guidelines\.yml"), "guidelines_yml", True),
+    )
+    GUIDELINES_YML = "project_name: bench\n"
+
+    def __init__(self, profile=None):
+        super().__init__(profile)
+        self.pull_requests = {}  # (owner, repo, number) -> MockPullRequest
+        self.comments = {}  # (owner, repo, number) -> [comment]
+        self.comments_by_id = {}
+        self._comment_ids = 0
+
+    def add_pull_request(self, owner, repo, number, pull_request):
+        with self._lock:
+            self.pull_requests[(owner, repo, int(number))] = pull_request
+
+    def route(self, method, path):
+        for route_method, pattern, name, retryable in self.ROUTES:
+            match = pattern.fullmatch(path)
+            if route_method == method and match:
+                handler = getattr(self, f"_{name}")
+                return name, retryable, lambda query, headers, body: handler(match.groupdict(), query, headers, body)
+        return path, False, None
+
+    def _lookup(self, args):
+        with self._lock:
+            return self.pull_requests.get((args["owner"], args["repo"], int(args["number"])))
+
+    def _access_tokens(self, args, query, headers, body):
+        expires_at = (datetime.now(timezone.utc) + timedelta(hours=1)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        return 201, {}, {"token": f"ghs_bench_{args['installation']}", "expires_at": expires_at}
+
+    def _pull_request(self, args, query, headers, body):
+        pull_request = self._lookup(args)
+        if pull_request is None:
+            return 404, {}, {"message": "Not Found"}
+        if "diff" in headers.get("Accept", ""):
+            return 200, {"Content-Type": "text/plain"}, pull_request.diff
+        return 200, {}, {
+            "number": int(args["number"]),
+            "title": pull_request.title,
+            "head": {"sha": pull_request.head_sha, "ref": "bench"},
+            "diff_url": f"{self.url}/diffs/{args['owner']}/{args['repo']}/{args['number']}.diff",
+        }
+
+    def _diff(self, args, query, headers, body):
+        pull_request = self._lookup(args)
+        if pull_request is None:
+            return 404, {}, {"message": "Not Found"}
+        return 200, {"Content-Type": "text/plain"}, pull_request.diff
+
+    def _paginated(self, items, path, query):
+        per_page = int(query.get("per_page", 30))
+        page = int(query.get("page", 1))
+        last = max(1, -(-len(items) // per_page))
+        links = []
+        if page < last:
+            links.append(f'<{self.url}{path}?per_page={per_page}&page={page + 1}>; rel="next"')
+            links.append(f'<{self.url}{path}?per_page={per_page}&page={last}>; rel="last"')
+        headers = {"Link": ", ".join(links)} if links else {}
+        return 200, headers, items[(page - 1) * per_page:page * per_page]
+
+    def _pull_files(self, args, query, headers, body):
+        pull_request = self._lookup(args)
+        if pull_request is None:
+            return 404, {}, {"message": "Not Found"}
+        path = f"/repos/{args['owner']}/{args['repo']}/pulls/{args['number']}/files"
+        return self._paginated(pull_request.files, path, query)
+
+    def _comments(self, args, query, headers, body):
+        with self._lock:
+            comments = list(self.comments.get((args["owner"], args["repo"], int(args["number"])), []))
+        path = f"/repos/{args['owner']}/{args['repo']}/issues/{args['number']}/comments"
+        return self._paginated(comments, path, query)
+
+    def _post_comment(self, args, query, headers, body):
+        key = (args["owner"], args["repo"], int(args["number"]))
+        with self._lock:
+            comments = self.comments.setdefault(key, [])
+            self._comment_ids += 1
+            comment = {"id": self._comment_ids, "body": json.loads(body or b"{}").get("body", "")}
+            comments.append(comment)
+            self.comments_by_id[comment["id"]] = comment
+        return 201, {}, comment
+
+    def _comment(self, args, query, headers, body):
+        with self._lock:
+            comment = self.comments_by_id.get(int(args["comment"]))
+            return (200, {}, dict(comment)) if comment else (404, {}, {"message": "Not Found"})
+
+    def _update_comment(self, args, query, headers, body):
+        with self._lock:
+            comment = self.comments_by_id.get(int(args["comment"]))
+            if comment is None:
+                return 404, {}, {"message": "Not Found"}
+            comment["body"] = json.loads(body or b"{}").get("body", "")
+            return 200, {}, dict(comment)
+
+    def _guidelines_yml(self, args, query, headers, body):
+        etag = '"bench-guidelines"'
+        if headers.get("If-None-Match") == etag:
+            return 304, {"ETag": etag}, b""
+        return 200, {"ETag": etag, "Content-Type": "text/plain"}, self.GUIDELINES_YML
+
+class MockPromptFlow(MockServer):
+    """
+    A Prompt Flow /score endpoint returning a review of profile.response_bytes characters,
+    streamed as server-sent events (one per review line) when the client accepts text/event-stream.
+    """
+    def route(self, method, path):
+        if method == "POST" and path.rstrip("/").endswith("/score"):
+            return "score", True, self._score
+        return path, False, None
+
+    def _score(self, query, headers, body):
+        flow_input = json.loads(body or b"{}")
+        heading = f"## 🤖 Automated Review ({flow_input.get('language', 'unknown')})\n\n"
+        filler = "- Consider adding a test for this change.\n"
+        repeat = max(0, self.profile.response_bytes - len(heading)) // len(filler) + 1
+        if "text/event-stream" in headers.get("Accept", ""):
+            events = [heading] + [filler] * repeat
+            stream = "".join(f"data: {json.dumps({'output': text})}\n\n" for text in events) + "data: [DONE]\n\n"
+            return 200, {"Content-Type": "text/event-stream"}, stream
+        return 200, {}, {"output": heading + filler * repeat}
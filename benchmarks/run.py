@@ -0,0 +1,329 @@
+# run.py
+# Offline end-to-end benchmarks: drive main() against mock GitHub and Prompt Flow servers
+#
+#   python -m benchmarks.run                      # run every scenario and compare with baselines.json
+#   python -m benchmarks.run --scenario huge_pr   # run one scenario
+#   python -m benchmarks.run --update-baselines   # record the current results as the new baselines
+
+import os
+import sys
+import json
+import hmac
+import math
+import time
+import uuid
+import hashlib
+import logging
+import argparse
+import resource
+from dataclasses import dataclass, asdict
+from contextlib import contextmanager, ExitStack
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+from benchmarks.corpus import make_pull_request
+from benchmarks.mock_servers import MockGitHub, MockPromptFlow, ServerProfile
+
+logger = logging.getLogger(__name__)
+
+BASELINES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+BENCH_OWNER = "bench"
+
+@dataclass
+class Scenario:
+    """
+    One benchmark workload: `webhooks` pull_request "opened" deliveries of PRs with `files` changed
+    files each, sent `concurrency` at a time, spread over `repos` repositories and two installations.
+    """
+    files: int = 1
+    webhooks: int = 10
+    concurrency: int = 4
+    repos: int = 4
+    hunks_per_file: int = 3
+    lines_per_hunk: int = 12
+    github_latency: float = 0.005
+    prompt_flow_latency: float = 0.05
+    prompt_flow_latency_per_kb: float = 0.0
+    error_rate: float = 0.0
+    review_bytes: int = 2048
+    streaming: bool = False  # REVIEW_STREAMING: placeholder comment edited as the review streams in
+
+# Ordered smallest first: peak RSS is a process high-water mark, so each scenario's figure is
+# only meaningful if everything that ran before it was smaller
+SCENARIOS = {
+    "single_file": Scenario(files=1, webhooks=40, concurrency=8),
+    "medium_pr": Scenario(files=50, webhooks=20, concurrency=4),
+    "flaky_upstream": Scenario(files=20, webhooks=20, concurrency=4, error_rate=0.05),
+    "streamed_review": Scenario(files=20, webhooks=20, concurrency=4, streaming=True),
+    "large_pr": Scenario(files=500, webhooks=6, concurrency=2, prompt_flow_latency=0.02),
+    "huge_pr": Scenario(files=2000, webhooks=2, concurrency=1, prompt_flow_latency=0.02),  # ~5 MB diff
+}
+
+# metric -> direction that counts as a regression
+REGRESSION_CHECKS = {
+    "p50_ms": "higher",
+    "p95_ms": "higher",
+    "p99_ms": "higher",
+    "throughput_per_s": "lower",
+    "requests_per_webhook": "higher",
+    "peak_rss_mb": "higher",
+}
+# Allowed relative drift per metric before a run fails; timings are noisy, request counts are not
+DEFAULT_TOLERANCES = {
+    "p50_ms": 0.5,
+    "p95_ms": 0.5,
+    "p99_ms": 0.5,
+    "throughput_per_s": 0.5,
+    "requests_per_webhook": 0.1,
+    "peak_rss_mb": 0.25,
+}
+
+class WebhookRequest:
+    """
+    Minimal stand-in for azure.functions.HttpRequest (main() only reads the body and headers).
+    """
+    def __init__(self, body, headers):
+        self._body = body
+        self.headers = headers
+
+    def get_body(self):
+        return self._body
+
+_secrets = None
+
+def bench_secrets():
+    """
+    Secrets for the offline pipeline, with a throwaway RSA key so the app JWT is really signed.
+    """
+    global _secrets
+    if _secrets is None:
+        from cryptography.hazmat.primitives import serialization
+        from cryptography.hazmat.primitives.asymmetric import rsa
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        pem = key.private_bytes(
+            serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8, serialization.NoEncryption(),
+        ).decode()
+        _secrets = {
+            "github-webhook-secret": "bench-webhook-secret",
+            "github-app-id": "1",
+            "github-private-key-pem": pem,
+            "prompt-flow-api-key": "bench-prompt-flow-key",
+            "ai-search-endpoint": "http://127.0.0.1:9",
+        }
+    return _secrets
+
+@contextmanager
+def offline_pipeline(github, prompt_flow, streaming=False):
+    """
+    Point the review pipeline at the mock servers with fresh process-wide state
+    (secret cache, token cache, repo config cache, circuit breakers, sticky comment ids, delivery store,
+    scheduler and review cache).
+    """
+    import api.main as main_module
+    from api import config, github_api, repo_config, http_client, prompt_flow_client, sticky_comment
+    from api.rate_limit import governor
+    from api.review_cache import LRUReviewCache
+    from api.delivery_store import InMemoryDeliveryStore
+    from api.review_scheduler import ReviewScheduler
+
+    secrets = bench_secrets()
+    with ExitStack() as stack:
+        # Key Vault is answered locally; everything above it (secret cache, prefetch) runs as in production
+        stack.enter_context(patch.object(config, "_fetch_secret", side_effect=lambda name, *args: secrets[name]))
+        stack.enter_context(patch.object(main_module, "_secrets_warm", False))
+        config.clear_secret_cache()
+        stack.enter_context(patch.object(main_module, "WEBHOOK_MODE", "sync"))
+        stack.enter_context(patch.object(main_module, "REVIEW_STREAMING", streaming))
+        stack.enter_context(patch.object(github_api, "GITHUB_API_URL", github.url))
+        stack.enter_context(patch.object(repo_config, "GITHUB_API_URL", github.url))
+        stack.enter_context(patch.dict(os.environ, {"PROMPT_FLOW_ENDPOINT": f"{prompt_flow.url}/score"}))
+        stack.enter_context(patch.object(main_module, "get_delivery_store", return_value=InMemoryDeliveryStore()))
+        stack.enter_context(patch.object(main_module, "get_review_scheduler", return_value=ReviewScheduler()))
+        stack.enter_context(patch.object(main_module, "get_review_cache", return_value=LRUReviewCache()))
+        github_api._token_cache.clear()
+        github_api._jwt_cache.clear()
+        repo_config.clear_repo_config_cache()
+        governor.reset()
+        prompt_flow_client.reset_breakers()
+        sticky_comment.clear_sticky_cache()
+        try:
+            yield main_module
+        finally:
+            http_client.close_sessions()
+
+def make_webhook(pr_number, repo, installation_id, pull_request):
+    """
+    A signed pull_request "opened" delivery for a PR registered with the mock GitHub.
+    """
+    body = json.dumps({
+        "action": "opened",
+        "repository": {"name": repo, "owner": {"login": BENCH_OWNER}},
+        "pull_request": {
+            "number": pr_number,
+            "title": pull_request.title,
+            "draft": False,
+            "head": {"sha": pull_request.head_sha, "ref": "bench"},
+        },
+        "installation": {"id": installation_id},
+    }).encode("utf-8")
+    mac = hmac.new(bench_secrets()["github-webhook-secret"].encode(), msg=body, digestmod=hashlib.sha256)
+    return WebhookRequest(body, {
+        "X-Hub-Signature-256": f"sha256={mac.hexdigest()}",
+        "X-GitHub-Delivery": str(uuid.uuid4()),
+        "X-GitHub-Event": "pull_request",
+    })
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of a list of numbers (0.0 for an empty list).
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+def peak_rss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+def run_scenario(scenario, name="custom"):
+    """
+    Run one scenario end to end and return its metrics.
+    """
+    github = MockGitHub(ServerProfile(latency=scenario.github_latency, error_rate=scenario.error_rate, seed=1))
+    prompt_flow = MockPromptFlow(ServerProfile(
+        latency=scenario.prompt_flow_latency,
+        latency_per_kb=scenario.prompt_flow_latency_per_kb,
+        error_rate=scenario.error_rate,
+        response_bytes=scenario.review_bytes,
+        seed=2,
+    ))
+    with github, prompt_flow, offline_pipeline(github, prompt_flow, scenario.streaming) as main_module:
+        requests = []
+        diff_bytes = 0
+        for index in range(scenario.webhooks):
+            pr_number = index + 1
+            repo = f"repo{index % max(1, scenario.repos)}"
+            pull_request = make_pull_request(
+                f"{name}-{index}", files=scenario.files,
+                hunks_per_file=scenario.hunks_per_file, lines_per_hunk=scenario.lines_per_hunk,
+            )
+            diff_bytes = max(diff_bytes, len(pull_request.diff.encode("utf-8")))
+            github.add_pull_request(BENCH_OWNER, repo, pr_number, pull_request)
+            requests.append(make_webhook(pr_number, repo, 100 + index % 2, pull_request))
+
+        def deliver(req):
+            started = time.perf_counter()
+            result = main_module.main(req)
+            return time.perf_counter() - started, result["status"]
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=scenario.concurrency, thread_name_prefix="bench") as pool:
+            outcomes = list(pool.map(deliver, requests))
+        wall = time.perf_counter() - started
+
+    latencies = [elapsed * 1000 for elapsed, _ in outcomes]
+    webhooks = len(outcomes) or 1
+    return {
+        "webhooks": len(outcomes),
+        "failures": sum(1 for _, status in outcomes if status != 200),
+        "diff_bytes": diff_bytes,
+        "p50_ms": round(percentile(latencies, 50), 1),
+        "p95_ms": round(percentile(latencies, 95), 1),
+        "p99_ms": round(percentile(latencies, 99), 1),
+        "throughput_per_s": round(len(outcomes) / wall, 2) if wall else 0.0,
+        "github_requests_per_webhook": round(github.total_requests / webhooks, 2),
+        "prompt_flow_requests_per_webhook": round(prompt_flow.total_requests / webhooks, 2),
+        "requests_per_webhook": round((github.total_requests + prompt_flow.total_requests) / webhooks, 2),
+        "requests_by_route": dict(sorted((github.counts + prompt_flow.counts).items())),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+def load_baselines(path=BASELINES_PATH):
+    if not os.path.exists(path):
+        return {"tolerances": dict(DEFAULT_TOLERANCES), "scenarios": {}}
+    with open(path, encoding="utf-8") as f:
+        baselines = json.load(f)
+    baselines.setdefault("tolerances", {})
+    baselines.setdefault("scenarios", {})
+    return baselines
+
+def compare_to_baseline(results, baseline, tolerances=None):
+    """
+    Return a message per metric that regressed past its tolerance (empty if none did).
+    Any failed webhook is a regression regardless of the baseline.
+    """
+    tolerances = {**DEFAULT_TOLERANCES, **(tolerances or {})}
+    regressions = []
+    if results.get("failures"):
+        regressions.append(f"{results['failures']} of {results['webhooks']} webhooks failed")
+    for metric, direction in REGRESSION_CHECKS.items():
+        expected = baseline.get(metric)
+        actual = results.get(metric)
+        if expected is None or actual is None:
+            continue
+        allowed = 1 + tolerances[metric]
+        if direction == "higher" and actual > expected * allowed:
+            regressions.append(f"{metric} {actual} > baseline {expected} (+{tolerances[metric]:.0%})")
+        elif direction == "lower" and actual < expected / allowed:
+            regressions.append(f"{metric} {actual} < baseline {expected} (-{tolerances[metric]:.0%})")
+    return regressions
+
+def _print_results(name, results):
+    print(
+        f"{name:<16} webhooks={results['webhooks']:<4} failures={results['failures']:<3} "
+        f"diff={results['diff_bytes'] / 1024:.0f}KiB p50={results['p50_ms']}ms p95={results['p95_ms']}ms "
+        f"p99={results['p99_ms']}ms throughput={results['throughput_per_s']}/s "
+        f"requests/webhook={results['requests_per_webhook']} "
+        f"(github={results['github_requests_per_webhook']}, prompt_flow={results['prompt_flow_requests_per_webhook']}) "
+        f"peak_rss={results['peak_rss_mb']}MiB"
+    )
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Offline end-to-end benchmarks for the review pipeline.")
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS), help="Scenario to run (repeatable; default all).")
+    parser.add_argument("--baselines", default=BASELINES_PATH, help="Baselines JSON file.")
+    parser.add_argument("--update-baselines", action="store_true", help="Store the results as the new baselines.")
+    parser.add_argument("--no-compare", action="store_true", help="Report only; never fail on regressions.")
+    parser.add_argument("--json", dest="json_path", help="Also write the results to this file.")
+    parser.add_argument("--verbose", action="store_true", help="Keep the pipeline's INFO logging.")
+    args = parser.parse_args(argv)
+    # Configured before the pipeline is imported, so its own basicConfig() call is a no-op
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.ERROR)
+
+    names = [name for name in SCENARIOS if not args.scenario or name in args.scenario]
+    baselines = load_baselines(args.baselines)
+    all_results = {}
+    failed = False
+    for name in names:
+        results = run_scenario(SCENARIOS[name], name)
+        all_results[name] = results
+        _print_results(name, results)
+        baseline = baselines["scenarios"].get(name)
+        if args.update_baselines or args.no_compare:
+            continue
+        if baseline is None:
+            print(f"  no baseline for {name}; run with --update-baselines to record one")
+            continue
+        for message in compare_to_baseline(results, baseline, baselines["tolerances"]):
+            print(f"  REGRESSION {name}: {message}")
+            failed = True
+
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(all_results, f, indent=2)
+    if args.update_baselines:
+        baselines["tolerances"] = {**DEFAULT_TOLERANCES, **baselines["tolerances"]}
+        for name, results in all_results.items():
+            baselines["scenarios"][name] = {
+                "scenario": asdict(SCENARIOS[name]),
+                **{metric: results[metric] for metric in REGRESSION_CHECKS},
+            }
+        with open(args.baselines, "w", encoding="utf-8") as f:
+            json.dump(baselines, f, indent=2)
+            f.write("\n")
+        print(f"Baselines written to {args.baselines}")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,43 @@
+import unittest
+from benchmarks.run import Scenario, run_scenario, compare_to_baseline, percentile
+from benchmarks.mock_servers import MockGitHub
+from benchmarks.corpus import make_pull_request
+
+class TestBenchmarkHarness(unittest.TestCase):
+    def test_run_scenario_end_to_end(self):
+        scenario = Scenario(files=3, webhooks=3, concurrency=2, repos=1, github_latency=0, prompt_flow_latency=0)
+        results = run_scenario(scenario, "smoke")
+        self.assertEqual(results["webhooks"], 3)
+        self.assertEqual(results["failures"], 0)
+        self.assertEqual(results["prompt_flow_requests_per_webhook"], 1.0)
+        # One sticky comment per webhook's PR, carrying the review and the fix options
+        self.assertEqual(results["requests_by_route"]["POST post_comment"], 3)
+        self.assertGreater(results["peak_rss_mb"], 0)
+
+    def test_compare_to_baseline_flags_regressions(self):
+        baseline = {"p95_ms": 100.0, "throughput_per_s": 10.0, "requests_per_webhook": 8.0}
+        ok = {"webhooks": 5, "failures": 0, "p95_ms": 140.0, "throughput_per_s": 7.0, "requests_per_webhook": 8.0}
+        self.assertEqual(compare_to_baseline(ok, baseline), [])
+        slow = dict(ok, p95_ms=200.0, throughput_per_s=5.0, requests_per_webhook=9.0, failures=1)
+        regressions = compare_to_baseline(slow, baseline)
+        self.assertEqual(len(regressions), 4)
+        self.assertIn("1 of 5 webhooks failed", regressions[0])
+
+    def test_percentile_nearest_rank(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([], 95), 0.0)
+
+    def test_mock_github_paginates_files(self):
+        github = MockGitHub()
+        github.add_pull_request("o", "r", 1, make_pull_request("p", files=5))
+        status, headers, page = github.dispatch("GET", "/repos/o/r/pulls/1/files?per_page=2&page=2", {}, b"")
+        self.assertEqual(status, 200)
+        self.assertEqual([f["filename"] for f in page], ["src/pkg2/module_2.go", "src/pkg3/module_3.java"])
+        self.assertIn('rel="next"', headers["Link"])
+        self.assertEqual(github.counts["GET pull_files"], 1)
+        github.stop()
+
+if __name__ == "__main__":
+    unittest.main()
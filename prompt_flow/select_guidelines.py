@@ -0,0 +1,12 @@
+from promptflow import tool
+
+
+@tool
+def select_guidelines(local_docs: str = "", search_docs=None) -> str:
+    """
+    Prefer guidelines retrieved by the function's local index; otherwise use the AI Search results
+    (the retriever node only runs when no local docs were passed).
+    """
+    if local_docs:
+        return local_docs
+    return search_docs if search_docs is not None else ""